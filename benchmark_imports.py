@@ -0,0 +1,86 @@
+# benchmark_imports.py
+"""
+core 模块冷启动导入耗时基准
+
+每个模块在独立的子进程中导入（避免模块缓存影响），重复若干次取中位数，
+并检查导入后是否已加载 pandas / scipy / matplotlib / PyQt5 等重量级依赖。
+
+用法:
+    python benchmark_imports.py [--repeat 5] [模块名 ...]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+
+# 需要检查是否被提前导入的重量级依赖
+HEAVY_MODULES = ("pandas", "scipy", "matplotlib", "PyQt5")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def core_modules():
+    """列出 core 包中的全部模块"""
+    return sorted(
+        f"core.{path.stem}" for path in (ROOT_DIR / "core").glob("*.py")
+        if not path.stem.startswith("_")
+    )
+
+
+def measure(module, repeat):
+    """
+    在新的解释器中导入模块 repeat 次
+
+    返回:
+    dict: median_ms, loaded (导入后已加载的重量级依赖), error
+    """
+    timings = []
+    loaded = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT_DIR, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            return {"median_ms": None, "loaded": [], "error": error[-1] if error else "导入失败"}
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"] * 1000)
+        loaded = probe["loaded"]
+    return {"median_ms": statistics.median(timings), "loaded": loaded, "error": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="core 模块冷启动导入耗时")
+    parser.add_argument("modules", nargs="*", help="要测量的模块，缺省为 core 下全部模块")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块的重复次数")
+    args = parser.parse_args()
+
+    modules = args.modules or core_modules()
+    baseline = measure("numpy", args.repeat)["median_ms"]
+    print(f"{'模块':<40}{'导入耗时(ms)':>14}  重量级依赖")
+    print(f"{'numpy (基准)':<40}{baseline:>14.1f}")
+    for module in modules:
+        result = measure(module, args.repeat)
+        if result["error"]:
+            print(f"{module:<40}{'失败':>14}  {result['error']}")
+            continue
+        loaded = ", ".join(result["loaded"]) or "-"
+        print(f"{module:<40}{result['median_ms']:>14.1f}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,14 @@ print("验证和创建所需目录结构...")
 required_dirs = [
     'config',  # 新增：根目录下的config文件夹，用于存放配置文件
     'Data/config',
+    'Data/logs',  # 运行日志（位于exe所在目录）
     'Data/inputs/CrossTrim_initial',
     'Data/inputs/CrossTrim_after',
     'Data/inputs/THK_initial',
     'Data/inputs/THK_after',
     'Data/inputs/WedgeTestRecipe',
     'Data/inputs/Default Beam coefficient test Map',  # 新增：默认Beam系数测试Map路径
+    'Data/inputs/BeamSpot',  # 自动分析服务监视的Beam Spot量测文件
     'Data/outputs/Data_processor',
     'Data/outputs/new_WedgeTestRecipe',
     'Data/outputs/new_BeamShapeProfile',
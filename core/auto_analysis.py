@@ -0,0 +1,524 @@
+import csv
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from utils.file_catalog import parse_wafer_id
+from utils.file_io import ensure_dir, get_resource_path
+
+logger = logging.getLogger('AutoAnalysis')
+
+# 分析类型
+ANALYSIS_WEDGE = "wedge"
+ANALYSIS_CROSS_TEST = "cross_test"
+ANALYSIS_COEFFICIENT = "coefficient"
+ANALYSIS_BEAM_SPOT = "beam_spot"
+
+# 文件角色
+ROLE_INITIAL = "initial"
+ROLE_AFTER = "after"
+ROLE_SINGLE = "single"
+
+# 监视目录 -> (分组, 角色)；同一分组的初始/刻蚀后文件按晶圆编号配对
+DEFAULT_ROUTES = {
+    "Data/inputs/THK_initial": ("thk", ROLE_INITIAL),
+    "Data/inputs/THK_after": ("thk", ROLE_AFTER),
+    "Data/inputs/CrossTrim_initial": ("cross", ROLE_INITIAL),
+    "Data/inputs/CrossTrim_after": ("cross", ROLE_AFTER),
+    "Data/inputs/BeamSpot": ("beam_spot", ROLE_SINGLE),
+}
+
+# 分组 -> 要执行的分析
+GROUP_ANALYSES = {
+    "thk": (ANALYSIS_WEDGE, ANALYSIS_COEFFICIENT),
+    "cross": (ANALYSIS_CROSS_TEST,),
+    "beam_spot": (ANALYSIS_BEAM_SPOT,),
+}
+
+# 分析 -> 必需的参数；未配置时不提交，在日志中记为 skipped
+REQUIRED_SETTINGS = {
+    ANALYSIS_COEFFICIENT: ("simulation_file", "target_value"),
+}
+
+OUTPUT_DIR = "Data/outputs/AutoAnalysis"
+LOG_NAME = "auto_analysis_log.csv"
+LOG_COLUMNS = ["time", "analysis", "key", "inputs", "status", "output_dir", "message"]
+
+# 文件大小和修改时间保持不变多少秒后视为写入完成
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify 事件（linux/inotify.h）
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# 初始/刻蚀后文件名中的角色词（含常见拼写 "intial"），无晶圆编号时去掉后作为配对键
+_ROLE_WORDS = re.compile(r"initial|intial|after", re.IGNORECASE)
+
+
+def _is_input_file(name):
+    return name.lower().endswith(".csv") and not name.startswith(".")
+
+
+class PollingWatcher:
+    """用 os.scandir 快照比较检测新增或变化的文件（所有平台可用）"""
+
+    def __init__(self, directories, interval=DEFAULT_POLL_INTERVAL):
+        self.directories = [Path(d) for d in directories]
+        self.interval = interval
+        # 启动时已存在的文件作为基线，不视为新文件
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as it:
+                    for item in it:
+                        if item.is_file() and _is_input_file(item.name):
+                            stat = item.stat()
+                            snapshot[item.path] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+    def poll(self, timeout=None):
+        """等待一个轮询周期，返回新增或变化的文件路径"""
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = [path for path, state in snapshot.items() if self._snapshot.get(path) != state]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify 监视（ctypes 调用 libc，无需第三方依赖）"""
+
+    def __init__(self, directories):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._watches = {}
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        for directory in directories:
+            directory = Path(directory)
+            if not directory.is_dir():
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"无法监视目录: {directory}")
+            self._watches[wd] = directory
+
+    def poll(self, timeout=None):
+        """等待事件（最多 timeout 秒），返回涉及的文件路径"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if wd in self._watches and _is_input_file(name):
+                changed.append(str(self._watches[wd] / name))
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directories, poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=None):
+    """Linux 上优先使用 inotify，不可用时退回轮询"""
+    if use_inotify is None:
+        use_inotify = sys.platform.startswith("linux")
+    if use_inotify:
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify 不可用，改用轮询: {e}")
+    return PollingWatcher(directories, poll_interval)
+
+
+class _Debouncer:
+    """文件大小和修改时间在 settle_seconds 内保持不变后才视为写入完成"""
+
+    def __init__(self, settle_seconds):
+        self.settle_seconds = settle_seconds
+        self._pending = {}  # 路径 -> (大小, 修改时间, 状态开始时间)
+
+    def touch(self, path):
+        self._pending.setdefault(path, (None, None, time.monotonic()))
+
+    def ready(self):
+        now = time.monotonic()
+        done = []
+        for path, (size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            if state != (size, mtime_ns):
+                self._pending[path] = (*state, now)
+            elif stat.st_size > 0 and now - since >= self.settle_seconds:
+                del self._pending[path]
+                done.append(path)
+        return done
+
+    def __len__(self):
+        return len(self._pending)
+
+
+def pairing_key(path):
+    """配对键: 文件名中的晶圆编号；没有编号时为去掉 initial/after 后的文件名"""
+    name = Path(path).name
+    wafer_id = parse_wafer_id(name)
+    if wafer_id is not None:
+        return wafer_id
+    stem = _ROLE_WORDS.sub("", Path(name).stem.lower())
+    return re.sub(r"[\s_\-]+", "_", stem).strip("_")
+
+
+def _jsonable(value):
+    """把分析结果转换为可写入JSON的类型（数组只保留标量和短数组）"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist() if value.size <= 1000 else f"<array {value.shape}>"
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Path):
+        return str(value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return f"<{type(value).__name__}>"
+
+
+def _run_wedge(inputs, settings, output_dir):
+    from core.wedgeTestResult_analyzer import WedgeTestAnalyzer
+
+    recipe_file = settings.get("recipe_file")
+    if recipe_file is None:
+        from utils.file_catalog import get_catalog, KIND_RECIPE
+        entry = get_catalog().latest(KIND_RECIPE)
+        if entry is None:
+            raise FileNotFoundError("找不到WedgeTest Recipe文件")
+        recipe_file = entry.path
+
+    analyzer = WedgeTestAnalyzer()
+    analyzer.load_recipe(recipe_file)
+    analyzer.load_thickness(inputs[ROLE_INITIAL], inputs[ROLE_AFTER])
+    analyzer.transfer_trimming_amount()
+    slope = analyzer.calculate_slope()
+    result = {
+        "recipe_file": recipe_file,
+        "slope": slope,
+        "regression_data": analyzer.export_regression_data(output_dir),
+    }
+    # 整图配准的中心偏移只有判定可信时才写入结果
+    try:
+        offset = analyzer.estimate_center_offset(slope)
+    except ValueError as e:
+        result["center_offset_error"] = str(e)
+    else:
+        if offset["plausible"]:
+            result["center_offset"] = offset
+        else:
+            result["center_offset_error"] = (
+                f"整图配准结果不可信 (相关度 {offset['strength']:.4f}, 峰对比度 {offset['contrast']:.2e})"
+            )
+    return result
+
+
+def _run_cross_test(inputs, settings, output_dir):
+    from core.cross_test_stagecenter_analyzer import StageCenterAnalyzer
+
+    analyzer = StageCenterAnalyzer()
+    analyzer.load_files(inputs[ROLE_INITIAL], inputs[ROLE_AFTER])
+    old_center_x, old_center_y = settings.get("old_center", (0.0, 0.0))
+    results = analyzer.calculate_results(old_center_x, old_center_y)
+    # 截面数组和完整DataFrame只在界面绘图时使用
+    results.pop("arm_profiles", None)
+    results.pop("etching_df", None)
+    return results
+
+
+def _run_coefficient(inputs, settings, output_dir):
+    from core.beamCoefficient_Calculator import BeamCoefficientCalculator
+
+    simulation_file = settings.get("simulation_file")
+    target_value = settings.get("target_value")
+    if simulation_file is None or target_value is None:
+        raise ValueError("未配置Simulation文件或目标膜厚")
+
+    calculator = BeamCoefficientCalculator()
+    if not calculator.process_simulation_file(simulation_file, target_value):
+        raise ValueError(calculator.last_error)
+    if not calculator.calculate_coefficient(inputs[ROLE_INITIAL], inputs[ROLE_AFTER]):
+        raise ValueError(calculator.last_error)
+    report = calculator.match_report
+    return {
+        "slope": calculator.slope,
+        "r_squared": calculator.r_squared,
+        "matched": report["matched"],
+        "simulation_unmatched": len(report["simulation_unmatched"]),
+        "initial_unmatched": len(report["initial_unmatched"]),
+        "after_unmatched": len(report["after_unmatched"]),
+    }
+
+
+def _run_beam_spot(inputs, settings, output_dir):
+    from core.beam_spot_test import BeamSpotTestProcessor
+
+    processor = BeamSpotTestProcessor()
+    processor.load_and_process(inputs[ROLE_SINGLE], settings.get("target_radius"))
+    return {
+        "radius": processor.radius,
+        "thk_max": processor.thk_max,
+        "thk_min": processor.thk_min,
+        "original_center": processor.original_center,
+        "max_etching_position": processor.max_etching_position,
+        "background_thickness": processor.background_thickness,
+    }
+
+
+_RUNNERS = {
+    ANALYSIS_WEDGE: _run_wedge,
+    ANALYSIS_CROSS_TEST: _run_cross_test,
+    ANALYSIS_COEFFICIENT: _run_coefficient,
+    ANALYSIS_BEAM_SPOT: _run_beam_spot,
+}
+
+
+def run_job(analysis, inputs, settings, output_dir):
+    """
+    在工作进程中执行一项分析，结果写入 output_dir/result.json
+
+    返回:
+    dict: 可JSON化的分析结果
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    result = _jsonable(_RUNNERS[analysis](inputs, settings, output_dir))
+    payload = {"analysis": analysis, "inputs": _jsonable(inputs), "result": result}
+    (output_dir / "result.json").write_text(
+        json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+    return result
+
+
+class AutoAnalysisService:
+    """
+    监视量测文件目录，文件写入完成后自动配对并分发分析
+
+    - 初始/刻蚀后文件按晶圆编号（或去掉 initial/after 的文件名）配对，
+      两者都到齐后对该分组的每种分析提交一个任务；单文件分组（Beam Spot）直接提交。
+    - 分析在进程池中并行执行，结果写入 Data/outputs/AutoAnalysis/<分析>/<配对键>_<时间>/，
+      每个任务的状态追加到 auto_analysis_log.csv。
+    """
+
+    def __init__(self, routes=None, settings=None, max_workers=None,
+                 settle_seconds=DEFAULT_SETTLE_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL,
+                 use_inotify=None, output_dir=None):
+        """
+        参数:
+        routes: 目录 -> (分组, 角色)，缺省为 DEFAULT_ROUTES
+        settings: 分析参数，如 recipe_file, simulation_file, target_value,
+                  old_center (十字测试原中心), target_radius (Beam Spot目标半径)
+        max_workers: 工作进程数，缺省为CPU核数
+        """
+        routes = DEFAULT_ROUTES if routes is None else routes
+        self.routes = {}
+        for directory, route in routes.items():
+            directory = Path(directory)
+            if not directory.is_absolute():
+                directory = ensure_dir(str(directory))
+            self.routes[str(directory)] = route
+        self.settings = dict(settings or {})
+        self.max_workers = max_workers
+        self.output_dir = Path(output_dir) if output_dir else get_resource_path(OUTPUT_DIR)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self._debouncer = _Debouncer(settle_seconds)
+        self._pairs = {}        # (分组, 配对键) -> {角色: 路径}
+        self._futures = set()
+        self._log_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._watcher = None
+
+    def _route_for(self, path):
+        return self.routes.get(str(Path(path).parent))
+
+    def file_ready(self, path):
+        """
+        处理一个已写入完成的文件: 配对后提交分析
+
+        返回:
+        list: 提交的 Future
+        """
+        route = self._route_for(path)
+        if route is None:
+            return []
+        group, role = route
+        if role == ROLE_SINGLE:
+            return self._dispatch(group, pairing_key(path), {ROLE_SINGLE: str(path)})
+
+        key = (group, pairing_key(path))
+        pair = self._pairs.setdefault(key, {})
+        pair[role] = str(path)
+        if ROLE_INITIAL in pair and ROLE_AFTER in pair:
+            del self._pairs[key]
+            return self._dispatch(group, key[1], pair)
+        logger.info(f"等待配对文件: {path} (配对键 {key[1]})")
+        return []
+
+    def _dispatch(self, group, key, inputs):
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        futures = []
+        for analysis in GROUP_ANALYSES[group]:
+            missing = [name for name in REQUIRED_SETTINGS.get(analysis, ())
+                       if self.settings.get(name) is None]
+            if missing:
+                logger.info(f"跳过分析 {analysis} ({key}): 未配置 {', '.join(missing)}")
+                self._write_log(analysis, key, inputs, "skipped", "", f"未配置 {', '.join(missing)}")
+                continue
+            output_dir = self.output_dir / analysis / f"{key}_{stamp}"
+            future = self._executor.submit(run_job, analysis, inputs, self.settings, str(output_dir))
+            future.add_done_callback(
+                lambda f, a=analysis, o=output_dir: self._job_done(f, a, key, inputs, o)
+            )
+            self._futures.add(future)
+            futures.append(future)
+            logger.info(f"提交分析 {analysis}: {key} <- {list(inputs.values())}")
+        return futures
+
+    def _job_done(self, future, analysis, key, inputs, output_dir):
+        self._futures.discard(future)
+        error = future.exception()
+        status = "failed" if error else "done"
+        message = str(error) if error else ""
+        if error:
+            logger.error(f"分析失败 {analysis} ({key}): {error}")
+        else:
+            logger.info(f"分析完成 {analysis} ({key}) -> {output_dir}")
+        self._write_log(analysis, key, inputs, status, output_dir, message)
+
+    def _write_log(self, analysis, key, inputs, status, output_dir, message):
+        """追加一行任务状态 (done / failed / skipped) 到 auto_analysis_log.csv"""
+        row = [datetime.now().isoformat(timespec="seconds"), analysis, key,
+               ";".join(inputs.values()), status, str(output_dir), message]
+        log_path = self.output_dir / LOG_NAME
+        with self._log_lock:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not log_path.exists()
+            with open(log_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(LOG_COLUMNS)
+                writer.writerow(row)
+
+    def start(self):
+        """在后台线程中开始监视"""
+        if self._thread is not None:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._watcher = create_watcher(list(self.routes), self.poll_interval, self.use_inotify)
+        logger.info(f"开始监视 ({type(self._watcher).__name__}): {list(self.routes)}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="AutoAnalysisWatcher", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            # 有文件在等待稳定时缩短等待时间
+            timeout = self.poll_interval / 4 if len(self._debouncer) else self.poll_interval
+            try:
+                for path in self._watcher.poll(timeout):
+                    self._debouncer.touch(path)
+                for path in self._debouncer.ready():
+                    self.file_ready(path)
+            except Exception as e:
+                logger.exception(f"监视循环出错: {e}")
+
+    def stop(self, wait=True):
+        """停止监视；wait 为 True 时等待已提交的分析完成"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def pending_pairs(self):
+        """尚未配对完成的文件: {(分组, 配对键): {角色: 路径}}"""
+        return {key: dict(pair) for key, pair in self._pairs.items()}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="量测文件自动分析服务")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数")
+    parser.add_argument("--recipe", default=None, help="WedgeTest Recipe文件（缺省取最新）")
+    parser.add_argument("--simulation", default=None, help="Beam系数计算用的Simulation文件")
+    parser.add_argument("--target", type=float, default=None, help="Beam系数计算的目标膜厚")
+    parser.add_argument("--old-center", type=float, nargs=2, default=(0.0, 0.0), help="十字测试原中心坐标")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_INTERVAL, help="轮询间隔(秒)")
+    args = parser.parse_args()
+
+    from utils.logging_config import setup_logging
+    setup_logging()
+    settings = {"recipe_file": args.recipe, "simulation_file": args.simulation,
+                "target_value": args.target, "old_center": tuple(args.old_center)}
+    service = AutoAnalysisService(settings=settings, max_workers=args.workers, poll_interval=args.poll)
+    service.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,26 @@
 import csv
 import numpy as np
-from matplotlib.figure import Figure
-from PyQt5.QtWidgets import QMessageBox
-import pandas as pd
+
+from core.thickness_loader import DEFAULT_COORD_TOLERANCE, load_thickness_map, match_points
 
 class BeamCoefficientCalculator:
-    def __init__(self):
+    def __init__(self, tolerance=DEFAULT_COORD_TOLERANCE):
         # 初始化变量
-        self.set_values = []
-        self.pre_values = []
-        self.post_values = []
-        self.actual_values = []
+        self.tolerance = tolerance  # 坐标匹配容差 (mm)
+        self.simulation_map = None
+        self.set_values = np.empty(0)
+        self.pre_values = np.empty(0)
+        self.post_values = np.empty(0)
+        self.actual_values = np.empty(0)
+        self.matched_set_values = np.empty(0)
+        self.matched_x = np.empty(0)
+        self.matched_y = np.empty(0)
+        self.match_report = None
+        self.last_error = None  # 最近一次错误消息
         self.slope = None
         self.r_squared = None
-        self.fig = None  # 保存图表对象
         self.simulation_file_path = None
         self.target_value = 0.0
-        
-        # 创建默认图表
-        self._create_empty_plot()
-    
-    def _create_empty_plot(self):
-        """创建空图表"""
-        self.fig = Figure(figsize=(8, 6))
-        self.fig.suptitle('请先加载数据并计算系数')
-        ax = self.fig.add_subplot(111)
-        ax.text(0.5, 0.5, "数据未加载", 
-                ha='center', va='center', fontsize=12)
-        ax.set_axis_off()
     
     def process_simulation_file(self, simulation_path, target_value):
         """
@@ -37,15 +30,12 @@ class BeamCoefficientCalculator:
             return None
         
         try:
-            # 使用pandas读取文件，更简单处理CSV
-            df = pd.read_csv(simulation_path)
+            # 使用统一加载器读取文件（不足3列时抛出异常）
+            simulation_map = load_thickness_map(simulation_path)
             
-            # 验证文件至少有3列
-            if df.shape[1] < 3:
-                raise ValueError("Simulation文件必须至少包含3列数据")
-            
-            # 提取第三列数据并减去目标值
-            self.set_values = (df.iloc[:, 2] - float(target_value)).values.tolist()
+            # 保留坐标用于与厚度文件按 (X, Y) 对齐，数值列减去目标值
+            self.simulation_map = simulation_map
+            self.set_values = simulation_map.thickness - float(target_value)
             self.simulation_file_path = simulation_path
             self.target_value = float(target_value)
             
@@ -55,25 +45,52 @@ class BeamCoefficientCalculator:
             self._show_error(error_msg)
             return False
         
-    def _load_thickness_file(self, file_path, target_list):
-        """读取厚度文件，只提取第三列数据"""
-        target_list.clear()  # 清空现有数据
-        
+    def _load_thickness_file(self, file_path):
+        """读取厚度文件，返回 ThicknessMap，失败时返回 None"""
         try:
-            # 使用pandas读取文件
-            df = pd.read_csv(file_path)
-            
-            # 验证文件至少有3列
-            if df.shape[1] < 3:
-                raise ValueError("文件必须至少包含3列数据")
-            
-            # 提取第三列数据
-            target_list.extend(df.iloc[:, 2].values.tolist())
-            return True
+            # 使用统一加载器读取文件（不足3列时抛出异常）
+            return load_thickness_map(file_path)
         except Exception as e:
             error_msg = f"读取厚度文件失败: {str(e)}"
             self._show_error(error_msg)
-            return False
+            return None
+    
+    def align_points(self, pre_map, post_map):
+        """
+        以Simulation文件的坐标为基准，按 (X, Y) 在容差内对齐初始/刻蚀后厚度
+        
+        返回:
+        tuple: (Simulation点索引, 初始厚度点索引, 刻蚀后厚度点索引, 未匹配报告)
+        """
+        sim = self.simulation_map
+        pre_index = match_points(pre_map.x, pre_map.y, sim.x, sim.y, self.tolerance)
+        post_index = match_points(post_map.x, post_map.y, sim.x, sim.y, self.tolerance)
+        matched = (pre_index >= 0) & (post_index >= 0)
+        
+        # 数值缺失的点同样不参与回归
+        sim_index = np.flatnonzero(matched)
+        pre_index, post_index = pre_index[matched], post_index[matched]
+        finite = (
+            np.isfinite(self.set_values[sim_index])
+            & np.isfinite(pre_map.thickness[pre_index])
+            & np.isfinite(post_map.thickness[post_index])
+        )
+        
+        # 厚度文件中未被Simulation覆盖的点
+        pre_used = np.zeros(len(pre_map), dtype=bool)
+        pre_used[pre_index] = True
+        post_used = np.zeros(len(post_map), dtype=bool)
+        post_used[post_index] = True
+        
+        unmatched_sim = np.flatnonzero(~matched)
+        report = {
+            "matched": int(finite.sum()),
+            "invalid": int((~finite).sum()),
+            "simulation_unmatched": np.column_stack([sim.x[unmatched_sim], sim.y[unmatched_sim]]),
+            "initial_unmatched": np.column_stack([pre_map.x[~pre_used], pre_map.y[~pre_used]]),
+            "after_unmatched": np.column_stack([post_map.x[~post_used], post_map.y[~post_used]]),
+        }
+        return sim_index[finite], pre_index[finite], post_index[finite], report
     
     def calculate_coefficient(self, initial_path, after_path):
         """计算beam系数"""
@@ -82,52 +99,61 @@ class BeamCoefficientCalculator:
             return False
         
         try:
+            if self.simulation_map is None:
+                raise ValueError("请先处理Simulation文件")
+            
             # 1. 读取初始厚度文件
-            if not self._load_thickness_file(initial_path, self.pre_values):
+            pre_map = self._load_thickness_file(initial_path)
+            if pre_map is None:
                 return False
             
             # 2. 读取刻蚀后厚度文件
-            if not self._load_thickness_file(after_path, self.post_values):
+            post_map = self._load_thickness_file(after_path)
+            if post_map is None:
                 return False
             
-            # 3. 检查数据长度是否一致
-            if len(self.pre_values) != len(self.post_values):
-                raise ValueError(f"初始厚度文件长度({len(self.pre_values)})与刻蚀后厚度文件长度({len(self.post_values)})不匹配")
-            
-            # 4. 检查set_values长度
-            if len(self.set_values) != len(self.pre_values):
+            # 3. 按坐标对齐三个文件（与行顺序无关）
+            sim_index, pre_index, post_index, report = self.align_points(pre_map, post_map)
+            self.match_report = report
+            unmatched = (
+                len(report["simulation_unmatched"]) + len(report["initial_unmatched"])
+                + len(report["after_unmatched"])
+            )
+            if unmatched or report["invalid"]:
                 self._show_warning(
-                    f"Simulation文件长度({len(self.set_values)})与厚度文件长度({len(self.pre_values)})不匹配\n"
-                    f"使用较小长度进行截断计算"
+                    f"坐标未匹配的点: Simulation {len(report['simulation_unmatched'])}个, "
+                    f"初始厚度 {len(report['initial_unmatched'])}个, "
+                    f"刻蚀后厚度 {len(report['after_unmatched'])}个; "
+                    f"数值缺失 {report['invalid']}个\n"
+                    f"仅使用{report['matched']}个匹配点计算"
                 )
-                min_length = min(len(self.set_values), len(self.pre_values))
-                self.set_values = self.set_values[:min_length]
-                self.pre_values = self.pre_values[:min_length]
-                self.post_values = self.post_values[:min_length]
-            
-            # 5. 计算actual_value = pre - post
-            self.actual_values = np.array(self.pre_values) - np.array(self.post_values)
-            
-            # 6. 确保有数据用于计算
-            if len(self.set_values) < 1 or len(self.actual_values) < 1:
-                raise ValueError("没有足够的数据用于计算")
             
-            # 7. 线性回归 y = q*x (无需截距)
-            x = np.array(self.set_values).flatten()
-            y = self.actual_values.flatten()
-            
-            # 计算斜率 q = sum(x*y) / sum(x^2)
-            numerator = np.sum(x * y)
-            denominator = np.sum(x * x)
+            # 4. 对齐后的数组，actual_value = pre - post
+            x = self.set_values[sim_index]
+            self.pre_values = pre_map.thickness[pre_index]
+            self.post_values = post_map.thickness[post_index]
+            y = self.pre_values - self.post_values
+            self.matched_set_values = x
+            self.actual_values = y
+            self.matched_x = self.simulation_map.x[sim_index]
+            self.matched_y = self.simulation_map.y[sim_index]
+            
+            # 5. 确保有数据用于计算
+            if len(x) < 1:
+                raise ValueError("没有坐标匹配的数据用于计算")
+            
+            # 6. 线性回归 y = q*x (无需截距)，斜率 q = sum(x*y) / sum(x^2)
+            denominator = x @ x
             if denominator == 0:
                 raise ValueError("分母为0，无法计算斜率")
             
-            self.slope = numerator / denominator
+            self.slope = (x @ y) / denominator
             
-            # 8. 计算R平方
-            y_pred = self.slope * x
-            ss_res = np.sum((y - y_pred)**2)
-            ss_tot = np.sum((y - np.mean(y))**2)
+            # 7. 计算R平方
+            residual = y - self.slope * x
+            ss_res = residual @ residual
+            centered = y - y.mean()
+            ss_tot = centered @ centered
             if ss_tot < 1e-10:  # 避免除以0
                 self.r_squared = 1.0
             else:
@@ -139,52 +165,9 @@ class BeamCoefficientCalculator:
             self._show_error(error_msg)
             return False
     
-    def plot_data(self):
-        """创建散点图和回归线"""
-        try:
-            # 如果数据不足，返回空图表
-            if len(self.set_values) == 0 or len(self.actual_values) == 0 or self.slope is None:
-                self._create_empty_plot()
-                return self.fig
-            
-            self.fig = Figure(figsize=(8, 6))
-            ax = self.fig.add_subplot(111)
-            
-            # 绘制散点图
-            ax.scatter(
-                self.set_values, 
-                self.actual_values, 
-                alpha=0.7,
-                label='实测点'
-            )
-            
-            # 绘制回归线
-            x_min = min(self.set_values)
-            x_max = max(self.set_values)
-            y_min = self.slope * x_min
-            y_max = self.slope * x_max
-            ax.plot(
-                [x_min, x_max], [y_min, y_max], 
-                color='red', 
-                linestyle='-',
-                linewidth=1.5,
-                label=f'拟合直线 (y={self.slope:.4f}x, R²={self.r_squared:.4f})'
-            )
-            
-            ax.set_title('实际变化值 vs. 设定变化值')
-            ax.set_xlabel(f'设定变化值 (Simulation目标值: {self.target_value:.2f})')
-            ax.set_ylabel('实际变化值 (初始厚度 - 刻蚀后厚度)')
-            ax.grid(True, linestyle='--', alpha=0.5)
-            ax.legend()
-            
-            return self.fig
-        except Exception as e:
-            error_msg = f"生成图表失败: {str(e)}"
-            self._show_error(error_msg)
-            return self._create_empty_plot()
-    
     def _show_error(self, message):
         """显示错误消息"""
+        self.last_error = message
         print(f"错误: {message}")
     
     def _show_warning(self, message):
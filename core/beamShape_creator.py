@@ -1,6 +1,4 @@
 import numpy as np
-import pandas as pd
-from scipy.interpolate import interp1d, CubicSpline, PchipInterpolator
 
 class BeamShapeCreator:
     def __init__(self):
@@ -14,6 +12,7 @@ class BeamShapeCreator:
         
     def calculate_fwhm(self, coords, values):
         """计算半高宽(FWHM)"""
+        from scipy.interpolate import interp1d
         # 增加插值提高计算精度
         interp = interp1d(coords, values, kind='cubic')
         dense_x = np.linspace(coords.min(), coords.max(), 1000)
@@ -85,6 +84,7 @@ class BeamShapeCreator:
 
     def load_and_normalize_data(self, x_path, y_path):
         """加载并预处理数据"""
+        import pandas as pd
         # 读取原始数据
         df_x = pd.read_csv(x_path, header=None).dropna().values.T
         df_y = pd.read_csv(y_path, header=None).dropna().values.T
@@ -125,6 +125,7 @@ class BeamShapeCreator:
 
     def create_axis_interpolators(self, x_coords, x_vals, y_coords, y_vals, plane_size):
         """创建插值函数"""
+        import pandas as pd
         # 扩展数据确保覆盖平面范围
         def extend_axis(orig_coords, orig_vals, boundary):
             """扩展数据点"""
@@ -208,20 +209,8 @@ class BeamShapeCreator:
         # 获取已缩放的插值器
         (interp_x, _), (interp_y, _) = interp_info_x, interp_info_y
     
-        # 计算各方向值
-        a_vals = interp_x(xx.ravel()).reshape(xx.shape)
-        b_vals = interp_y(yy.ravel()).reshape(yy.shape)
-    
-        # 根据用户选择的方法合并
-        if self.average_method == "几何平均":
-            # 几何平均（保证能量守恒）
-            z_matrix = np.sqrt(a_vals * b_vals)
-        elif self.average_method == "算术平均":
-            # 算术平均
-            z_matrix = (a_vals + b_vals) / 2
-        else:
-            # 默认回退到几何平均
-            raise ValueError(f"未知的平均方法: {self.average_method}")
+        # 计算各方向值并按用户选择的方法合并
+        z_matrix = self.sample_cut_lines(interp_info_x, interp_info_y, xx, yy)
     
         # 根据选择的边缘处理方法应用不同的边缘过渡
         if self.edge_method == "指数衰减":
@@ -242,6 +231,31 @@ class BeamShapeCreator:
         return coords, result_matrix
     
 
+    def combine_axis_values(self, a_vals, b_vals):
+        """按平均方法合并X/Y方向强度"""
+        if self.average_method == "几何平均":
+            # 几何平均（保证能量守恒）
+            return np.sqrt(a_vals * b_vals)
+        elif self.average_method == "算术平均":
+            # 算术平均
+            return (a_vals + b_vals) / 2
+        raise ValueError(f"未知的平均方法: {self.average_method}")
+
+    def sample_cut_lines(self, interp_info_x, interp_info_y, x_points, y_points):
+        """
+        沿任意切线批量计算合并后的强度剖面
+
+        x_points / y_points 可为任意形状（如 (切线数, 点数)），
+        所有切线上的点合并后每个插值器只调用一次。
+        """
+        (interp_x, _), (interp_y, _) = interp_info_x, interp_info_y
+        x_points, y_points = np.broadcast_arrays(
+            np.asarray(x_points, dtype=float), np.asarray(y_points, dtype=float)
+        )
+        a_vals = np.asarray(interp_x(x_points.ravel()), dtype=float).reshape(x_points.shape)
+        b_vals = np.asarray(interp_y(y_points.ravel()), dtype=float).reshape(y_points.shape)
+        return self.combine_axis_values(a_vals, b_vals)
+
     def apply_z_shift(self, z_matrix, max_l):
         """应用z轴下移边缘处理 - 在非零区域边界找到最大值并整体下移"""
         # 找到非零区域的边界索引
@@ -298,6 +312,7 @@ class BeamShapeCreator:
     @staticmethod
     def save_as_csv(z_data, coords, output_path):
         """保存CSV文件"""
+        import pandas as pd
         x_labels = [f"{x:.4f}" for x in coords]
         y_labels = [f"{y:.4f}" for y in coords[::-1]]
         df = pd.DataFrame(z_data, columns=x_labels, index=y_labels)
@@ -309,6 +324,7 @@ class BeamShapeCreator:
         
     def _create_cubic_spline(self, coords, values):
         """三次样条插值"""
+        from scipy.interpolate import interp1d
         return interp1d(
             coords, values,
             kind='cubic',
@@ -318,6 +334,7 @@ class BeamShapeCreator:
 
     def _create_pchip(self, coords, values):
         """PCHIP保形插值"""
+        from scipy.interpolate import PchipInterpolator
         interp = PchipInterpolator(coords, values, extrapolate=None)
         return lambda x: np.where( 
             x < coords[0], 0.0,
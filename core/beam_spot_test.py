@@ -1,8 +1,7 @@
 import numpy as np
-import pandas as pd
-from scipy.interpolate import griddata
 import logging
-import matplotlib.pyplot as plt
+
+from core.thickness_loader import load_thickness_map
 
 logger = logging.getLogger('BeamSpotTest')
 
@@ -66,18 +65,15 @@ class BeamSpotTestProcessor:
     
     def _load_data(self, file_path):
         """加载厚度数据文件"""
-        self.original_df = pd.read_csv(file_path)
-        
-        if len(self.original_df) != 961:
-            raise ValueError(f"文件应包含961行数据，实际有{len(self.original_df)}行")
+        thickness_map = load_thickness_map(file_path)
+        self.original_df = thickness_map.to_dataframe()
         
-        columns = self.original_df.columns.tolist()
-        if len(columns) < 3:
-            raise ValueError(f"文件应包含至少3列数据，实际有{len(columns)}列")
+        if len(thickness_map) != 961:
+            raise ValueError(f"文件应包含961行数据，实际有{len(thickness_map)}行")
         
-        self.X = self.original_df.iloc[:, 0].values.astype(float)
-        self.Y = self.original_df.iloc[:, 1].values.astype(float)
-        self.thickness = self.original_df.iloc[:, 2].values.astype(float)
+        self.X = thickness_map.x
+        self.Y = thickness_map.y
+        self.thickness = thickness_map.thickness
         
         # 计算厚度范围
         self.thk_max = np.max(self.thickness)
@@ -139,7 +135,7 @@ class BeamSpotTestProcessor:
         else:
             # 计算有效半径
             self.radius = np.mean(low_etching_distances)
-            logger.info(f"蚀刻能力有效半径: {self.radius:.2f} mm")
+            logger.debug("蚀刻能力有效半径: %.2f mm", self.radius)
     
     def _find_background_for_radius(self, target_radius, max_iterations=100, tolerance=0.01):
         """
@@ -185,16 +181,16 @@ class BeamSpotTestProcessor:
                 if self.radius < target_radius:
                     # 当前有效半径小于目标，需要增大背景厚度（使半径变大）
                     direction = 1
-                    logger.info("设定迭代方向: 增大背景厚度（当前半径小于目标）")
+                    logger.debug("设定迭代方向: 增大背景厚度（当前半径小于目标）")
                 else:
                     # 当前有效半径大于目标，需要减小背景厚度（使半径变小）
                     direction = -1
-                    logger.info("设定迭代方向: 减小背景厚度（当前半径大于目标）")
+                    logger.debug("设定迭代方向: 减小背景厚度（当前半径大于目标）")
             
             # 在接近目标时减小步长
             if step_size > 0.01 and current_error < 0.5:
                 step_size = 0.01
-                logger.info(f"减小步长至 {step_size:.2f} nm")
+                logger.debug("减小步长至 %.2f nm", step_size)
             
             # 更新背景厚度
             prev_background = current_background
@@ -216,7 +212,9 @@ class BeamSpotTestProcessor:
                 best_radius = self.radius
                 min_error = abs(best_radius - target_radius)
             
-            logger.info(f"迭代 {i+1}: 背景厚度={current_background:.2f} nm, 有效半径={self.radius:.2f} mm, 目标误差={current_error:.4f} mm, 最佳误差={min_error:.4f} mm")
+            # 每次迭代的记录只在 DEBUG 级别输出，参数延迟格式化
+            logger.debug("迭代 %d: 背景厚度=%.2f nm, 有效半径=%.2f mm, 目标误差=%.4f mm, 最佳误差=%.4f mm",
+                         i + 1, current_background, self.radius, current_error, min_error)
             
             # 检查是否出现误差增大
             if abs(self.radius - target_radius) > min_error and i > 15:
@@ -239,6 +237,7 @@ class BeamSpotTestProcessor:
     
     def _interpolate_data(self):
         """插值生成高分辨率网格数据"""
+        from scipy.interpolate import griddata
         min_coord = -15
         max_coord = 15
         grid_step = 0.1
@@ -1,28 +1,33 @@
 import numpy as np
-import pandas as pd
 import os
 from pathlib import Path
 
-def load_and_resample_csv(filepath, total_points=31, shift_range=15):
-    """加载并重采样CSV文件数据"""
-    data = pd.read_csv(filepath, header=None)
-    positions = data.iloc[:, 0].values
-    depths = data.iloc[:, 1].values
+def profile_positions(pitch=1.0, extent=15.0):
+    """生成以0为中心、范围[-extent, extent]、间隔pitch的采样坐标"""
+    if pitch <= 0 or extent <= 0:
+        raise ValueError(f"采样间隔和范围必须为正数: pitch={pitch}, extent={extent}")
+    total_points = int(round(2 * extent / pitch)) + 1
+    return np.linspace(-extent, extent, total_points)
+
+def resample_profile(positions, depths, pitch=1.0, extent=15.0):
+    """
+    将截面数据平移到峰值处并按 profile_positions(pitch, extent) 线性重采样
+
+    返回:
+    tuple: (重采样深度, 峰值原始位置, 重采样坐标)
+    """
+    positions = np.asarray(positions, dtype=float)
+    depths = np.asarray(depths, dtype=float)
     
     # 找到深度最大值的位置
     peak_idx = np.argmax(depths)
     center_offset = positions[peak_idx]
     
-    # 平移所有位置让最大值位于0点
-    shifted_positions = positions - center_offset
-    
-    # 创建新的插值坐标（1mm间隔）
-    x_new = np.linspace(-shift_range, shift_range, total_points)
-    
-    # 使用线性插值获取新位置的数据
+    # 平移所有位置让最大值位于0点，并在新坐标上线性插值
+    x_new = profile_positions(pitch, extent)
     interp_depths = np.interp(
         x_new, 
-        shifted_positions, 
+        positions - center_offset, 
         depths, 
         left=0.0, 
         right=0.0
@@ -30,17 +35,39 @@ def load_and_resample_csv(filepath, total_points=31, shift_range=15):
     
     return interp_depths, center_offset, x_new
 
+def load_and_resample_csv(filepath, total_points=31, shift_range=15, pitch=None):
+    """
+    加载并重采样CSV文件数据
+
+    指定pitch时按 profile_positions(pitch, shift_range) 采样，
+    否则沿用 total_points 个等间隔点（默认31点/1mm）。
+    """
+    import pandas as pd
+    data = pd.read_csv(filepath, header=None)
+    positions = data.iloc[:, 0].values
+    depths = data.iloc[:, 1].values
+    
+    if pitch is None:
+        pitch = 2 * shift_range / (total_points - 1)
+    return resample_profile(positions, depths, pitch=pitch, extent=shift_range)
+
 def save_shifted_profile(positions, depths, filename):
     """保存平移后的截面深度分布"""
+    import pandas as pd
     df = pd.DataFrame({
         'Position (mm)': positions,
         'Etching Depth': depths
     })
     df.to_csv(filename, index=False)
 
-def save_beamprofile_with_diffs(beam_profile, x_profile, y_profile, iteration, folder='beamprofile_iterations'):
-    """保存beamprofile矩阵并添加差异信息"""
+def save_beamprofile_with_diffs(beam_profile, x_profile, y_profile, iteration, folder='beamprofile_iterations',
+                                positions=None):
+    """保存beamprofile矩阵并添加差异信息（positions为x方向采样坐标，缺省时按1mm间隔）"""
+    import pandas as pd
     rows, cols = beam_profile.shape
+    if positions is None:
+        positions = np.arange(cols) - cols // 2
+    positions = np.round(np.asarray(positions, dtype=float), 6)
     
     # 计算行和（卷积x方向）和列和（卷积y方向）
     row_sums = np.sum(beam_profile, axis=1)
@@ -64,10 +91,10 @@ def save_beamprofile_with_diffs(beam_profile, x_profile, y_profile, iteration, f
     df = pd.DataFrame(extended_beam)
     
     # 添加行列标签
-    y_labels = [f"y={15-i}mm" for i in range(rows)] + ['Y-Conv Diff']
+    y_labels = [f"y={pos:g}mm" for pos in positions[::-1][:rows]] + ['Y-Conv Diff']
     df.insert(0, 'Row/Y-Position', y_labels)
     
-    x_labels = [f"x={i-15}mm" for i in range(cols)] + ['X-Conv Diff']
+    x_labels = [f"x={pos:g}mm" for pos in positions] + ['X-Conv Diff']
     df.columns = ['Position'] + x_labels
     
     # 保存到文件
@@ -79,6 +106,7 @@ def save_beamprofile_with_diffs(beam_profile, x_profile, y_profile, iteration, f
 
 def save_initial_profiles(x_pos, x_data, y_pos, y_data, folder, filename="shifted_initial_profiles.csv"):
     """保存用于计算循环的初始截面数据"""
+    import pandas as pd
     # 反转y_data以匹配beamprofile的行顺序
     reversed_y_data = y_data[::-1]
     
@@ -94,172 +122,397 @@ def save_initial_profiles(x_pos, x_data, y_pos, y_data, folder, filename="shifte
     df.to_csv(file_path, index=False)
     return file_path
 
-def reconstruct_beam_profile(x_file, y_file, output_dir):
-    """重构光束轮廓主函数"""
-    # 确保输出目录存在
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 创建存放迭代和临时结果的文件夹
-    iter_dir = output_dir / "beamprofile_iterations"
-    iter_dir.mkdir(exist_ok=True)
+class IterationHistory:
+    """
+    重构迭代历史（保存在内存中）
+
+    中间迭代只记录每行权重 (beam_profile = outer(权重, unit_of_x_crosssect))，
+    最终结果记录完整矩阵。需要时再通过 export_csv 按需生成可读CSV，
+    或通过 save_npz 写入单个压缩文件。
+    """
+
+    def __init__(self, unit_profile, x_profile, y_profile, positions):
+        self.unit_profile = np.asarray(unit_profile, dtype=float)
+        self.x_profile = np.asarray(x_profile, dtype=float)
+        self.y_profile = np.asarray(y_profile, dtype=float)
+        self.positions = np.asarray(positions, dtype=float)
+        self.labels = []
+        self._row_weights = []
+        self.final_profile = None
+        self.negative_corrections = None  # 负值修正记录 (DataFrame)，无负值时为None
+        self.residuals = np.empty(0)      # 迭代求解器每次迭代的最大边缘残差
+
+    def record(self, label, row_weights):
+        """记录一次迭代的行权重"""
+        self.labels.append(label)
+        self._row_weights.append(np.array(row_weights, dtype=float))
+
+    def record_final(self, beam_profile):
+        """记录最终（负值修正后）的光束轮廓"""
+        self.final_profile = np.array(beam_profile, dtype=float)
+
+    def __len__(self):
+        return len(self.labels) + (self.final_profile is not None)
+
+    @property
+    def row_weights(self):
+        """所有迭代的行权重，形状为 (迭代数, 行数)"""
+        if not self._row_weights:
+            return np.empty((0, len(self.y_profile)))
+        return np.vstack(self._row_weights)
+
+    def profile(self, index):
+        """按迭代序号（或'final'）还原二维光束轮廓"""
+        if index == "final":
+            if self.final_profile is None:
+                raise KeyError("最终结果尚未记录")
+            return self.final_profile
+        return np.outer(self._row_weights[index], self.unit_profile)
+
+    def save_npz(self, filepath):
+        """将完整迭代历史写入单个压缩 .npz 文件"""
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            filepath,
+            labels=np.array([str(label) for label in self.labels]),
+            row_weights=self.row_weights,
+            unit_profile=self.unit_profile,
+            x_profile=self.x_profile,
+            y_profile=self.y_profile,
+            positions=self.positions,
+            residuals=self.residuals,
+            final_profile=self.final_profile if self.final_profile is not None else np.empty((0, 0))
+        )
+        return filepath
+
+    def export_csv(self, folder, iterations=None):
+        """
+        按需导出可读的逐次迭代CSV（iterations 缺省时导出全部，含'final'）
+
+        每次只还原一个矩阵并立即写出，不会一次性占用全部迭代的内存。
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        if iterations is None:
+            iterations = list(range(len(self.labels)))
+            if self.final_profile is not None:
+                iterations.append("final")
+
+        files = []
+        for index in iterations:
+            label = "final" if index == "final" else self.labels[index]
+            files.append(str(save_beamprofile_with_diffs(
+                self.profile(index),
+                self.x_profile,
+                self.y_profile,
+                label,
+                folder,
+                positions=self.positions
+            )))
+
+        if self.negative_corrections is not None:
+            self.negative_corrections.to_csv(folder / "negative_corrections.csv", index=False)
+        return files
+
+def elliptical_prior(x_profile, y_profile, positions, floor=1e-6):
+    """
+    由两个截面构造椭圆对称的先验轮廓（用于IPF）
+
+    按截面的均方根宽度 wx / wy 计算归一化椭圆半径 rho = sqrt((x/wx)^2 + (y/wy)^2)，
+    先验值取两截面（峰值归一化、左右对称平均）在 rho*wx 与 rho*wy 处的平均。
+    与截面外积不同，该先验不可分离，IPF 需要多次迭代才能满足两组边缘约束。
+
+    参数:
+    x_profile: 列方向截面（按 positions 排列）
+    y_profile: 行方向截面（第0行对应 y=+extent）
+    positions: 截面坐标（以峰值为0点对称）
+    floor: 相对峰值的下限，保证先验处处为正
+
+    返回:
+    ndarray: (行数, 列数) 先验矩阵；截面宽度为0时返回全1矩阵
+    """
+    positions = np.asarray(positions, dtype=float)
+    y_positions = positions[::-1]
+    x_values = np.clip(np.asarray(x_profile, dtype=float), 0.0, None)
+    y_values = np.clip(np.asarray(y_profile, dtype=float), 0.0, None)
+    if x_values.max() <= 0 or y_values.max() <= 0:
+        return np.ones((len(y_values), len(x_values)))
+
+    width_x = np.sqrt(np.sum(x_values * positions ** 2) / np.sum(x_values))
+    width_y = np.sqrt(np.sum(y_values * y_positions ** 2) / np.sum(y_values))
+    if width_x <= 0 or width_y <= 0:
+        return np.ones((len(y_values), len(x_values)))
+
+    order = np.argsort(y_positions)
+    x_norm = x_values / x_values.max()
+    y_norm = (y_values / y_values.max())[order]
+    y_sorted = y_positions[order]
+
+    def symmetric(t, coords, values):
+        return 0.5 * (np.interp(t, coords, values, left=0.0, right=0.0)
+                      + np.interp(-t, coords, values, left=0.0, right=0.0))
+
+    rho = np.hypot(positions[None, :] / width_x, y_positions[:, None] / width_y)
+    prior = 0.5 * (symmetric(rho * width_x, positions, x_norm)
+                   + symmetric(rho * width_y, y_sorted, y_norm))
+    return prior + floor * prior.max()
+
+def solve_marginals_ipf(x_profile, y_profile, prior=None, tol=1e-9, max_iter=1000):
+    """
+    迭代比例拟合 (IPF / Sinkhorn) 求解非负二维光束轮廓
+
+    寻找 beam_profile = diag(u) @ prior @ diag(v)，使行和等于 y_profile、
+    列和等于 x_profile。负的截面值先截断为0，两个截面再缩放到相同总量
+    (两者总和的平均值)，否则边缘约束无解；缩放造成的与实测截面的偏差
+    由调用方通过 marginal_mismatch 报告。prior 缺省为全1矩阵，此时解即为
+    两截面的外积（一次迭代即收敛），实际重构使用 elliptical_prior。
+
+    返回:
+    tuple: (beam_profile, residual_history, converged)
+        residual_history 为每次迭代后行/列和与目标的最大绝对差
+    """
+    x_target = np.clip(np.asarray(x_profile, dtype=float), 0.0, None)
+    y_target = np.clip(np.asarray(y_profile, dtype=float), 0.0, None)
+    sum_x, sum_y = x_target.sum(), y_target.sum()
+    if sum_x <= 0 or sum_y <= 0:
+        raise ValueError("截面数据总和必须为正，无法进行比例拟合")
+    
+    total = (sum_x + sum_y) / 2
+    x_target *= total / sum_x
+    y_target *= total / sum_y
+    
+    if prior is None:
+        kernel = np.ones((len(y_target), len(x_target)))
+    else:
+        kernel = np.asarray(prior, dtype=float)
+        if kernel.shape != (len(y_target), len(x_target)):
+            raise ValueError(f"先验矩阵尺寸 {kernel.shape} 与截面长度不匹配")
+        if np.any(kernel < 0):
+            raise ValueError("先验矩阵不能包含负值")
+    
+    u = np.ones(len(y_target))
+    v = np.ones(len(x_target))
+    residual_history = []
+    converged = False
+    
+    for _ in range(max_iter):
+        # 行缩放：使行和匹配 y 截面
+        row_sums = kernel @ v
+        u = np.divide(y_target, row_sums, out=np.zeros_like(u), where=row_sums > 0)
+        # 列缩放：使列和匹配 x 截面
+        col_sums = kernel.T @ u
+        v = np.divide(x_target, col_sums, out=np.zeros_like(v), where=col_sums > 0)
+        
+        # 列缩放后列和精确匹配，残差由行和决定
+        row_residual = np.abs(u * (kernel @ v) - y_target).max()
+        col_residual = np.abs(v * (kernel.T @ u) - x_target).max()
+        residual = max(row_residual, col_residual)
+        residual_history.append(residual)
+        if residual <= tol * total:
+            converged = True
+            break
     
-    # 加载数据并重采样
-    x_profile, x_offset, x_positions = load_and_resample_csv(x_file)
-    y_profile_raw, y_offset, y_positions = load_and_resample_csv(y_file)
+    beam_profile = u[:, None] * kernel * v[None, :]
+    return beam_profile, np.array(residual_history), converged
+
+SOLVER_GREEDY = "greedy"
+SOLVER_IPF = "ipf"
+
+def reconstruct_beam_profile(x_file, y_file, output_dir, pitch=1.0, extent=15.0, export_iterations=False,
+                             solver=SOLVER_GREEDY, tol=1e-9, max_iter=1000):
+    """
+    从x/y截面CSV文件重构光束轮廓（参数见 reconstruct_from_profiles）
+    """
+    import pandas as pd
+    x_data = pd.read_csv(x_file, header=None)
+    y_data = pd.read_csv(y_file, header=None)
+    return reconstruct_from_profiles(
+        (x_data.iloc[:, 0].values, x_data.iloc[:, 1].values),
+        (y_data.iloc[:, 0].values, y_data.iloc[:, 1].values),
+        output_dir,
+        pitch=pitch, extent=extent, export_iterations=export_iterations,
+        solver=solver, tol=tol, max_iter=max_iter
+    )
+
+def reconstruct_from_profiles(x_section, y_section, output_dir=None, pitch=1.0, extent=15.0,
+                              export_iterations=False, solver=SOLVER_GREEDY, tol=1e-9, max_iter=1000):
+    """
+    重构光束轮廓主函数
+
+    x_section / y_section 为 (坐标, 刻蚀深度) 数组对，坐标不要求已平移到峰值。
+    output_dir 为 None 时不写任何文件，结果只保存在返回值中。
+
+    pitch/extent 为重构网格的采样间隔与半宽 (mm)，默认 1mm / ±15mm (31x31)。
+
+    solver:
+        "greedy" - 逐行贪心修正（原算法），完成后将负值截断为0
+        "ipf"    - 以 elliptical_prior 为先验的迭代比例拟合 (Sinkhorn)，结果非负且
+                   行/列和收敛到缩放到相同总量后的截面数据，
+                   tol/max_iter 为收敛容差（相对截面总量）和最大迭代次数
+
+    两截面总量不一致时任何二维轮廓都无法同时满足两者，结果中的
+    marginal_mismatch 给出 (x总量 - y总量) / 平均总量，diff_x / diff_y 相对实测截面计算。
+
+    贪心模式下每一行始终是 x 截面单位分布的倍数，因此迭代只需维护每行的权重向量：
+    行选择与补偿都是对权重的掩码更新，最后再展开为二维矩阵。
+
+    迭代历史保存在返回结果的 "history" 中；默认只写出最终结果，
+    export_iterations=True 时额外导出逐次迭代CSV和中间截面文件。
+    """
+    if solver not in (SOLVER_GREEDY, SOLVER_IPF):
+        raise ValueError(f"不支持的求解模式: {solver}")
     
-    # 保存平移后的截面数据
-    save_shifted_profile(x_positions, x_profile, iter_dir / "shifted_x_crosssection.csv")
-    save_shifted_profile(y_positions, y_profile_raw, iter_dir / "shifted_y_crosssection.csv")
+    # 重采样到重构网格
+    x_profile, x_offset, x_positions = resample_profile(*x_section, pitch=pitch, extent=extent)
+    y_profile_raw, y_offset, y_positions = resample_profile(*y_section, pitch=pitch, extent=extent)
     
-    # 反转y_profile数据以匹配顺序
+    # 反转y_profile数据以匹配顺序（第0行对应 y=+extent）
     y_profile = y_profile_raw[::-1]
     
-    # 保存组合的初始截面数据
-    initial_profiles_file = save_initial_profiles(
-        x_positions, x_profile, 
-        y_positions, y_profile_raw, 
-        iter_dir, "initial_shifted_profiles.csv"
-    )
+    n = len(x_profile)
     
-    # 初始化beamprofile和相关向量
-    beam_profile = np.zeros((31, 31))
-    iteration_count = 0
-    processed_rows = np.full(31, False)  # 标记已处理的行
+    if solver == SOLVER_IPF:
+        history = IterationHistory(x_profile / np.sum(x_profile), x_profile, y_profile, x_positions)
+        beam_profile, residual_history, converged = solve_marginals_ipf(
+            x_profile, y_profile, prior=elliptical_prior(x_profile, y_profile, x_positions),
+            tol=tol, max_iter=max_iter
+        )
+        history.residuals = residual_history
+        return _finalize_reconstruction(
+            beam_profile, history, output_dir,
+            x_positions, y_positions, x_profile, y_profile, y_profile_raw,
+            export_iterations, pitch, solver, converged
+        )
+    
+    center = n // 2
+    dist_to_center = np.abs(np.arange(n) - center)
     
     # 计算归一化因子
-    one_over_31_x = x_profile / 31.0
     sum_x = np.sum(x_profile)
     unit_of_x_crosssect = x_profile / sum_x
     
-    # 初始填充beamprofile
-    for i in range(31):
-        beam_profile[i, :] = one_over_31_x
-    
-    def calculate_diffs():
-        """计算行和、列和、卷积差"""
-        row_sums = np.sum(beam_profile, axis=1)
-        col_sums = np.sum(beam_profile, axis=0)
-        diff_y = row_sums - y_profile
-        diff_x = col_sums - x_profile
-        return diff_y, diff_x, row_sums, col_sums
-    
-    def save_current_iteration(iter_num):
-        """保存当前迭代状态"""
-        return save_beamprofile_with_diffs(
-            beam_profile, 
-            x_profile, 
-            y_profile, 
-            iter_num, 
-            iter_dir
-        )
+    # 每行权重: beam_profile[i] = row_weights[i] * unit_of_x_crosssect
+    # 初始填充为每行 x_profile / n
+    row_weights = np.full(n, sum_x / n)
+    processed_rows = np.zeros(n, dtype=bool)  # 标记已处理的行
+    iteration_count = 0
     
-    # 保存初始状态 (迭代0)
-    iteration_files = [str(save_current_iteration(0))]
+    history = IterationHistory(unit_of_x_crosssect, x_profile, y_profile, x_positions)
+    
+    # 记录初始状态 (迭代0)
+    history.record(0, row_weights)
     
     # 重构核心 - 迭代直到只剩下最后一行未处理
-    while np.sum(~processed_rows) > 1:
+    # 行和 = 行权重 * sum(unit) = 行权重
+    while np.count_nonzero(~processed_rows) > 1:
         iteration_count += 1
-        diff_y, _, _, _ = calculate_diffs()
-        
-        # 找出最大差异行 (只考虑未处理的行)
-        unprocessed_indices = np.where(~processed_rows)[0]
-        candidate_diffs = diff_y[unprocessed_indices]
-        
-        # 找到最大正差异值
-        if len(candidate_diffs) == 0:
-            break
-            
-        max_val = np.max(candidate_diffs)
-        max_candidates = unprocessed_indices[abs(diff_y[unprocessed_indices] - max_val) < 1e-6]
-        
-        # 处理多个同最大值的情形（优先边缘行）
-        if len(max_candidates) > 1:
-            dist_to_center = np.abs(max_candidates - 15)
-            selected_row = max_candidates[np.argmax(dist_to_center)]
-        else:
-            selected_row = max_candidates[0] if len(max_candidates) == 1 else unprocessed_indices[0]
+        diff_y = row_weights - y_profile
         
+        # 找出最大差异行 (只考虑未处理的行)，同最大值时优先边缘行
+        masked_diffs = np.where(processed_rows, -np.inf, diff_y)
+        max_val = masked_diffs.max()
+        is_candidate = np.abs(masked_diffs - max_val) < 1e-6
+        selected_row = np.argmax(np.where(is_candidate, dist_to_center, -1))
         max_diff_val = diff_y[selected_row]
-        y_position = 15 - selected_row
         
-        # 调整目标行
-        beam_profile[selected_row] -= max_diff_val * unit_of_x_crosssect
+        # 调整目标行并标记为已处理
+        row_weights[selected_row] -= max_diff_val
         processed_rows[selected_row] = True
         
-        # 强制设该行差异为0
-        diff_y[selected_row] = 0
-        
         # 对其他未处理行进行补偿
-        unprocessed_rows = np.where(~processed_rows)[0]
-        if len(unprocessed_rows) > 0:
-            compensation = (max_diff_val / len(unprocessed_rows)) * unit_of_x_crosssect
-            for row_idx in unprocessed_rows:
-                beam_profile[row_idx] += compensation
+        remaining = ~processed_rows
+        row_weights[remaining] += max_diff_val / np.count_nonzero(remaining)
         
-        # 保存当前迭代状态
-        iter_file = save_current_iteration(iteration_count)
-        iteration_files.append(str(iter_file))
+        history.record(iteration_count, row_weights)
     
     # 专门处理最后一行（中心行）
-    unprocessed_rows = np.where(~processed_rows)[0]
+    unprocessed_rows = np.flatnonzero(~processed_rows)
     if len(unprocessed_rows) == 1:
         iteration_count += 1
-        diff_y, _, _, _ = calculate_diffs()
         selected_row = unprocessed_rows[0]
-        y_position = 15 - selected_row
-        max_diff_val = diff_y[selected_row]
+        max_diff_val = row_weights[selected_row] - y_profile[selected_row]
         
         # 修正最后一行
-        beam_profile[selected_row] -= max_diff_val * unit_of_x_crosssect
+        row_weights[selected_row] -= max_diff_val
         processed_rows[selected_row] = True
         
-        # 对所有其他30行进行补偿
-        compensation = (max_diff_val / 30) * unit_of_x_crosssect
-        for row_idx in range(31):
-            if row_idx != selected_row:
-                beam_profile[row_idx] += compensation
-        
-        # 保存最终迭代
-        final_iter_file = save_current_iteration(iteration_count)
-        iteration_files.append(str(final_iter_file))
-    
-    # 处理负数 - 将负值设为0
-    negative_count = np.sum(beam_profile < 0)
-    if negative_count > 0:
-        # 记录负数位置
-        negative_positions = np.argwhere(beam_profile < 0)
-        negative_correction = beam_profile.copy()
+        # 对所有其他行进行补偿
+        others = np.arange(n) != selected_row
+        row_weights[others] += max_diff_val / (n - 1)
         
-        # 将负数设为0
+        history.record(iteration_count, row_weights)
+    
+    beam_profile = np.outer(row_weights, unit_of_x_crosssect)
+    return _finalize_reconstruction(
+        beam_profile, history, output_dir,
+        x_positions, y_positions, x_profile, y_profile, y_profile_raw,
+        export_iterations, pitch, solver, True
+    )
+
+def _finalize_reconstruction(beam_profile, history, output_dir,
+                             x_positions, y_positions, x_profile, y_profile, y_profile_raw,
+                             export_iterations, pitch, solver, converged):
+    """负值修正、误差统计和结果文件输出（各求解模式共用）"""
+    import pandas as pd
+    # 处理负数 - 将负值设为0，并在历史中记录修正信息
+    negative_mask = beam_profile < 0
+    if negative_mask.any():
+        y_idx, x_idx = np.nonzero(negative_mask)
+        history.negative_corrections = pd.DataFrame({
+            'Position Y': y_positions[::-1][y_idx],
+            'Position X': x_positions[x_idx],
+            'Original Value': beam_profile[y_idx, x_idx]
+        })
         beam_profile = np.maximum(beam_profile, 0)
+    history.record_final(beam_profile)
+    
+    # 最终结果统计
+    final_row_sums = np.sum(beam_profile, axis=1)
+    final_col_sums = np.sum(beam_profile, axis=0)
+    final_diff_y = final_row_sums - y_profile
+    final_diff_x = final_col_sums - x_profile
+    
+    # 两截面总量的相对差（IPF 会把两者缩放到平均总量，该差异无法通过求解消除）
+    sum_x, sum_y = np.sum(x_profile), np.sum(y_profile)
+    mean_total = (sum_x + sum_y) / 2
+    marginal_mismatch = (sum_x - sum_y) / mean_total if mean_total > 0 else 0.0
+    
+    final_file = None
+    iteration_files = []
+    neg_file = None
+    initial_profiles_file = None
+    if output_dir is not None:
+        # 确保输出目录及迭代结果文件夹存在
+        output_dir = Path(output_dir)
+        iter_dir = output_dir / "beamprofile_iterations"
+        iter_dir.mkdir(parents=True, exist_ok=True)
         
-        # 保存负数修正信息
-        neg_df_data = []
-        for pos in negative_positions:
-            y_idx, x_idx = pos
-            y_value = 15 - y_idx
-            x_value = x_idx - 15
-            neg_df_data.append({
-                'Position Y': y_value,
-                'Position X': x_value,
-                'Original Value': negative_correction[y_idx, x_idx]
-            })
+        # 保存最终结果（带差异信息的矩阵 + 纯矩阵）
+        final_file = save_beamprofile_with_diffs(
+            beam_profile, x_profile, y_profile, "final", iter_dir, positions=x_positions
+        )
+        final_matrix_file = output_dir / "reconstructed_beamprofile.csv"
+        np.savetxt(final_matrix_file, beam_profile, delimiter=',')
         
-        neg_df = pd.DataFrame(neg_df_data)
-        neg_file = iter_dir / "negative_corrections.csv"
-        neg_df.to_csv(neg_file, index=False)
-    else:
-        neg_file = None
-    
-    # 保存最终结果
-    final_diff_y, final_diff_x, final_row_sums, final_col_sums = calculate_diffs()
-    final_file = save_current_iteration("final")
-    iteration_files.append(str(final_file))
-    
-    # 保存最终beamprofile（纯矩阵）
-    final_matrix_file = output_dir / "reconstructed_beamprofile.csv"
-    np.savetxt(final_matrix_file, beam_profile, delimiter=',')
+        # 可选：导出中间截面数据与逐次迭代CSV
+        if export_iterations:
+            save_shifted_profile(x_positions, x_profile, iter_dir / "shifted_x_crosssection.csv")
+            save_shifted_profile(y_positions, y_profile_raw, iter_dir / "shifted_y_crosssection.csv")
+            initial_profiles_file = save_initial_profiles(
+                x_positions, x_profile, 
+                y_positions, y_profile_raw, 
+                iter_dir, "initial_shifted_profiles.csv"
+            )
+            iteration_files = history.export_csv(iter_dir, range(len(history.labels)))
+            if len(history.residuals):
+                pd.DataFrame({
+                    'Iteration': np.arange(1, len(history.residuals) + 1),
+                    'Max Residual': history.residuals
+                }).to_csv(iter_dir / "residual_history.csv", index=False)
+            iteration_files.append(str(final_file))
+            if history.negative_corrections is not None:
+                neg_file = iter_dir / "negative_corrections.csv"
     
     # 准备返回结果
     result = {
@@ -270,10 +523,18 @@ def reconstruct_beam_profile(x_file, y_file, output_dir):
         "diff_x": final_diff_x,
         "x_profile": x_profile,
         "y_profile": y_profile,
+        "positions": x_positions,
+        "pitch": pitch,
+        "solver": solver,
+        "converged": converged,
+        "residual_history": history.residuals,
+        "marginal_mismatch": marginal_mismatch,
+        "history": history,
         "iteration_files": iteration_files,
-        "final_file": str(final_file),
+        "final_file": str(final_file) if final_file else None,
+        "negative_count": 0 if history.negative_corrections is None else len(history.negative_corrections),
         "negative_correction_file": str(neg_file) if neg_file else None,
-        "initial_profiles_file": str(initial_profiles_file)
+        "initial_profiles_file": str(initial_profiles_file) if initial_profiles_file else None
     }
     
     return result
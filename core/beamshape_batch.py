@@ -0,0 +1,173 @@
+import hashlib
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from core.beamshape_Moulding import reconstruct_beam_profile, SOLVER_GREEDY
+
+# 截面文件命名: <前缀>x_crosssection*.csv / <前缀>y_crosssection*.csv
+# (与 rawData_processor 输出的文件名一致，前缀可为空)
+_SECTION_PATTERN = re.compile(r"^(?P<prefix>.*?)(?P<axis>[xy])_crosssection.*\.csv$", re.IGNORECASE)
+
+MANIFEST_NAME = "batch_manifest.json"
+SUMMARY_NAME = "batch_error_summary.csv"
+
+SUMMARY_COLUMNS = [
+    "pair", "x_file", "y_file", "status",
+    "max_abs_diff_x", "mean_abs_diff_x", "max_abs_diff_y", "mean_abs_diff_y",
+    "negative_count", "output_file", "error"
+]
+
+
+def find_crosssection_pairs(input_dir):
+    """
+    在目录（含子目录）中查找成对的x/y截面文件
+
+    同一目录下前缀相同的 x_crosssection / y_crosssection 文件视为一对，
+    返回 {pair名称: (x_file, y_file)}，pair名称由相对目录和前缀组成。
+    """
+    input_dir = Path(input_dir)
+    found = {}
+    for path in sorted(input_dir.rglob("*.csv")):
+        match = _SECTION_PATTERN.match(path.name)
+        if not match:
+            continue
+        relative_dir = path.parent.relative_to(input_dir)
+        prefix = match.group("prefix").rstrip("_-. ")
+        parts = [part for part in relative_dir.parts] + ([prefix] if prefix else [])
+        name = "__".join(parts) if parts else "root"
+        found.setdefault(name, {})[match.group("axis").lower()] = path
+
+    pairs = {}
+    for name, files in found.items():
+        if "x" in files and "y" in files:
+            pairs[name] = (files["x"], files["y"])
+    return pairs
+
+
+def _file_digest(path):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pair_signature(x_file, y_file, options):
+    """输入文件内容与重构参数共同决定的签名，用于判断是否需要重新计算"""
+    payload = {
+        "x": _file_digest(x_file),
+        "y": _file_digest(y_file),
+        "options": options
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _reconstruct_pair(name, x_file, y_file, pair_output_dir, options):
+    """进程池中执行的单对重构，只返回可序列化的误差统计"""
+    try:
+        result = reconstruct_beam_profile(str(x_file), str(y_file), str(pair_output_dir), **options)
+        diff_x = np.abs(result["diff_x"])
+        diff_y = np.abs(result["diff_y"])
+        return {
+            "pair": name,
+            "x_file": str(x_file),
+            "y_file": str(y_file),
+            "status": "ok",
+            "max_abs_diff_x": float(diff_x.max()),
+            "mean_abs_diff_x": float(diff_x.mean()),
+            "max_abs_diff_y": float(diff_y.max()),
+            "mean_abs_diff_y": float(diff_y.mean()),
+            "negative_count": int(result["negative_count"]),
+            "output_file": str(Path(pair_output_dir) / "reconstructed_beamprofile.csv"),
+            "error": ""
+        }
+    except Exception as e:
+        return {
+            "pair": name,
+            "x_file": str(x_file),
+            "y_file": str(y_file),
+            "status": "failed",
+            "error": str(e)
+        }
+
+
+def batch_reconstruct(input_dir, output_dir, max_workers=None, force=False,
+                      pitch=1.0, extent=15.0, solver=SOLVER_GREEDY, progress_callback=None):
+    """
+    批量重构目录中的所有x/y截面对
+
+    每对结果写入 output_dir/<pair名称>/，所有结果汇总到 batch_error_summary.csv。
+    输入文件内容和参数未变化且已有结果时跳过（force=True 时全部重算）。
+
+    参数:
+    progress_callback: 可选回调 callback(完成数, 总数, 汇总行)
+
+    返回:
+    pd.DataFrame: 误差汇总表
+    """
+    import pandas as pd
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    pairs = find_crosssection_pairs(input_dir)
+    if not pairs:
+        raise FileNotFoundError(f"在 {input_dir} 中找不到成对的x/y截面文件")
+
+    options = {"pitch": pitch, "extent": extent, "solver": solver}
+
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = {}
+    if manifest_path.exists():
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (ValueError, OSError):
+            manifest = {}
+
+    rows = {}
+    pending = {}
+    for name, (x_file, y_file) in pairs.items():
+        signature = _pair_signature(x_file, y_file, options)
+        previous = manifest.get(name)
+        if (not force and previous
+                and previous.get("signature") == signature
+                and previous.get("summary", {}).get("status") == "ok"
+                and Path(previous["summary"]["output_file"]).exists()):
+            rows[name] = dict(previous["summary"], status="skipped")
+        else:
+            pending[name] = (x_file, y_file, signature)
+
+    total = len(pairs)
+    done = len(rows)
+    if progress_callback:
+        for row in rows.values():
+            progress_callback(done, total, row)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_reconstruct_pair, name, x_file, y_file, output_dir / name, options): name
+                for name, (x_file, y_file, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                row = future.result()
+                rows[name] = row
+                if row["status"] == "ok":
+                    manifest[name] = {"signature": pending[name][2], "summary": row}
+                else:
+                    manifest.pop(name, None)
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total, row)
+
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    summary = pd.DataFrame([rows[name] for name in sorted(rows)], columns=SUMMARY_COLUMNS)
+    summary.to_csv(output_dir / SUMMARY_NAME, index=False)
+    return summary
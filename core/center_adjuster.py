@@ -1,7 +1,9 @@
 import csv
+import io
 from pathlib import Path
-from typing import List, Tuple, Optional  # 添加 Optional
+from typing import List, Tuple, Optional, Sequence  # 添加 Optional
 import os
+import numpy as np
 from utils.file_io import validate_path, ensure_dir
 from utils.file_io import get_resource_path, validate_path
 
@@ -10,16 +12,15 @@ class RecipeCenterAdjuster:
     COL_NUM = 5  # 总列数
     COL_X = 1    # X坐标列
     COL_Y = 3    # Y坐标列
+    COL_VX = 2   # X方向速度列
+    COL_VY = 4   # Y方向速度列
     
     
     def __init__(self):
         # 修改为使用动态路径
-        input_dir = get_resource_path("Data/inputs/WedgeTestRecipe")
-        output_dir = get_resource_path("Data/outputs/new_WedgeTestRecipe")
-        
-        # 确保目录存在
-        os.makedirs(input_dir, exist_ok=True)
-        os.makedirs(output_dir, exist_ok=True)
+        # 确保目录存在（每个目录在一次运行中只检查一次）
+        input_dir = ensure_dir("Data/inputs/WedgeTestRecipe")
+        output_dir = ensure_dir("Data/outputs/new_WedgeTestRecipe")
         
         self.input_dir = input_dir
         self.output_dir = output_dir
@@ -27,8 +28,17 @@ class RecipeCenterAdjuster:
     @staticmethod
     def get_original_center(input_path: Path) -> Tuple[float, float]:
         """获取文件的原始中心点 - 静态方法，便于UI直接调用"""
-        header, body_lines, footer = RecipeCenterAdjuster._read_recipe(input_path)
-        return RecipeCenterAdjuster._calculate_original_center(body_lines)
+        return RecipeCenterAdjuster.load_recipe(input_path).center
+        
+    @staticmethod
+    def deltas_from_pattern_shift(shift_x: float, shift_y: float) -> Tuple[float, float]:
+        """
+        由刻蚀图形在TM坐标中的位移换算Recipe中心偏移量
+        
+        TM坐标 x_tm = x - cx, y_tm = cy - y，图形需反向移回：
+        X方向偏移取反，Y方向因坐标轴反向而同号（与CrossTest的Δx=-(上+下)/2、Δy=(右+左)/2一致）。
+        """
+        return -shift_x, shift_y
         
     @staticmethod
     def _read_recipe(file_path: Path) -> Tuple[List, List, List]:
@@ -71,65 +81,160 @@ class RecipeCenterAdjuster:
         return header, body_lines, footer
 
     @staticmethod
-    def _calculate_original_center(body_lines) -> Tuple[float, float]:
-        """计算原始中心点坐标"""
-        try:
-            x_coords = [float(row[RecipeCenterAdjuster.COL_X]) for row in body_lines]
-            y_coords = [float(row[RecipeCenterAdjuster.COL_Y]) for row in body_lines]
-            return (
-                (max(x_coords) + min(x_coords)) / 2,
-                (max(y_coords) + min(y_coords)) / 2
-            )
-        except (IndexError, ValueError) as e:
-            raise RuntimeError(f"中心点计算错误: {str(e)}")
+    def load_recipe(input_path: Path) -> "RecipeArray":
+        """读取并验证Recipe文件，返回数组形式的Recipe（只解析一次，可反复变换）"""
+        header, body_lines, footer = RecipeCenterAdjuster._read_recipe(input_path)
+        return RecipeArray(header, body_lines, footer)
 
     def adjust_single_file(self, input_path: Path, output_path: Path, 
                          delta_x: float, delta_y: float) -> None:
         """调整单个配方文件"""
-        header, body_lines, footer = self._read_recipe(input_path)
-        processed_body = self._process_body(body_lines, delta_x, delta_y)
-        self._write_output(output_path, header, processed_body, footer)
-    
-    @staticmethod
-    def _process_body(body_lines, delta_x, delta_y):
-        """处理文件主体数据"""
-        processed = []
-        for row in body_lines:
-            try:
-                row = row[:]  # 创建副本
-                # 更新X坐标
-                x_val = round(
-                    float(row[RecipeCenterAdjuster.COL_X]) + delta_x, 
-                    8
-                )
-                row[RecipeCenterAdjuster.COL_X] = f"{x_val:.8f}"
-                
-                # 更新Y坐标
-                y_val = round(
-                    float(row[RecipeCenterAdjuster.COL_Y]) + delta_y, 
-                    8
-                )
-                row[RecipeCenterAdjuster.COL_Y] = f"{y_val:.8f}"
-                
-                processed.append(row)
-            except (ValueError, IndexError) as e:
-                print(f"处理行时出错: {row} - {str(e)}")
-        return processed
+        recipe = self.load_recipe(input_path)
+        recipe.write(output_path, recipe.transform(shift=(delta_x, delta_y)))
 
-    @staticmethod
-    def _write_output(output_path, header, processed_body, footer):
-        """写入处理后的文件 - 修改为创建目录如果不存在"""
-        # 确保输出目录存在
+    def generate_center_grid(self, input_path: Path, delta_x_values: Sequence[float],
+                             delta_y_values: Sequence[float], output_dir: Optional[Path] = None) -> List[Path]:
+        """
+        一次生成一组候选中心的Recipe（ΔX × ΔY 网格），源文件只解析一次
+        
+        返回:
+        List[Path]: 生成的文件路径，文件名包含对应的偏移量
+        """
+        recipe = self.load_recipe(input_path)
+        output_dir = Path(output_dir) if output_dir else Path(self.output_dir)
+        stem = Path(input_path).stem
+        
+        shifts = [(dx, dy) for dx in delta_x_values for dy in delta_y_values]
+        coords = recipe.transform_batch(shifts=shifts)
+        output_paths = []
+        for (dx, dy), transformed in zip(shifts, coords):
+            output_path = output_dir / f"{stem}_dx{dx:+.4f}_dy{dy:+.4f}.csv"
+            recipe.write(output_path, transformed)
+            output_paths.append(output_path)
+        return output_paths
+
+
+class RecipeArray:
+    """
+    数组形式的Recipe
+    
+    首行、末行原样保存；数据行保存为字符串矩阵，同时把 X/Y 坐标与 X/Y 速度
+    解析为浮点数组。变换只重新格式化被修改的列，其余列保持原文。
+    """
+    
+    def __init__(self, header: List[str], body_lines: List[List[str]], footer: List[str]):
+        self.header = header
+        self.footer = footer
+        self.widths = np.array([len(row) for row in body_lines])
+        width = int(self.widths.max())
+        self.cells = np.array([row + [''] * (width - len(row)) for row in body_lines], dtype=object)
+        
+        self.x = self.cells[:, RecipeCenterAdjuster.COL_X].astype(float)
+        self.y = self.cells[:, RecipeCenterAdjuster.COL_Y].astype(float)
+        self.vx = self._optional_float(RecipeCenterAdjuster.COL_VX)
+        self.vy = self._optional_float(RecipeCenterAdjuster.COL_VY)
+        # 含分隔符或引号的单元格需要CSV转义
+        self._needs_quoting = any(
+            any(ch in cell for ch in ',"\r\n') for row in body_lines for cell in row
+        )
+    
+    def _optional_float(self, column):
+        """速度列不是数值时返回 None（此时不支持速度缩放）"""
+        try:
+            return self.cells[:, column].astype(float)
+        except ValueError:
+            return None
+    
+    def __len__(self):
+        return len(self.cells)
+    
+    @property
+    def center(self) -> Tuple[float, float]:
+        """坐标范围的中心点"""
+        return float(self.x.max() + self.x.min()) / 2, float(self.y.max() + self.y.min()) / 2
+    
+    def transform_batch(self, shifts=((0.0, 0.0),), rotation_deg=0.0, scale=1.0,
+                        pivot=None, velocity_scale=1.0):
+        """
+        批量变换: 先绕 pivot 缩放、旋转，再平移；一组参数一次向量化计算
+        
+        参数:
+        shifts: 平移量序列 [(dx, dy), ...]，每个元素生成一份结果
+        rotation_deg: 旋转角度（度，逆时针为正），可为标量或与 shifts 等长的序列
+        scale: 坐标缩放系数，标量或 (sx, sy)
+        pivot: 旋转/缩放中心，缺省为Recipe中心
+        velocity_scale: 速度缩放系数（标量），作用于 X/Y 速度列
+        
+        返回:
+        list: 每组参数对应的列更新字典 {列索引: 数值数组}
+        """
+        shifts = np.atleast_2d(np.asarray(shifts, dtype=float))
+        n_sets = len(shifts)
+        theta = np.deg2rad(np.broadcast_to(np.asarray(rotation_deg, dtype=float), (n_sets,)))
+        sx, sy = np.broadcast_to(np.asarray(scale, dtype=float), (2,))
+        px, py = self.center if pivot is None else pivot
+        
+        # (组数, 点数) 的坐标矩阵，一次完成所有候选
+        u = sx * (self.x - px)
+        v = sy * (self.y - py)
+        cos, sin = np.cos(theta)[:, None], np.sin(theta)[:, None]
+        new_x = px + cos * u - sin * v + shifts[:, :1]
+        new_y = py + sin * u + cos * v + shifts[:, 1:]
+        
+        updates = []
+        for i in range(n_sets):
+            columns = {RecipeCenterAdjuster.COL_X: new_x[i], RecipeCenterAdjuster.COL_Y: new_y[i]}
+            if velocity_scale != 1.0:
+                if self.vx is None or self.vy is None:
+                    raise ValueError("速度列不是数值，无法缩放速度")
+                columns[RecipeCenterAdjuster.COL_VX] = self.vx * velocity_scale
+                columns[RecipeCenterAdjuster.COL_VY] = self.vy * velocity_scale
+            updates.append(columns)
+        return updates
+    
+    def transform(self, shift=(0.0, 0.0), rotation_deg=0.0, scale=1.0, pivot=None, velocity_scale=1.0):
+        """单组参数的变换，返回列更新字典"""
+        return self.transform_batch(
+            shifts=[shift], rotation_deg=rotation_deg, scale=scale,
+            pivot=pivot, velocity_scale=velocity_scale
+        )[0]
+    
+    def format_body(self, columns=None) -> str:
+        """批量格式化数据行（被修改的列保留8位小数），返回CSV文本"""
+        columns = columns or {}
+        cells = self.cells.copy()
+        for column, values in columns.items():
+            cells[:, column] = np.round(values, 8)
+        
+        if self._needs_quoting or np.any(self.widths != cells.shape[1]):
+            # 不规则行或需要转义时逐行交给csv模块
+            rows = [
+                [f"{cell:.8f}" if j in columns else cell for j, cell in enumerate(row[:width])]
+                for row, width in zip(cells.tolist(), self.widths)
+            ]
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            return buffer.getvalue()
+        
+        # 整个数据块用一个格式模板一次格式化
+        row_format = ','.join(
+            '%.8f' if j in columns else '%s' for j in range(cells.shape[1])
+        ) + '\r\n'
+        return (row_format * len(cells)) % tuple(cells.ravel().tolist())
+    
+    def write(self, output_path, columns=None) -> None:
+        """写出Recipe文件（首行/末行原样，行尾与 csv.writer 一致）"""
         output_dir = os.path.dirname(output_path)
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
         
-        # 写入文件
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.header)
+        buffer.write(self.format_body(columns))
+        writer.writerow(self.footer)
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(header)
-            writer.writerows(processed_body)
-            writer.writerow(footer)
+            f.write(buffer.getvalue())
 
 # 测试入口
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# 默认滚动窗口的晶圆数
+DEFAULT_WINDOW = 50
+
+# 持久化文件格式版本
+STATE_VERSION = 1
+
+# 充分统计量字段
+STAT_FIELDS = ("n", "sum_xy", "sum_xx", "sum_y", "sum_yy")
+
+
+def _regression(stats):
+    """
+    由充分统计量计算零截距回归 y = q*x 的斜率与R平方
+
+    与 BeamCoefficientCalculator 一致: q = Σxy / Σxx，
+    R² = 1 - SS_res / SS_tot，其中 SS_res = Σy² - 2qΣxy + q²Σxx，SS_tot = Σy² - (Σy)²/n。
+
+    返回:
+    tuple: (斜率, R平方)，数据不足时为 (None, None)
+    """
+    n, sum_xy, sum_xx, sum_y, sum_yy = (stats[field] for field in STAT_FIELDS)
+    if n < 1 or sum_xx <= 0:
+        return None, None
+    slope = sum_xy / sum_xx
+    ss_res = max(sum_yy - 2 * slope * sum_xy + slope * slope * sum_xx, 0.0)
+    ss_tot = sum_yy - sum_y * sum_y / n
+    if ss_tot < 1e-10:  # 避免除以0
+        return slope, 1.0
+    return slope, 1 - ss_res / ss_tot
+
+
+def wafer_statistics(set_values, actual_values):
+    """
+    计算单片晶圆的充分统计量
+
+    参数:
+    set_values: 设定变化值 x（已按坐标对齐）
+    actual_values: 实际变化值 y（初始厚度 - 刻蚀后厚度）
+
+    返回:
+    dict: n, sum_xy, sum_xx, sum_y, sum_yy
+    """
+    x = np.asarray(set_values, dtype=float).ravel()
+    y = np.asarray(actual_values, dtype=float).ravel()
+    if len(x) != len(y):
+        raise ValueError(f"设定值与实际值长度不一致: {len(x)} vs {len(y)}")
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    return {
+        "n": int(len(x)),
+        "sum_xy": float(x @ y),
+        "sum_xx": float(x @ x),
+        "sum_y": float(y.sum()),
+        "sum_yy": float(y @ y),
+    }
+
+
+class CoefficientAccumulator:
+    """
+    多晶圆合并的Beam系数累加器
+
+    每片晶圆只保存零截距回归的充分统计量 (Σxy, Σxx, Σy, Σy², n)，
+    增删晶圆只需加减一次统计量，合并斜率和R平方为 O(1) 计算，
+    重新计算滚动窗口内的系数时无需重新读取旧文件。
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        """
+        参数:
+        window: 滚动窗口的晶圆数，超出时自动移除最早加入的晶圆；None 表示不限制
+        """
+        if window is not None and window < 1:
+            raise ValueError(f"滚动窗口必须至少为1: {window}")
+        self.window = window
+        self.wafers = OrderedDict()  # 晶圆ID -> 充分统计量（按加入顺序）
+        self._totals = dict.fromkeys(STAT_FIELDS, 0)
+
+    def __len__(self):
+        return len(self.wafers)
+
+    def __contains__(self, wafer_id):
+        return wafer_id in self.wafers
+
+    def _apply(self, stats, sign):
+        for field in STAT_FIELDS:
+            self._totals[field] += sign * stats[field]
+
+    def add_statistics(self, wafer_id, stats):
+        """
+        加入一片晶圆的充分统计量，同一ID已存在时替换
+
+        返回:
+        list: 因超出滚动窗口而被移除的晶圆ID
+        """
+        stats = {field: stats[field] for field in STAT_FIELDS}
+        if wafer_id in self.wafers:
+            self.remove_wafer(wafer_id)
+        self.wafers[wafer_id] = stats
+        self._apply(stats, 1)
+
+        evicted = []
+        while self.window is not None and len(self.wafers) > self.window:
+            oldest = next(iter(self.wafers))
+            self.remove_wafer(oldest)
+            evicted.append(oldest)
+        return evicted
+
+    def add_wafer(self, wafer_id, set_values, actual_values):
+        """由已对齐的设定值/实际值数组加入一片晶圆"""
+        return self.add_statistics(wafer_id, wafer_statistics(set_values, actual_values))
+
+    def add_calculator(self, wafer_id, calculator):
+        """加入 BeamCoefficientCalculator 最近一次计算所用的匹配点"""
+        if calculator.slope is None:
+            raise ValueError("计算器尚未完成系数计算")
+        return self.add_wafer(wafer_id, calculator.matched_set_values, calculator.actual_values)
+
+    def remove_wafer(self, wafer_id):
+        """移除一片晶圆"""
+        if wafer_id not in self.wafers:
+            raise KeyError(f"晶圆不存在: {wafer_id}")
+        self._apply(self.wafers.pop(wafer_id), -1)
+        if not self.wafers:
+            # 清空时归零，避免浮点残差累积
+            self._totals = dict.fromkeys(STAT_FIELDS, 0)
+
+    def pooled(self):
+        """
+        所有晶圆合并后的回归结果
+
+        返回:
+        dict: slope, r_squared, n, wafers
+        """
+        slope, r_squared = _regression(self._totals)
+        return {
+            "slope": slope,
+            "r_squared": r_squared,
+            "n": int(self._totals["n"]),
+            "wafers": len(self.wafers),
+        }
+
+    def wafer_result(self, wafer_id):
+        """单片晶圆的回归结果: dict(slope, r_squared, n)"""
+        stats = self.wafers[wafer_id]
+        slope, r_squared = _regression(stats)
+        return {"slope": slope, "r_squared": r_squared, "n": int(stats["n"])}
+
+    def per_wafer(self):
+        """按加入顺序返回每片晶圆的回归结果"""
+        return OrderedDict((wafer_id, self.wafer_result(wafer_id)) for wafer_id in self.wafers)
+
+    def to_dict(self):
+        return {
+            "version": STATE_VERSION,
+            "window": self.window,
+            "wafers": [{"wafer_id": wafer_id, **stats} for wafer_id, stats in self.wafers.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"不支持的累加器版本: {state.get('version')}")
+        accumulator = cls(window=state.get("window"))
+        for entry in state["wafers"]:
+            accumulator.add_statistics(entry["wafer_id"], entry)
+        return accumulator
+
+    def save(self, path):
+        """保存为JSON（先写临时文件再替换，避免中断时损坏）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, window=DEFAULT_WINDOW):
+        """读取已保存的累加器，文件不存在时返回空累加器"""
+        path = Path(path)
+        if not path.exists():
+            return cls(window=window)
+        return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
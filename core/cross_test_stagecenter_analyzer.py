@@ -1,7 +1,131 @@
-import pandas as pd
 import numpy as np
 import logging
 
+from core.thickness_loader import DEFAULT_COORD_TOLERANCE, _cluster_levels, load_thickness_map
+
+logger = logging.getLogger('StageCenterAnalyzer')
+
+# 十字四条臂的名称，顺序与结果字典中的 delta_* 对应
+ARM_NAMES = ("up", "down", "right", "left")
+
+# 峰值拟合模型
+PEAK_PARABOLIC = "parabolic"
+PEAK_GAUSSIAN = "gaussian"
+
+def fit_peak_positions(coords, values, threshold=0.5, half_window=2, model=PEAK_GAUSSIAN):
+    """
+    批量亚网格峰值定位：每行一条剖面，在最大值附近做二次拟合
+    
+    parabolic 直接对数值做二次拟合；gaussian 对数值取对数后做二次拟合
+    （等价于高斯拟合，只使用正值点）。所有剖面的拟合以一次批量最小二乘完成。
+    
+    参数:
+    coords: 坐标 (剖面数, 点数)，每行升序，不足的位置用NaN填充
+    values: 数值 (剖面数, 点数)，与 coords 对应
+    threshold: 拟合窗口包含高于 threshold*峰值 的连续点
+    half_window: 窗口的最小半宽（点数）
+    model: PEAK_PARABOLIC 或 PEAK_GAUSSIAN
+    
+    返回:
+    dict: position (峰位置), sigma (峰位置的1σ不确定度), height (峰高),
+          fitted (是否成功拟合；失败时退化为最大值点坐标，sigma 取半个点距)
+    """
+    coords = np.atleast_2d(np.asarray(coords, dtype=float))
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_rows, n_pts = values.shape
+    rows = np.arange(n_rows)[:, None]
+    
+    n_valid = np.sum(~np.isnan(values), axis=1)
+    if np.any(n_valid == 0):
+        raise ValueError("存在没有有效数据的剖面")
+    peak_idx = np.nanargmax(values, axis=1)
+    
+    # 拟合窗口: 最大值两侧连续高于 threshold*峰值 的区域（至少 half_window 点），
+    # 窗口随点距自动包含更多点，测量越密定位越准
+    j = np.arange(n_pts)[None, :]
+    peak_value = values[rows[:, 0], peak_idx]
+    below = ~(values >= threshold * peak_value[:, None])
+    left = np.where(below & (j < peak_idx[:, None]), j, -1).max(axis=1)
+    right = np.where(below & (j > peak_idx[:, None]), j, n_pts).min(axis=1)
+    in_window = ((j > left[:, None]) & (j < right[:, None])) | (np.abs(j - peak_idx[:, None]) <= half_window)
+    
+    center = coords[rows[:, 0], peak_idx]
+    weights = in_window & ~np.isnan(values) & ~np.isnan(coords)
+    t = np.where(weights, coords - center[:, None], 0.0)
+    y = values
+    if model == PEAK_GAUSSIAN:
+        weights &= y > 0
+        y = np.log(np.where(weights, y, 1.0))
+    elif model != PEAK_PARABOLIC:
+        raise ValueError(f"未知的峰值拟合模型: {model}")
+    y = np.where(weights, y, 0.0)
+    w = weights.astype(float)
+    n_fit = weights.sum(axis=1)
+    
+    vander = t[..., None] ** np.arange(3)
+    lhs = np.einsum('rpi,rp,rpj->rij', vander, w, vander)
+    rhs = np.einsum('rpi,rp->ri', vander, w * y)
+    solvable = (n_fit >= 3) & (np.abs(np.linalg.det(lhs)) > 1e-12)
+    lhs[~solvable] = np.eye(3)
+    rhs[~solvable] = 0.0
+    coeffs = np.linalg.solve(lhs, rhs[..., None])[..., 0]
+    c0, c1, c2 = coeffs.T
+    
+    # 开口向下且顶点落在窗口内才认为拟合成功
+    fitted = solvable & (c2 < 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertex = np.where(fitted, -c1 / (2 * c2), 0.0)
+        t_min = np.where(weights, t, np.inf).min(axis=1)
+        t_max = np.where(weights, t, -np.inf).max(axis=1)
+        fitted &= (vertex >= t_min) & (vertex <= t_max)
+        vertex = np.where(fitted, vertex, 0.0)
+        
+        # 残差估计系数协方差，再按顶点公式传播到峰位置
+        residual = np.einsum('rpi,ri->rp', vander, coeffs) - y
+        dof = n_fit - 3
+        s2 = np.where(dof > 0, np.sum(w * residual ** 2, axis=1) / np.maximum(dof, 1), np.nan)
+        cov = s2[:, None, None] * np.linalg.inv(lhs)
+        jac = np.stack([np.zeros(n_rows), -1.0 / (2 * c2), c1 / (2 * c2 ** 2)], axis=1)
+        var = np.einsum('ri,rij,rj->r', jac, cov, jac)
+        top = c0 - c1 ** 2 / (4 * c2)
+    
+    # 失败时退化为最大值点，不确定度取半个点距
+    spacing = np.nanmedian(np.diff(coords, axis=1), axis=1)
+    position = center + vertex
+    sigma = np.where(fitted, np.sqrt(np.abs(var)), np.abs(spacing) / 2)
+    height = values[rows[:, 0], peak_idx]
+    if model == PEAK_GAUSSIAN:
+        height = np.where(fitted, np.exp(top), height)
+    else:
+        height = np.where(fitted, top, height)
+    return {"position": position, "sigma": sigma, "height": height, "fitted": fitted}
+
+def detect_cross_arms(x, y, tolerance=DEFAULT_COORD_TOLERANCE, min_points=3):
+    """
+    由坐标识别十字的四条臂
+    
+    点数最多的两条Y层级为上下两臂（沿X方向），点数最多的两条X层级为左右两臂（沿Y方向），
+    各臂的点数不限。
+    
+    返回:
+    dict: 臂名称 -> 按坐标排序的点索引数组
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    arms = {}
+    for levels_of, along, names in ((y, x, ("down", "up")), (x, y, ("left", "right"))):
+        levels, labels = _cluster_levels(levels_of, tolerance)
+        counts = np.bincount(labels, minlength=len(levels))
+        if len(levels) < 2:
+            raise ValueError("无法识别十字的四条臂: 坐标层级不足")
+        top_two = np.sort(np.argsort(counts, kind='stable')[-2:])
+        for name, level in zip(names, top_two):
+            members = np.flatnonzero(labels == level)
+            if len(members) < min_points:
+                raise ValueError(f"十字的{name}臂只有{len(members)}个点，无法定位峰值")
+            arms[name] = members[np.argsort(along[members], kind='stable')]
+    return arms
+
 class StageCenterAnalyzer:
     def __init__(self):
         self.delta_up = None
@@ -19,32 +143,20 @@ class StageCenterAnalyzer:
             "delta_x": None,
             "delta_y": None
         }
-        # 添加日志记录器
-        self.logger = logging.getLogger('StageCenterAnalyzer')
-        self.logger.setLevel(logging.DEBUG)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        # 日志输出由 utils.logging_config 统一配置，这里不再添加处理器
+        self.logger = logger
     
     def load_files(self, initial_path, after_path):
         """加载初始文件和刻蚀后文件"""
         try:
             self.logger.info(f"开始加载文件: {initial_path} 和 {after_path}")
             
-            # 读取CSV文件
-            df_initial = pd.read_csv(initial_path)
-            df_after = pd.read_csv(after_path)
-            
-            self.logger.info(f"初始文件原始行数: {len(df_initial)}")
-            self.logger.info(f"刻蚀后文件原始行数: {len(df_after)}")
-            
-            # 清理文件：删除任何可能存在的空行
-            df_initial = df_initial.dropna(how='all')
-            df_after = df_after.dropna(how='all')
+            # 读取CSV文件（加载器已删除空行）
+            df_initial = load_thickness_map(initial_path).to_dataframe()
+            df_after = load_thickness_map(after_path).to_dataframe()
             
-            self.logger.info(f"初始文件清理后行数: {len(df_initial)}")
-            self.logger.info(f"刻蚀后文件清理后行数: {len(df_after)}")
+            self.logger.info(f"初始文件行数: {len(df_initial)}")
+            self.logger.info(f"刻蚀后文件行数: {len(df_after)}")
             
             # 验证文件格式
             required_columns = ['X', 'Y', 'Thickness(nm)']
@@ -60,14 +172,9 @@ class StageCenterAnalyzer:
                 self.logger.error(error_msg)
                 raise ValueError(error_msg)
             
-            # 验证行数 - CSV文件中应有1行表头+324行数据 = 总共325行
-            # 但Pandas读取后会去掉表头，所以数据行数应为324行
-            expected_rows = 324
-            self.logger.info(f"预期数据行数(不包括表头): {expected_rows}")
-            
-            if len(df_initial) != expected_rows or len(df_after) != expected_rows:
-                self.logger.error(f"初始文件实际行数: {len(df_initial)}, 刻蚀后文件实际行数: {len(df_after)}")
-                raise ValueError(f"文件应包含324行数据（不包括表头）。当前初始文件{len(df_initial)}行，刻蚀后文件{len(df_after)}行")
+            # 两个文件需逐点对应；点数不限，四条臂在计算时由坐标识别
+            if len(df_initial) != len(df_after):
+                raise ValueError(f"初始文件{len(df_initial)}行与刻蚀后文件{len(df_after)}行不一致")
             
             # 重置索引，确保索引连续
             self.initial_df = df_initial.reset_index(drop=True)
@@ -80,58 +187,64 @@ class StageCenterAnalyzer:
             self.logger.exception("文件加载失败")
             raise RuntimeError(f"文件加载失败: {str(e)}")
     
-    def calculate_results(self, old_center_x, old_center_y):
-        """计算四个方向的偏移量和新的中心点位置"""
-        self.logger.info(f"开始计算中心点偏移结果, 旧中心点: ({old_center_x}, {old_center_y})")
+    def calculate_results(self, old_center_x, old_center_y, threshold=0.5, model=PEAK_GAUSSIAN):
+        """
+        计算四个方向的偏移量和新的中心点位置
         
-        # 复制数据避免修改原始文件
-        initial_df = self.initial_df.copy()
-        after_df = self.after_df.copy()
+        四条臂由坐标自动识别，每条臂的刻蚀峰位置通过最大值附近的
+        亚网格拟合得到，并给出1σ不确定度。
+        """
+        self.logger.info(f"开始计算中心点偏移结果, 旧中心点: ({old_center_x}, {old_center_y})")
         
         # 计算刻蚀量（初始厚度 - 刻蚀后厚度）
-        etching_df = initial_df.copy()
-        etching_df["TrimmingAmount"] = initial_df["Thickness(nm)"] - after_df["Thickness(nm)"]
-        
-        # 数据分区 (基于324行数据)
-        # 共324行数据，分为4个区域，每个区域81行
+        etching_df = self.initial_df.copy()
+        etching_df["TrimmingAmount"] = (
+            self.initial_df["Thickness(nm)"].to_numpy(dtype=float)
+            - self.after_df["Thickness(nm)"].to_numpy(dtype=float)
+        )
         
-        # 上方: 第0行到第80行 (共81行)
-        top_section = etching_df.iloc[0:81]
-        self.logger.info(f"上方区域行数: {len(top_section)}")
+        x = etching_df["X"].to_numpy(dtype=float)
+        y = etching_df["Y"].to_numpy(dtype=float)
+        amount = etching_df["TrimmingAmount"].to_numpy(dtype=float)
+        arms = detect_cross_arms(x, y)
         
-        # 下方: 第81行到第161行 (共81行)
-        bottom_section = etching_df.iloc[81:162]
-        self.logger.info(f"下方区域行数: {len(bottom_section)}")
+        # 上下两臂沿X方向、左右两臂沿Y方向，补齐为等长数组后一次拟合
+        max_len = max(len(arms[name]) for name in ARM_NAMES)
+        arm_coords = np.full((len(ARM_NAMES), max_len), np.nan)
+        arm_values = np.full((len(ARM_NAMES), max_len), np.nan)
+        arm_profiles = {}
+        for i, name in enumerate(ARM_NAMES):
+            members = arms[name]
+            along = x[members] if name in ("up", "down") else y[members]
+            arm_coords[i, :len(members)] = along
+            arm_values[i, :len(members)] = amount[members]
+            arm_profiles[name] = (along, amount[members])
+            self.logger.info(f"{name}臂: {len(members)}个点")
         
-        # 右方: 第162行到第242行 (共81行)
-        right_section = etching_df.iloc[162:243]
-        self.logger.info(f"右方区域行数: {len(right_section)}")
+        peaks = fit_peak_positions(arm_coords, arm_values, threshold=threshold, model=model)
+        for i, name in enumerate(ARM_NAMES):
+            if not peaks["fitted"][i]:
+                self.logger.warning(f"{name}臂峰值拟合失败，使用最大值点坐标")
+            self.logger.info(
+                f"{name}臂: 峰位置 {peaks['position'][i]:.4f} ± {peaks['sigma'][i]:.4f}, "
+                f"峰值刻蚀量 {peaks['height'][i]:.4f}"
+            )
         
-        # 左方: 第243行到第323行 (共81行)
-        left_section = etching_df.iloc[243:324]
-        self.logger.info(f"左方区域行数: {len(left_section)}")
-        
-        # 计算各方向偏移量
-        self.delta_up = self._calculate_offset(top_section, "上方")
-        self.delta_down = self._calculate_offset(bottom_section, "下方")
-        self.delta_right = self._calculate_offset(right_section, "右方", is_vertical=False)
-        self.delta_left = self._calculate_offset(left_section, "左方", is_vertical=False)
-        
-        self.logger.info(f"上方偏移量: {self.delta_up}")
-        self.logger.info(f"下方偏移量: {self.delta_down}")
-        self.logger.info(f"右方偏移量: {self.delta_right}")
-        self.logger.info(f"左方偏移量: {self.delta_left}")
+        self.delta_up, self.delta_down, self.delta_right, self.delta_left = peaks["position"].tolist()
+        sigma_up, sigma_down, sigma_right, sigma_left = peaks["sigma"].tolist()
         
         # 计算中心点偏移量
         self.delta_x = -(self.delta_up + self.delta_down) / 2
         self.delta_y = (self.delta_right + self.delta_left) / 2
+        delta_x_sigma = np.hypot(sigma_up, sigma_down) / 2
+        delta_y_sigma = np.hypot(sigma_right, sigma_left) / 2
         
         # 计算新的中心点坐标
         self.new_center_x = old_center_x + self.delta_x
         self.new_center_y = old_center_y + self.delta_y
         
-        self.logger.info(f"X轴偏移量: {self.delta_x}")
-        self.logger.info(f"Y轴偏移量: {self.delta_y}")
+        self.logger.info(f"X轴偏移量: {self.delta_x} ± {delta_x_sigma}")
+        self.logger.info(f"Y轴偏移量: {self.delta_y} ± {delta_y_sigma}")
         self.logger.info(f"新中心点坐标: ({self.new_center_x}, {self.new_center_y})")
         
         # 存储结果
@@ -144,24 +257,16 @@ class StageCenterAnalyzer:
             "delta_y": self.delta_y,
             "new_center_x": self.new_center_x,
             "new_center_y": self.new_center_y,
+            "sigma_up": sigma_up,
+            "sigma_down": sigma_down,
+            "sigma_right": sigma_right,
+            "sigma_left": sigma_left,
+            "delta_x_sigma": delta_x_sigma,
+            "delta_y_sigma": delta_y_sigma,
+            "peaks_fitted": dict(zip(ARM_NAMES, peaks["fitted"].tolist())),
+            "arm_profiles": arm_profiles,  # 臂名称 -> (沿臂坐标, 刻蚀量)
             "etching_df": etching_df  # 包含刻蚀量的完整数据
         }
         
         self.logger.info("计算完成")
         return self.results
-    
-    def _calculate_offset(self, section, section_name, is_vertical=True):
-        """计算特定区域的偏移量"""
-        if section.empty:
-            self.logger.warning(f"{section_name}区域为空")
-            return 0.0
-        
-        # 找到刻蚀量最大值的索引
-        max_idx = section["TrimmingAmount"].idxmax()
-        max_value = section["TrimmingAmount"].max()
-        
-        result = section.at[max_idx, "X"] if is_vertical else section.at[max_idx, "Y"]
-        self.logger.info(f"{section_name}区域: 最大刻蚀量 {max_value:.4f} 在坐标 [{section.at[max_idx, 'X']}, {section.at[max_idx, 'Y']}]")
-        
-        return result
-
@@ -0,0 +1,167 @@
+import numpy as np
+
+# 插值阶数: 1 = 双线性, 3 = 双三次
+INTERP_BILINEAR = 1
+INTERP_BICUBIC = 3
+
+
+class LineProfileSampler:
+    """
+    规则网格分布图（膜厚/刻蚀量/蚀刻能力）的任意方向剖面采样器
+
+    网格在构造时只预处理一次（双三次时做样条预滤波），
+    之后任意批量的线段、角度扫描和径向/方位平均都通过
+    一次 map_coordinates 调用完成。网格中缺失的点 (NaN)
+    在结果中也返回 NaN。
+    """
+
+    def __init__(self, x_coords, y_coords, values, order=INTERP_BILINEAR):
+        """
+        参数:
+        x_coords: 升序、等间隔的x坐标 (长度 nx)
+        y_coords: 升序、等间隔的y坐标 (长度 ny)
+        values: 数值矩阵，形状 (ny, nx)，values[i, j] 对应 (x_coords[j], y_coords[i])
+        order: 插值阶数，1 为双线性，3 为双三次
+        """
+        from scipy.ndimage import distance_transform_edt, spline_filter
+        x_coords = np.asarray(x_coords, dtype=float)
+        y_coords = np.asarray(y_coords, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if values.shape != (len(y_coords), len(x_coords)):
+            raise ValueError(f"数值矩阵尺寸 {values.shape} 与坐标长度 ({len(y_coords)}, {len(x_coords)}) 不匹配")
+        if order not in (INTERP_BILINEAR, INTERP_BICUBIC):
+            raise ValueError(f"不支持的插值阶数: {order}")
+
+        self.x0, self.dx = self._axis_spacing(x_coords, "x")
+        self.y0, self.dy = self._axis_spacing(y_coords, "y")
+        self.x_coords = x_coords
+        self.y_coords = y_coords
+        self.order = order
+
+        # 缺失点先填充后参与插值，再用有效性权重标记结果中的缺失。
+        # 双三次的样条预滤波会把每个点的值扩散到整个网格，缺失点若置0会使其附近的有效结果
+        # 明显偏低，因此用最近的有效点填充；双线性只用相邻4点，有效结果不受填充值影响
+        valid = ~np.isnan(values)
+        self._has_missing = not valid.all()
+        if self._has_missing and order > 1 and valid.any():
+            nearest = distance_transform_edt(~valid, return_distances=False, return_indices=True)
+            filled = values[tuple(nearest)]
+        else:
+            filled = np.where(valid, values, 0.0)
+        self._valid = valid.astype(float)
+        self._data = spline_filter(filled, order=order) if order > 1 else filled
+
+    @staticmethod
+    def _axis_spacing(coords, name):
+        """检查坐标为等间隔升序，返回 (起点, 间隔)"""
+        if len(coords) < 2:
+            raise ValueError(f"{name}方向至少需要2个坐标点")
+        steps = np.diff(coords)
+        step = steps.mean()
+        if step <= 0 or np.abs(steps - step).max() > 1e-6 * max(abs(step), 1.0) + 1e-9:
+            raise ValueError(f"{name}坐标必须为等间隔升序的规则网格")
+        return coords[0], step
+
+    @classmethod
+    def from_index(cls, index, order=INTERP_BILINEAR):
+        """由 rawData_processor.TrimmingMapIndex 创建（需为规则网格）"""
+        x_levels, y_levels, grid = index.to_grid()
+        return cls(x_levels, y_levels, grid, order=order)
+
+    @classmethod
+    def from_mgrid(cls, grid_x, grid_y, grid_z, order=INTERP_BILINEAR):
+        """由 np.mgrid 风格的网格（grid_x 沿第0轴变化）创建，如 BeamSpotTestProcessor 的插值结果"""
+        return cls(grid_x[:, 0], grid_y[0, :], np.asarray(grid_z).T, order=order)
+
+    def sample_points(self, x, y):
+        """在任意形状的坐标数组上采样，返回同形状的数值（网格外为NaN）"""
+        from scipy.ndimage import map_coordinates
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        cols = (x - self.x0) / self.dx
+        rows = (y - self.y0) / self.dy
+        coords = np.vstack([rows.ravel(), cols.ravel()])
+
+        sampled = map_coordinates(self._data, coords, order=self.order, mode='nearest', prefilter=False)
+        outside = ((rows.ravel() < 0) | (rows.ravel() > len(self.y_coords) - 1)
+                   | (cols.ravel() < 0) | (cols.ravel() > len(self.x_coords) - 1))
+        if self._has_missing:
+            weight = map_coordinates(self._valid, coords, order=1, mode='nearest')
+            outside |= weight < 1.0 - 1e-9
+        sampled[outside] = np.nan
+        return sampled.reshape(x.shape)
+
+    def sample_segments(self, starts, ends, num_points=121):
+        """
+        批量采样线段剖面
+
+        参数:
+        starts, ends: 形状 (线段数, 2) 的起点/终点坐标 [(x, y), ...]
+
+        返回:
+        tuple: (沿线距离 (线段数, num_points), 剖面值 (线段数, num_points))
+        """
+        starts = np.atleast_2d(np.asarray(starts, dtype=float))
+        ends = np.atleast_2d(np.asarray(ends, dtype=float))
+        t = np.linspace(0.0, 1.0, num_points)
+        points = starts[:, None, :] + (ends - starts)[:, None, :] * t[None, :, None]
+        lengths = np.hypot(*(ends - starts).T)
+        distances = lengths[:, None] * t[None, :]
+        return distances, self.sample_points(points[..., 0], points[..., 1])
+
+    def sample_angles(self, angles_deg, center=(0.0, 0.0), radius=15.0, num_points=121):
+        """
+        过中心点、沿多个角度的直径剖面（角度以x轴正方向为0，逆时针为正）
+
+        返回:
+        tuple: (带符号的径向坐标 (num_points,), 剖面值 (角度数, num_points))
+        """
+        theta = np.deg2rad(np.atleast_1d(np.asarray(angles_deg, dtype=float)))
+        r = np.linspace(-radius, radius, num_points)
+        x = center[0] + np.cos(theta)[:, None] * r[None, :]
+        y = center[1] + np.sin(theta)[:, None] * r[None, :]
+        return r, self.sample_points(x, y)
+
+    def polar_samples(self, center=(0.0, 0.0), radius=15.0, num_radii=151, num_angles=360):
+        """
+        极坐标网格采样
+
+        返回:
+        tuple: (半径 (num_radii,), 角度(度) (num_angles,), 数值 (num_angles, num_radii))
+        """
+        r = np.linspace(0.0, radius, num_radii)
+        angles = np.arange(num_angles) * (360.0 / num_angles)
+        theta = np.deg2rad(angles)
+        x = center[0] + np.cos(theta)[:, None] * r[None, :]
+        y = center[1] + np.sin(theta)[:, None] * r[None, :]
+        return r, angles, self.sample_points(x, y)
+
+    def radial_profile(self, center=(0.0, 0.0), radius=15.0, num_radii=151, num_angles=360):
+        """
+        方位平均的径向剖面
+
+        返回:
+        tuple: (半径, 平均值, 标准差)，每个半径上对所有角度求统计（忽略NaN）
+        """
+        r, _, values = self.polar_samples(center, radius, num_radii, num_angles)
+        with np.errstate(invalid='ignore'):
+            counts = np.sum(~np.isnan(values), axis=0)
+            mean = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), np.nan)
+            var = np.where(
+                counts > 0,
+                np.nansum((values - mean[None, :]) ** 2, axis=0) / np.maximum(counts, 1),
+                np.nan
+            )
+        return r, mean, np.sqrt(var)
+
+    def azimuthal_profile(self, center=(0.0, 0.0), radius=15.0, num_angles=360, num_radii=151):
+        """
+        径向平均的方位剖面（0~radius 范围内对半径求平均）
+
+        返回:
+        tuple: (角度(度), 平均值)
+        """
+        _, angles, values = self.polar_samples(center, radius, num_radii, num_angles)
+        with np.errstate(invalid='ignore'):
+            counts = np.sum(~np.isnan(values), axis=1)
+            mean = np.where(counts > 0, np.nansum(values, axis=1) / np.maximum(counts, 1), np.nan)
+        return angles, mean
@@ -0,0 +1,418 @@
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from utils.file_catalog import KIND_PM_LOG, KIND_SCAN_LOG, get_catalog
+from utils.file_io import get_resource_path
+from utils.sampling_log import LOG_ENCODING, read_header
+
+logger = logging.getLogger('MachineHistory')
+
+HISTORY_PATH = "Data/config/machine_history.db"
+
+# 默认收录的机台log类别
+DEFAULT_KINDS = (KIND_SCAN_LOG, KIND_PM_LOG)
+
+# 聚合窗口（毫秒）
+WINDOW_HOUR = "hour"
+WINDOW_DAY = "day"
+_WINDOW_MS = {WINDOW_HOUR: 3600 * 1000, WINDOW_DAY: 86400 * 1000}
+
+# 相邻两行的时刻倒退超过该毫秒数时视为跨过午夜
+_DAY_ROLLOVER_MS = 12 * 3600 * 1000
+
+_EPOCH = datetime(1970, 1, 1)
+_FILE_DATE_PATTERN = re.compile(r"^(\d{8})")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    name TEXT PRIMARY KEY,
+    col TEXT NOT NULL UNIQUE,
+    unit TEXT
+);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    ingested_bytes INTEGER NOT NULL,
+    base_date TEXT NOT NULL,
+    day_offset INTEGER NOT NULL,
+    last_tod_ms INTEGER
+);
+"""
+
+
+def to_ms(value):
+    """datetime / numpy.datetime64 / 'YYYY-MM-DD HH:MM:SS' -> 本地时间毫秒数（不做时区换算）"""
+    if isinstance(value, (np.datetime64, np.ndarray)):
+        return int(np.asarray(value).astype('datetime64[ms]').astype(np.int64))
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+def to_datetime64(ms):
+    """毫秒数组 -> numpy.datetime64[ms] 数组"""
+    return np.asarray(ms, dtype=np.int64).astype('datetime64[ms]')
+
+
+def parse_time_of_day(text):
+    """
+    解析机台log的 Time 列，如 "20:36:16:756" 或 "20:36:16.756"
+
+    返回:
+    int: 当天的毫秒数，无法解析时返回 None
+    """
+    parts = text.strip().replace(".", ":").split(":")
+    if len(parts) < 3:
+        return None
+    try:
+        hours, minutes, seconds = int(parts[0]), int(parts[1]), int(parts[2])
+        millis = int(parts[3].ljust(3, "0")[:3]) if len(parts) > 3 and parts[3] else 0
+    except ValueError:
+        return None
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + millis
+
+
+def _file_date(path):
+    """机台log按日期命名（如 2025110920.csv）；无法识别时取文件修改日期"""
+    match = _FILE_DATE_PATTERN.match(Path(path).name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d")
+        except ValueError:
+            pass
+    mtime = datetime.fromtimestamp(os.stat(path).st_mtime)
+    return datetime(mtime.year, mtime.month, mtime.day)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class MachineHistory:
+    """
+    机台参数历史库（SQLite，按时间戳为主键、每个参数一列 REAL）
+
+    ingest() 增量收录 SamplingLog: 每个文件记录已收录到的字节偏移，
+    之后只解析新追加的完整行，文件变小（被重写）时从头重新收录。
+    同一时刻的 ScanData 与 PM 记录合并到同一行。
+    时间戳为本地时间的毫秒数（不做时区换算），按小时/天聚合时以本地零点对齐。
+    """
+
+    def __init__(self, db_path=None):
+        """
+        参数:
+        db_path: 数据库文件路径，缺省为 Data/config/machine_history.db；":memory:" 表示不落盘
+        """
+        if db_path is None:
+            db_path = get_resource_path(HISTORY_PATH)
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._columns = dict(self._conn.execute("SELECT name, col FROM parameters"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def parameters(self):
+        """已收录的参数名及单位: {参数名: 单位}"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, unit FROM parameters ORDER BY rowid"))
+
+    def _column(self, name, unit=None):
+        """参数名 -> 列名，新参数自动加列"""
+        col = self._columns.get(name)
+        if col is None:
+            col = f"p{len(self._columns)}"
+            # ALTER TABLE 不随事务回滚，上次失败时可能已留下空列
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(samples)")}
+            if col not in existing:
+                self._conn.execute(f"ALTER TABLE samples ADD COLUMN {col} REAL")
+            self._conn.execute(
+                "INSERT INTO parameters (name, col, unit) VALUES (?, ?, ?)", (name, col, unit)
+            )
+            self._columns[name] = col
+        return col
+
+    def _columns_for(self, params):
+        if params is None:
+            return list(self._columns.items())
+        missing = [name for name in params if name not in self._columns]
+        if missing:
+            raise KeyError(f"历史库中没有参数: {', '.join(missing)}")
+        return [(name, self._columns[name]) for name in params]
+
+    # ------------------------------------------------------------------ 收录
+
+    def ingest_file(self, path):
+        """
+        增量收录一个机台log文件
+
+        返回:
+        int: 新收录的行数
+        """
+        key = os.fspath(path)
+        stat = os.stat(key)
+        with self._lock:
+            state = self._conn.execute(
+                "SELECT ingested_bytes, base_date, day_offset, last_tod_ms FROM ingested_files WHERE path = ?",
+                (key,)
+            ).fetchone()
+            if state is not None and state[0] == stat.st_size:
+                return 0
+
+            header = read_header(key, stat)
+            if state is None or stat.st_size < state[0]:
+                offset, base_date = header.data_offset, _file_date(key)
+                day_offset, last_tod = 0, None
+            else:
+                offset, base_date = state[0], datetime.fromisoformat(state[1])
+                day_offset, last_tod = state[2], state[3]
+
+            try:
+                time_index = header.headers.index("Time")
+            except ValueError:
+                logger.warning(f"机台log没有Time列，跳过: {key}")
+                return 0
+
+            with open(key, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(stat.st_size - offset)
+            # 只收录完整的行，末尾的半行留到下次
+            end = chunk.rfind(b"\n") + 1
+            lines = chunk[:end].decode(LOG_ENCODING, errors="replace").splitlines()
+            units = header.units + [""] * (len(header.headers) - len(header.units))
+            value_columns = {}
+            for index, name in enumerate(header.headers):
+                if index != time_index and name and name not in value_columns:
+                    value_columns[name] = index
+
+            rows = []
+            base_ms = to_ms(base_date)
+            for row in csv.reader(lines):
+                if len(row) <= time_index:
+                    continue
+                tod = parse_time_of_day(row[time_index])
+                if tod is None:
+                    continue
+                if last_tod is not None and tod < last_tod - _DAY_ROLLOVER_MS:
+                    day_offset += 1
+                last_tod = tod
+                rows.append(
+                    [base_ms + day_offset * _WINDOW_MS[WINDOW_DAY] + tod]
+                    + [_to_float(row[index]) if index < len(row) else None for index in value_columns.values()]
+                )
+
+            try:
+                with self._conn:
+                    col_names = [
+                        self._column(name, units[index].strip() or None)
+                        for name, index in value_columns.items()
+                    ]
+                    sql = (
+                        f"INSERT INTO samples (ts, {', '.join(col_names)}) "
+                        f"VALUES ({', '.join('?' * (len(col_names) + 1))}) "
+                        f"ON CONFLICT(ts) DO UPDATE SET "
+                        + ", ".join(f"{col} = excluded.{col}" for col in col_names)
+                    )
+                    self._conn.executemany(sql, rows)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO ingested_files "
+                        "(path, ingested_bytes, base_date, day_offset, last_tod_ms) VALUES (?, ?, ?, ?, ?)",
+                        (key, offset + end, base_date.isoformat(), day_offset, last_tod)
+                    )
+            except sqlite3.Error:
+                # 事务回滚后新登记的参数也不存在了，重新读取列映射
+                self._columns = dict(self._conn.execute("SELECT name, col FROM parameters"))
+                raise
+        added = len(rows)
+        if added:
+            logger.debug("收录机台log %s: %d行", key, added)
+        return added
+
+    def ingest(self, kinds=DEFAULT_KINDS, catalog=None):
+        """
+        增量收录文件索引中全部机台log
+
+        返回:
+        int: 新收录的行数
+        """
+        catalog = catalog or get_catalog()
+        added = 0
+        for kind in kinds:
+            for entry in catalog.between(kind):
+                try:
+                    added += self.ingest_file(entry.path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"收录机台log失败 {entry.path}: {e}")
+        if added:
+            logger.info("机台参数历史库新增 %d 行", added)
+        return added
+
+    # ------------------------------------------------------------------ 查询
+
+    def _range_clause(self, start, end):
+        start_ms = to_ms(start) if start is not None else -2 ** 63
+        end_ms = to_ms(end) if end is not None else 2 ** 63 - 1
+        return "ts BETWEEN ? AND ?", (start_ms, end_ms)
+
+    def slice(self, params=None, start=None, end=None):
+        """
+        按时间范围取参数序列（走主键索引）
+
+        返回:
+        tuple: (时间 numpy.datetime64[ms] 数组, {参数名: float 数组，缺失值为 NaN})
+        """
+        with self._lock:
+            columns = self._columns_for(params)
+            where, args = self._range_clause(start, end)
+            select = ", ".join(["ts"] + [col for _, col in columns])
+            rows = self._conn.execute(
+                f"SELECT {select} FROM samples WHERE {where} ORDER BY ts", args
+            ).fetchall()
+        data = np.array(rows, dtype=float).reshape(len(rows), len(columns) + 1)
+        times = to_datetime64(data[:, 0].astype(np.int64))
+        return times, {name: data[:, i + 1] for i, (name, _) in enumerate(columns)}
+
+    def aggregate(self, params=None, window=WINDOW_HOUR, start=None, end=None):
+        """
+        按小时/天（或任意毫秒数）分窗统计 count / mean / std / min / max
+
+        分窗求和在 SQLite 中完成，不把原始样本取回 Python；
+        方差以全时段均值为参考点计算，避免大数相减的精度损失。
+
+        返回:
+        tuple: (各窗口起点 numpy.datetime64[ms] 数组,
+                {参数名: {"count", "mean", "std", "min", "max": 数组}})
+        """
+        width = _WINDOW_MS.get(window, window)
+        if not isinstance(width, int) or width <= 0:
+            raise ValueError(f"无效的聚合窗口: {window}")
+
+        with self._lock:
+            columns = self._columns_for(params)
+            where, args = self._range_clause(start, end)
+            if not columns:
+                return to_datetime64([]), {}
+            refs = self._conn.execute(
+                f"SELECT {', '.join(f'AVG({col})' for _, col in columns)} FROM samples WHERE {where}",
+                args
+            ).fetchone()
+            refs = [0.0 if ref is None else ref for ref in refs]
+            terms = []
+            ref_args = []
+            for (_, col), ref in zip(columns, refs):
+                terms += [f"COUNT({col})", f"SUM({col} - ?)", f"SUM(({col} - ?) * ({col} - ?))",
+                          f"MIN({col})", f"MAX({col})"]
+                ref_args += [ref, ref, ref]
+            rows = self._conn.execute(
+                f"SELECT (ts - (ts % ?)) AS bucket, {', '.join(terms)} FROM samples "
+                f"WHERE {where} GROUP BY bucket ORDER BY bucket", (width, *ref_args, *args)
+            ).fetchall()
+
+        data = np.array(rows, dtype=float).reshape(len(rows), 1 + 5 * len(columns))
+        starts = to_datetime64(data[:, 0].astype(np.int64))
+        result = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for i, ((name, _), ref) in enumerate(zip(columns, refs)):
+                count, shifted_sum, shifted_sq, col_min, col_max = data[:, 1 + 5 * i: 6 + 5 * i].T
+                shifted_mean = shifted_sum / count
+                variance = np.maximum(shifted_sq / count - shifted_mean ** 2, 0.0)
+                result[name] = {
+                    "count": count.astype(np.int64),
+                    "mean": shifted_mean + ref,
+                    "std": np.sqrt(variance),
+                    "min": col_min,
+                    "max": col_max,
+                }
+        return starts, result
+
+    def values_at(self, times, params=None, max_age=600.0):
+        """
+        各时刻之前最近一次的参数值（如每片晶圆WedgeTest的时间），用于与斜率做相关分析
+
+        参数:
+        times: datetime / numpy.datetime64 序列
+        max_age: 最近一次记录早于该秒数时返回 NaN
+
+        返回:
+        dict: {参数名: 与 times 等长的 float 数组}
+        """
+        query = np.array([to_ms(t) for t in times], dtype=np.int64)
+        if len(query) == 0:
+            return {name: np.array([]) for name, _ in self._columns_for(params)}
+        max_age_ms = int(max_age * 1000)
+        sample_times, series = self.slice(
+            params, start=to_datetime64(query.min() - max_age_ms), end=to_datetime64(query.max())
+        )
+        sample_ms = sample_times.astype(np.int64)
+        result = {}
+        for name, values in series.items():
+            # ScanData 与 PM 的记录时刻不同，按各参数自己的有效记录查找
+            present = ~np.isnan(values)
+            times_ms, values = sample_ms[present], values[present]
+            index = np.searchsorted(times_ms, query, side="right") - 1
+            valid = index >= 0
+            valid[valid] = query[valid] - times_ms[index[valid]] <= max_age_ms
+            out = np.full(len(query), np.nan)
+            out[valid] = values[index[valid]]
+            result[name] = out
+        return result
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """进程内共享的机台参数历史库"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = MachineHistory()
+        return _history
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="机台参数历史库")
+    parser.add_argument("--window", default=WINDOW_DAY, help="聚合窗口: hour / day / 毫秒数")
+    parser.add_argument("--start", default=None, help="起始时间，如 2025-11-01")
+    parser.add_argument("--end", default=None, help="结束时间")
+    parser.add_argument("params", nargs="*", help="要统计的参数，缺省只收录不统计")
+    args = parser.parse_args()
+
+    from utils.logging_config import setup_logging
+    setup_logging()
+    history = get_history()
+    history.ingest()
+    if not args.params:
+        return
+    window = int(args.window) if args.window.isdigit() else args.window
+    starts, stats = history.aggregate(args.params, window, args.start, args.end)
+    for name, values in stats.items():
+        print(name)
+        for i, start in enumerate(starts):
+            if values["count"][i]:
+                print(f"  {start}  n={values['count'][i]:<6d} mean={values['mean'][i]:.6g} "
+                      f"std={values['std'][i]:.4g} min={values['min'][i]:.6g} max={values['max'][i]:.6g}")
+
+
+if __name__ == "__main__":
+    main()
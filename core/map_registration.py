@@ -0,0 +1,271 @@
+import numpy as np
+
+from core.thickness_loader import DEFAULT_COORD_TOLERANCE, _cluster_levels
+
+
+def _median_spacing(coords, tolerance=DEFAULT_COORD_TOLERANCE):
+    """坐标层级之间的典型间距"""
+    levels, _ = _cluster_levels(np.asarray(coords, dtype=float), tolerance)
+    if len(levels) < 2:
+        raise ValueError("坐标层级不足，无法确定网格间距")
+    return float(np.median(np.diff(levels)))
+
+
+def _as_lattice(x, y, values, tolerance=DEFAULT_COORD_TOLERANCE):
+    """散点恰好构成完整规则网格时返回 (x_levels, y_levels, grid)，否则返回 None"""
+    x_levels, x_labels = _cluster_levels(x, tolerance)
+    y_levels, y_labels = _cluster_levels(y, tolerance)
+    nx, ny = len(x_levels), len(y_levels)
+    if nx < 2 or ny < 2 or nx * ny != len(x):
+        return None
+    keys = y_labels * nx + x_labels
+    if len(np.unique(keys)) != len(x):
+        return None
+    grid = np.empty(nx * ny)
+    grid[keys] = values
+    return x_levels, y_levels, grid.reshape(ny, nx)
+
+
+def rasterize_map(x, y, values, x_grid, y_grid, fill_value=0.0):
+    """
+    将散点分布图线性插值到规则网格
+
+    散点本身是完整规则网格时直接做双线性插值，否则用三角剖分线性插值。
+
+    参数:
+    x, y, values: 散点坐标与数值
+    x_grid, y_grid: 目标网格的一维坐标
+    fill_value: 数据范围以外的填充值
+
+    返回:
+    np.ndarray: 形状 (len(y_grid), len(x_grid)) 的网格数值
+    """
+    from scipy.interpolate import RegularGridInterpolator, griddata
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(values))
+    x, y, values = x[valid], y[valid], values[valid]
+    gx, gy = np.meshgrid(x_grid, y_grid)
+
+    lattice = _as_lattice(x, y, values)
+    if lattice is not None:
+        x_levels, y_levels, grid = lattice
+        interpolator = RegularGridInterpolator(
+            (y_levels, x_levels), grid, bounds_error=False, fill_value=fill_value
+        )
+        return interpolator((gy, gx))
+    return griddata((x, y), values, (gx, gy), method='linear', fill_value=fill_value)
+
+
+def _cross_correlate(a, b, shape):
+    """c(s) = sum_p a(p) * b(p + s)，补零到 shape 后用实数FFT计算"""
+    return np.fft.irfft2(np.fft.rfft2(a, shape).conj() * np.fft.rfft2(b, shape), shape)
+
+
+def _parabolic_offset(minus, center, plus):
+    """三点抛物线拟合峰值相对中心点的亚像素偏移"""
+    denominator = minus - 2 * center + plus
+    if not np.isfinite(denominator) or denominator >= 0:
+        return 0.0
+    return float(np.clip(0.5 * (minus - plus) / denominator, -0.5, 0.5))
+
+
+def masked_correlation(reference, moving, reference_mask=None, moving_mask=None, min_overlap=0.5):
+    """
+    带掩码的归一化互相关 (masked NCC) 估计两幅网格图之间的平移
+
+    每个平移量只在两幅图有效区域的重叠部分上计算相关系数，均值和方差也只取
+    重叠部分，因此两幅图覆盖范围不同（如预测图覆盖整个TM网格、量测图只覆盖晶圆）
+    时，有效区域的边界不会参与相关，结果只由图形本身决定。
+    六个互相关项都用FFT计算，总代价 O(N log N)；整像素峰值再用三点抛物线细化。
+
+    参数:
+    reference, moving: 同尺寸网格图，掩码外的数值被忽略（可为 NaN）
+    reference_mask, moving_mask: 有效区域，缺省为非 NaN 的位置
+    min_overlap: 重叠像素数至少为较小有效区域的该比例，否则不考虑该平移
+
+    返回:
+    tuple: (行方向平移, 列方向平移, 相关系数 -1~1)，平移为 moving 相对 reference 的像素位移，
+           即 moving(r, c) ≈ reference(r - 行平移, c - 列平移)
+    """
+    reference = np.asarray(reference, dtype=float)
+    moving = np.asarray(moving, dtype=float)
+    if reference.shape != moving.shape:
+        raise ValueError(f"两幅图尺寸不一致: {reference.shape} vs {moving.shape}")
+    if reference_mask is None:
+        reference_mask = ~np.isnan(reference)
+    if moving_mask is None:
+        moving_mask = ~np.isnan(moving)
+    reference_mask = np.asarray(reference_mask, dtype=bool) & ~np.isnan(reference)
+    moving_mask = np.asarray(moving_mask, dtype=bool) & ~np.isnan(moving)
+    min_count = min(reference_mask.sum(), moving_mask.sum())
+    if min_count < 4:
+        raise ValueError("有效数据点不足，无法配准")
+
+    # 先减去各自均值，减小方差计算中的相消误差（不影响相关系数）
+    ref = np.where(reference_mask, reference - reference[reference_mask].mean(), 0.0)
+    mov = np.where(moving_mask, moving - moving[moving_mask].mean(), 0.0)
+    ref_mask = reference_mask.astype(float)
+    mov_mask = moving_mask.astype(float)
+
+    shape = tuple(2 * n for n in reference.shape)
+    overlap = np.round(_cross_correlate(ref_mask, mov_mask, shape))
+    sum_ref = _cross_correlate(ref, mov_mask, shape)
+    sum_mov = _cross_correlate(ref_mask, mov, shape)
+    sum_ref2 = _cross_correlate(ref * ref, mov_mask, shape)
+    sum_mov2 = _cross_correlate(ref_mask, mov * mov, shape)
+    sum_cross = _cross_correlate(ref, mov, shape)
+
+    valid = overlap >= max(min_overlap * min_count, 2)
+    count = np.where(valid, overlap, 1.0)
+    var_ref = sum_ref2 - sum_ref ** 2 / count
+    var_mov = sum_mov2 - sum_mov ** 2 / count
+    denominator = np.sqrt(np.clip(var_ref, 0.0, None) * np.clip(var_mov, 0.0, None))
+    valid &= denominator > 1e-9 * max(denominator.max(), np.finfo(float).tiny)
+    if not valid.any():
+        raise ValueError("两幅图重叠区域内没有变化，无法配准")
+    ncc = np.full(shape, -np.inf)
+    ncc[valid] = (sum_cross[valid] - sum_ref[valid] * sum_mov[valid] / count[valid]) / denominator[valid]
+
+    peak = np.unravel_index(np.argmax(ncc), shape)
+    strength = float(np.clip(ncc[peak], -1.0, 1.0))
+    shift = []
+    for axis, n in enumerate(shape):
+        before, after = list(peak), list(peak)
+        before[axis] = (peak[axis] - 1) % n
+        after[axis] = (peak[axis] + 1) % n
+        integer = peak[axis] - n if peak[axis] > n // 2 else peak[axis]
+        shift.append(integer + _parabolic_offset(ncc[tuple(before)], ncc[peak], ncc[tuple(after)]))
+    return shift[0], shift[1], strength
+
+
+def _refine_shift(ref_x, ref_y, ref_values, mov_x, mov_y, mov_values, start, strength, pitch):
+    """
+    在整像素平移附近（±1个网格点距内）最大化量测散点与平移后参考图的相关系数
+
+    参考图在其自身点距的网格上做双线性插值，量测点不再插值，避免粗网格引入的偏差。
+    优化失败或跑出搜索范围时保留原平移。
+    峰值对比度为沿X、Y方向各平移±1个点距后相关系数的最小下降量：图形在某个方向上
+    没有结构（如重叠区域内是平面）时相关系数不随平移变化，对比度接近0，平移不可信。
+
+    返回:
+    tuple: (shift_x, shift_y, 相关系数, 峰值对比度)
+    """
+    from scipy.interpolate import RegularGridInterpolator
+    from scipy.optimize import minimize
+
+    ref_x, ref_y, ref_values = (np.asarray(a, dtype=float) for a in (ref_x, ref_y, ref_values))
+    mov_x, mov_y, mov_values = (np.asarray(a, dtype=float) for a in (mov_x, mov_y, mov_values))
+    valid = ~(np.isnan(mov_x) | np.isnan(mov_y) | np.isnan(mov_values))
+    mov_x, mov_y, mov_values = mov_x[valid], mov_y[valid], mov_values[valid]
+
+    fine_pitch = min(_median_spacing(ref_x), _median_spacing(ref_y), pitch)
+    x_grid = np.nanmin(ref_x) + fine_pitch * np.arange(
+        int(np.floor((np.nanmax(ref_x) - np.nanmin(ref_x)) / fine_pitch + 1e-9)) + 1)
+    y_grid = np.nanmin(ref_y) + fine_pitch * np.arange(
+        int(np.floor((np.nanmax(ref_y) - np.nanmin(ref_y)) / fine_pitch + 1e-9)) + 1)
+    interpolator = RegularGridInterpolator(
+        (y_grid, x_grid), rasterize_map(ref_x, ref_y, ref_values, x_grid, y_grid, fill_value=np.nan),
+        bounds_error=False, fill_value=np.nan
+    )
+    min_points = max(4, len(mov_values) // 2)
+
+    def correlation(shift):
+        predicted = interpolator((mov_y - shift[1], mov_x - shift[0]))
+        overlap = ~np.isnan(predicted)
+        if overlap.sum() < min_points:
+            return np.nan
+        return np.corrcoef(predicted[overlap], mov_values[overlap])[0, 1]
+
+    def negative_correlation(shift):
+        value = correlation(shift)
+        return -value if np.isfinite(value) else 1.0
+
+    start = np.asarray(start, dtype=float)
+    step = 0.5 * fine_pitch
+    result = minimize(
+        negative_correlation, start, method="Nelder-Mead",
+        options={"initial_simplex": [start, start + (step, 0.0), start + (0.0, step)],
+                 "xatol": 1e-3 * fine_pitch, "fatol": 1e-12}
+    )
+    shift = result.x if result.success and np.all(np.abs(result.x - start) <= pitch) else start
+    peak = correlation(shift)
+    if not np.isfinite(peak):
+        peak = strength
+
+    contrast = np.inf
+    for axis in (np.array([pitch, 0.0]), np.array([0.0, pitch])):
+        drops = [peak - correlation(shift + sign * axis) for sign in (1.0, -1.0)]
+        drops = [drop for drop in drops if np.isfinite(drop)]
+        contrast = min(contrast, max(drops) if drops else 0.0)
+    return shift[0], shift[1], float(peak), float(contrast)
+
+
+def register_maps(ref_x, ref_y, ref_values, mov_x, mov_y, mov_values, pitch=None, min_overlap=0.5):
+    """
+    估计测量分布图相对参考（或预测）分布图的X/Y平移
+
+    两幅散点图先插值到覆盖两者范围的同一规则网格（默认取两者中较粗的点距），
+    各自数据范围以外记为无效，用带掩码的归一化互相关求整体平移；
+    再在该平移附近直接以量测散点与插值后的参考图计算相关系数，优化得到亚像素平移。
+
+    返回:
+    dict: shift_x, shift_y (测量图相对参考图的位移, 与坐标同单位),
+          strength (重叠区域的相关系数, 越接近1越可靠),
+          contrast (相关峰对比度, 见 _refine_shift; 接近0说明平移无法确定), pitch, grid_shape
+    """
+    if pitch is None:
+        pitch = max(
+            _median_spacing(ref_x), _median_spacing(ref_y),
+            _median_spacing(mov_x), _median_spacing(mov_y)
+        )
+    x_min = min(np.nanmin(ref_x), np.nanmin(mov_x))
+    x_max = max(np.nanmax(ref_x), np.nanmax(mov_x))
+    y_min = min(np.nanmin(ref_y), np.nanmin(mov_y))
+    y_max = max(np.nanmax(ref_y), np.nanmax(mov_y))
+    x_grid = x_min + pitch * np.arange(int(np.floor((x_max - x_min) / pitch + 1e-9)) + 1)
+    y_grid = y_min + pitch * np.arange(int(np.floor((y_max - y_min) / pitch + 1e-9)) + 1)
+
+    reference = rasterize_map(ref_x, ref_y, ref_values, x_grid, y_grid, fill_value=np.nan)
+    moving = rasterize_map(mov_x, mov_y, mov_values, x_grid, y_grid, fill_value=np.nan)
+    row_shift, col_shift, strength = masked_correlation(reference, moving, min_overlap=min_overlap)
+    shift_x, shift_y, strength, contrast = _refine_shift(
+        ref_x, ref_y, ref_values, mov_x, mov_y, mov_values,
+        (col_shift * pitch, row_shift * pitch), strength, pitch
+    )
+    return {
+        "shift_x": float(shift_x),
+        "shift_y": float(shift_y),
+        "strength": strength,
+        "contrast": contrast,
+        "pitch": pitch,
+        "grid_shape": reference.shape,
+    }
+
+
+if __name__ == "__main__":
+    # 回归检查：参考图为 ±94 mm / 2 mm 网格，量测图只覆盖 ±40 mm 圆形区域 (4 mm 网格)。
+    # 量测范围与参考范围不同不应产生位移；零位移必须还原为0，且平面图形必须判为不可信。
+    ref_axis = np.arange(-94.0, 94.0 + 1e-9, 2.0)
+    ref_x, ref_y = (a.ravel() for a in np.meshgrid(ref_axis, ref_axis))
+    mov_axis = np.arange(-40.0, 40.0 + 1e-9, 4.0)
+    mov_x, mov_y = (a.ravel() for a in np.meshgrid(mov_axis, mov_axis))
+    inside = np.hypot(mov_x, mov_y) <= 40.0
+    mov_x, mov_y = mov_x[inside], mov_y[inside]
+
+    def pattern(x, y):
+        return 100.0 + 50.0 * np.exp(-((x - 10.0) ** 2 + (y + 5.0) ** 2) / (2 * 25.0 ** 2))
+
+    for true_shift in [(0.0, 0.0), (3.0, -2.0), (-5.5, 1.3)]:
+        result = register_maps(ref_x, ref_y, pattern(ref_x, ref_y),
+                               mov_x, mov_y, pattern(mov_x - true_shift[0], mov_y - true_shift[1]))
+        print(f"真实位移 {true_shift} -> 估计 ({result['shift_x']:.3f}, {result['shift_y']:.3f}), "
+              f"相关系数 {result['strength']:.4f}, 峰对比度 {result['contrast']:.2e}")
+        assert abs(result["shift_x"] - true_shift[0]) < 0.05
+        assert abs(result["shift_y"] - true_shift[1]) < 0.05
+
+    ramp = register_maps(ref_x, ref_y, ref_x + ref_y, mov_x, mov_y, mov_x + mov_y)
+    print(f"平面图形: 相关系数 {ramp['strength']:.4f}, 峰对比度 {ramp['contrast']:.2e}")
+    assert ramp["contrast"] < 1e-6
+    print("配准回归检查通过")
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from core.rawData_processor import compute_trimming, extract_cross_sections, save_outputs
+from core.beamshape_Moulding import reconstruct_from_profiles, SOLVER_GREEDY
+
+
+class ShapeMouldingPipeline:
+    """
+    原始膜厚数据 → 截面提取 → 光束轮廓重构 的一体化流程
+
+    各阶段之间直接传递内存中的数组，不经过中间CSV；
+    刻蚀量/截面文件和重构结果文件均为可选输出。
+    """
+
+    STAGES = ("trimming", "sections", "reconstruction")
+
+    def __init__(self, pitch=1.0, extent=15.0, solver=SOLVER_GREEDY, tol=1e-9, max_iter=1000):
+        self.pitch = pitch
+        self.extent = extent
+        self.solver = solver
+        self.tol = tol
+        self.max_iter = max_iter
+
+    def run(self, initial_file, after_file, output_dir=None, data_processor_dir=None,
+            export_iterations=False, progress_callback=None):
+        """
+        执行完整流程
+
+        参数:
+        output_dir: 重构结果输出目录，None 时不写重构文件
+        data_processor_dir: 刻蚀量与截面文件的输出基础目录
+                            (与 process_and_save_outputs 相同)，None 时不写
+        progress_callback: 可选回调 callback(阶段名, 进度百分比)
+
+        返回:
+        dict: reconstruct_from_profiles 的结果，另含 trimming_df、x_section、
+              y_section 以及 section_files（未写出时为 None）
+        """
+        def report(stage, percent):
+            if progress_callback:
+                progress_callback(stage, percent)
+
+        report("trimming", 0)
+        trimming_df = compute_trimming(initial_file, after_file)
+
+        report("sections", 30)
+        x_section_df, y_section_df = extract_cross_sections(trimming_df)
+
+        section_files = None
+        if data_processor_dir is not None:
+            section_files = save_outputs(trimming_df, x_section_df, y_section_df, data_processor_dir)
+
+        report("reconstruction", 60)
+        x_section = (x_section_df.iloc[:, 0].to_numpy(dtype=float), x_section_df.iloc[:, 1].to_numpy(dtype=float))
+        y_section = (y_section_df.iloc[:, 0].to_numpy(dtype=float), y_section_df.iloc[:, 1].to_numpy(dtype=float))
+        result = reconstruct_from_profiles(
+            x_section, y_section,
+            Path(output_dir) if output_dir is not None else None,
+            pitch=self.pitch, extent=self.extent,
+            export_iterations=export_iterations,
+            solver=self.solver, tol=self.tol, max_iter=self.max_iter
+        )
+
+        report("reconstruction", 100)
+        result.update({
+            "trimming_df": trimming_df,
+            "x_section": x_section,
+            "y_section": y_section,
+            "section_files": section_files
+        })
+        return result
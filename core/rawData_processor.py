@@ -1,107 +1,268 @@
-import pandas as pd
 import numpy as np
 from pathlib import Path
 import os
 
-def flatten_baseline(df, coord_col, value_col):
+from core.thickness_loader import DEFAULT_COORD_TOLERANCE, _cluster_levels, load_thickness_map
+
+def _match_levels(levels, queries, tolerance):
+    """为每个查询坐标找到容差内最近的层级索引，找不到时为-1"""
+    queries = np.atleast_1d(np.asarray(queries, dtype=float))
+    right = np.clip(np.searchsorted(levels, queries), 0, len(levels) - 1)
+    left = np.clip(right - 1, 0, len(levels) - 1)
+    nearest = np.where(
+        np.abs(levels[left] - queries) <= np.abs(levels[right] - queries), left, right
+    )
+    return np.where(np.abs(levels[nearest] - queries) <= tolerance, nearest, -1)
+
+class TrimmingMapIndex:
     """
-    通过端点连线校正基线，使两侧端点归零
+    刻蚀量（或膜厚）分布图的坐标索引
+    
+    X/Y 坐标按容差聚类成行列层级，每个点以 (行, 列) 组合键排序存储，
+    之后任意位置、任意范围的水平/垂直截面（可一次请求多条）
+    都通过一次向量化的 searchsorted 查找完成，无需反复筛选 DataFrame。
+    """
+    
+    def __init__(self, x, y, values, tolerance=DEFAULT_COORD_TOLERANCE):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if not (len(x) == len(y) == len(values)) or len(x) == 0:
+            raise ValueError("坐标与数值长度必须一致且不能为空")
+        
+        self.tolerance = tolerance
+        self.x_levels, x_labels = _cluster_levels(x, tolerance)
+        self.y_levels, y_labels = _cluster_levels(y, tolerance)
+        
+        # 组合键: 行 * 列数 + 列；同一网格点的重复测量取平均
+        keys = y_labels * len(self.x_levels) + x_labels
+        self._keys, inverse = np.unique(keys, return_inverse=True)
+        self._values = np.bincount(inverse, weights=values) / np.bincount(inverse)
+    
+    @classmethod
+    def from_dataframe(cls, df, value_col='Trimmed_Thickness', x_col='X', y_col='Y',
+                       tolerance=DEFAULT_COORD_TOLERANCE):
+        """从含坐标列和数值列的DataFrame创建索引"""
+        return cls(df[x_col].to_numpy(), df[y_col].to_numpy(), df[value_col].to_numpy(), tolerance)
     
-    原理：根据左右端点的值计算基准线，然后从所有点中减去基准值
+    def _lookup(self, rows, cols):
+        """按行列层级索引批量取值（广播），缺失点为NaN"""
+        rows, cols = np.broadcast_arrays(rows, cols)
+        keys = rows * len(self.x_levels) + cols
+        pos = np.clip(np.searchsorted(self._keys, keys), 0, len(self._keys) - 1)
+        found = (self._keys[pos] == keys) & (rows >= 0) & (cols >= 0)
+        return np.where(found, self._values[pos], np.nan)
+    
+    def _levels_in_range(self, levels, lower, upper):
+        mask = (levels >= lower - self.tolerance) & (levels <= upper + self.tolerance)
+        return np.flatnonzero(mask)
+    
+    def horizontal_cuts(self, y_positions, x_min=-np.inf, x_max=np.inf):
+        """
+        提取若干条水平截面 (y = 常数)
+        
+        返回:
+        tuple: (x坐标数组, 数值数组 (截面数, 点数))，缺失点为NaN
+        """
+        rows = _match_levels(self.y_levels, y_positions, self.tolerance)
+        cols = self._levels_in_range(self.x_levels, x_min, x_max)
+        return self.x_levels[cols], self._lookup(rows[:, None], cols[None, :])
+    
+    def vertical_cuts(self, x_positions, y_min=-np.inf, y_max=np.inf):
+        """
+        提取若干条垂直截面 (x = 常数)
+        
+        返回:
+        tuple: (y坐标数组, 数值数组 (截面数, 点数))，缺失点为NaN
+        """
+        cols = _match_levels(self.x_levels, x_positions, self.tolerance)
+        rows = self._levels_in_range(self.y_levels, y_min, y_max)
+        return self.y_levels[rows], self._lookup(rows[None, :], cols[:, None])
+    
+    def to_grid(self):
+        """
+        展开为规则二维网格
+        
+        返回:
+        tuple: (x层级, y层级, 数值矩阵 (len(y层级), len(x层级)))，缺失点为NaN
+        """
+        grid = np.full(len(self.y_levels) * len(self.x_levels), np.nan)
+        grid[self._keys] = self._values
+        return self.x_levels, self.y_levels, grid.reshape(len(self.y_levels), len(self.x_levels))
+
+# 基线校正方法
+BASELINE_ENDPOINT = "endpoint"      # 首尾端点连线
+BASELINE_POLYNOMIAL = "polynomial"  # 最小二乘多项式
+BASELINE_ROBUST = "robust"          # 迭代修正多项式 (ModPoly)，压低正向峰的影响；宽峰时宜配合 edge_width
+
+def _fit_polynomial_baselines(t, values, weights, degree):
+    """对每一行做加权最小二乘多项式拟合，返回拟合出的基线 (行数, 点数)"""
+    vander = t[..., None] ** np.arange(degree + 1)
+    if vander.ndim == 2:
+        vander = np.broadcast_to(vander, values.shape + (degree + 1,))
+    lhs = np.einsum('rpi,rp,rpj->rij', vander, weights, vander)
+    rhs = np.einsum('rpi,rp->ri', vander, weights * values)
+    coeffs = np.linalg.solve(lhs, rhs[..., None])[..., 0]
+    return np.einsum('rpi,ri->rp', vander, coeffs)
+
+def flatten_baselines(coords, profiles, method=BASELINE_ENDPOINT, degree=1,
+                      edge_width=None, max_iter=100, tol=1e-6):
+    """
+    批量基线校正：一次处理多条剖面（每行一条）
     
     参数:
-    df (pd.DataFrame): 输入数据
-    coord_col (str): 坐标列名 (如'X')
-    value_col (str): 值列名 (如'Trimmed_Thickness')
+    coords: 坐标，一维 (点数,) 为所有剖面共用，或二维 (剖面数, 点数)
+    profiles: 剖面数值 (剖面数, 点数)，缺失点为NaN（不参与拟合，结果仍为NaN）
+    method: BASELINE_ENDPOINT / BASELINE_POLYNOMIAL / BASELINE_ROBUST
+    degree: 多项式阶数 (polynomial/robust)
+    edge_width: 仅用距两端不超过该距离的点拟合基线 (polynomial/robust)，缺省用全部点
+    max_iter, tol: robust 方法的迭代次数上限与收敛阈值（相对剖面幅度）
     
     返回:
-    pd.DataFrame: 基线校正后的数据
+    tuple: (校正后的剖面, 基线)，形状均与 profiles 相同
     """
-    # 获取首尾端点坐标
-    start_x = df[coord_col].iloc[0]
-    end_x = df[coord_col].iloc[-1]
-    start_y = df[value_col].iloc[0]
-    end_y = df[value_col].iloc[-1]
-    
-    # 检查数据是否合理
-    if start_x == end_x:
-        raise ValueError(f"坐标列 {coord_col} 的首尾值相同，无法计算基线")
+    profiles = np.atleast_2d(np.asarray(profiles, dtype=float))
+    coords = np.asarray(coords, dtype=float)
+    if coords.shape[-1] != profiles.shape[1] or coords.ndim > 2:
+        raise ValueError(f"坐标尺寸 {coords.shape} 与剖面尺寸 {profiles.shape} 不匹配")
+    coords_2d = np.broadcast_to(coords, profiles.shape)
+    
+    valid = ~np.isnan(profiles) & ~np.isnan(coords_2d)
+    counts = valid.sum(axis=1)
+    n_pts = profiles.shape[1]
+    rows = np.arange(profiles.shape[0])
+    first = np.argmax(valid, axis=1)
+    last = n_pts - 1 - np.argmax(valid[:, ::-1], axis=1)
+    start_x = coords_2d[rows, first]
+    end_x = coords_2d[rows, last]
     
-    # 计算基准线的斜率和截距
-    slope = (end_y - start_y) / (end_x - start_x)
-    intercept = start_y - slope * start_x
+    if method == BASELINE_ENDPOINT:
+        if np.any(counts < 2) or np.any(start_x == end_x):
+            raise ValueError("存在有效点不足或首尾坐标相同的剖面，无法计算基线")
+        start_y = profiles[rows, first]
+        end_y = profiles[rows, last]
+        slope = (end_y - start_y) / (end_x - start_x)
+        baselines = start_y[:, None] + slope[:, None] * (coords_2d - start_x[:, None])
+        flattened = profiles - baselines
+        # 确保端点精确归零
+        flattened[rows, first] = 0.0
+        flattened[rows, last] = 0.0
+        return flattened, baselines
     
-    # 计算每个点的基准值并校正
-    base_value = slope * df[coord_col] + intercept
-    df[value_col] = df[value_col] - base_value
+    if method not in (BASELINE_POLYNOMIAL, BASELINE_ROBUST):
+        raise ValueError(f"未知的基线校正方法: {method}")
     
-    # 确保端点精确归零
-    df[value_col].iloc[0] = 0.0
-    df[value_col].iloc[-1] = 0.0
+    fit_mask = valid
+    if edge_width is not None:
+        fit_mask = valid & (
+            (np.abs(coords_2d - start_x[:, None]) <= edge_width)
+            | (np.abs(end_x[:, None] - coords_2d) <= edge_width)
+        )
+    if np.any(fit_mask.sum(axis=1) <= degree):
+        raise ValueError(f"存在拟合点数不足 {degree + 1} 个的剖面，无法拟合{degree}阶基线")
     
-    # 非负化处理（按需可选）
-    # df[value_col] = np.maximum(df[value_col], 0.0)
+    # 每行坐标映射到 [-1, 1]，改善高阶拟合的数值条件
+    center = (start_x + end_x) / 2.0
+    half_span = np.where(end_x != start_x, np.abs(end_x - start_x) / 2.0, 1.0)
+    t = np.where(valid, (coords_2d - center[:, None]) / half_span[:, None], 0.0)
+    if coords.ndim == 1 and np.all(valid):
+        t = t[0]
     
-    return df
+    weights = fit_mask.astype(float)
+    work = np.where(valid, profiles, 0.0)
+    baselines = _fit_polynomial_baselines(t, work, weights, degree)
+    
+    if method == BASELINE_ROBUST:
+        # ModPoly: 反复把高于基线的点压到基线上再重拟合，直至基线不再变化
+        scale = np.nanmax(np.abs(profiles), axis=1, initial=0.0)
+        scale = np.where(scale > 0, scale, 1.0)
+        active = np.ones(profiles.shape[0], dtype=bool)
+        for _ in range(max_iter):
+            work = np.minimum(work, baselines)
+            updated = _fit_polynomial_baselines(t, work, weights, degree)
+            change = np.max(np.abs(updated - baselines) * weights, axis=1) / scale
+            baselines = np.where(active[:, None], updated, baselines)
+            active &= change > tol
+            if not active.any():
+                break
+    
+    baselines = np.where(valid, baselines, np.nan)
+    return profiles - baselines, baselines
 
-def process_and_save_outputs(initial_file, after_file, output_base_dir):
+def flatten_baseline(df, coord_col, value_col, method=BASELINE_ENDPOINT, degree=1, edge_width=None):
     """
-    处理初始和扫描后文件，生成刻蚀量数据和截面文件
+    单条截面的基线校正（默认通过端点连线使两侧端点归零）
+    
+    基于 flatten_baselines 实现，返回新的DataFrame，不修改输入。
     
     参数:
-    initial_file (str): 初始膜厚文件路径
-    after_file (str): 扫描后膜厚文件路径
-    output_base_dir (str): 输出基础目录
+    df (pd.DataFrame): 输入数据
+    coord_col (str): 坐标列名 (如'X')
+    value_col (str): 值列名 (如'Trimmed_Thickness')
+    method, degree, edge_width: 见 flatten_baselines
     
     返回:
-    tuple: (trimming_thk_path, x_section_path, y_section_path) 三个输出文件的路径
+    pd.DataFrame: 基线校正后的数据
     """
-    # 创建输出目录
-    output_dir = Path(output_base_dir) / "Data_processor"
-    output_dir.mkdir(parents=True, exist_ok=True)
+    coords = df[coord_col].to_numpy(dtype=float)
+    if method == BASELINE_ENDPOINT and len(coords) > 0 and coords[0] == coords[-1]:
+        raise ValueError(f"坐标列 {coord_col} 的首尾值相同，无法计算基线")
     
-    # 读取数据文件（保留原始列名和索引）
-    initial_df = pd.read_csv(initial_file)
-    after_df = pd.read_csv(after_file)
+    flattened, _ = flatten_baselines(
+        coords, df[value_col].to_numpy(dtype=float)[None, :],
+        method=method, degree=degree, edge_width=edge_width
+    )
+    return df.assign(**{value_col: flattened[0]})
+
+def compute_trimming(initial_file, after_file):
+    """
+    读取初始和扫描后膜厚文件并计算刻蚀量
+    
+    返回:
+    pd.DataFrame: 初始文件数据（保留原始列名）并追加 Trimmed_Thickness 列
+    """
+    # 读取数据文件（保留原始列名）
+    initial_map = load_thickness_map(initial_file)
+    after_map = load_thickness_map(after_file)
     
     # 数据验证 - 确保两个文件行数一致
-    if len(initial_df) != len(after_df):
+    if len(initial_map) != len(after_map):
         raise ValueError("初始文件和扫描后文件数据行数不一致")
     
-    # === 步骤1: 计算刻蚀量 ===
-    # 自动判断厚度列名称
-    thickness_col = None
-    possible_names = ['Thickness(nm)', 'Thickness', '厚度', '膜厚']
-    
-    for name in possible_names:
-        if name in initial_df.columns and name in after_df.columns:
-            thickness_col = name
-            break
-    
-    if not thickness_col:
-        # 如果找不到标准列名，使用第三列
-        if len(initial_df.columns) >= 3 and len(after_df.columns) >= 3:
-            thickness_col = initial_df.columns[2]
-        else:
-            raise ValueError("无法识别厚度数据列")
-    
     # 计算刻蚀量并保留原始坐标
-    initial_df['Trimmed_Thickness'] = initial_df[thickness_col] - after_df[thickness_col]
+    initial_df = initial_map.to_dataframe()
+    initial_df['Trimmed_Thickness'] = initial_map.thickness - after_map.thickness
+    return initial_df
+
+def _cut_to_frame(coords, values, coord_col, description):
+    """将一条截面转换为DataFrame，丢弃缺失点并检查点数"""
+    import pandas as pd
+    valid = ~np.isnan(values)
+    if np.count_nonzero(valid) < 3:
+        raise ValueError(f"{description}截面有效数据点不足 (找到{np.count_nonzero(valid)}个)，请检查截面位置和范围")
+    return pd.DataFrame({coord_col: coords[valid], 'Trimmed_Thickness': values[valid]})
+
+def extract_cross_sections(trimming_df, x_cut_y=40.0, y_cut_x=40.0, half_range=15.0,
+                           tolerance=DEFAULT_COORD_TOLERANCE, index=None):
+    """
+    从刻蚀量数据中提取X/Y截面并做基线拉平
     
-    # 保存刻蚀量文件
-    trimming_thk_path = output_dir / "trimming_thk.csv"
-    initial_df.to_csv(trimming_thk_path, index=False)
+    参数:
+    x_cut_y: X截面所在的Y坐标 (默认40)
+    y_cut_x: Y截面所在的X坐标 (默认40)
+    half_range: 截面坐标范围 [-half_range, half_range] (默认±15mm)
+    tolerance: 坐标匹配容差
+    index: 已建立的 TrimmingMapIndex，缺省时由 trimming_df 创建
     
-    # === 步骤2: 提取X截面数据 (y=40, x从-15到15) ===
-    # 直接根据坐标范围提取数据 (-15 ≤ x ≤ 15, y=40)
-    x_section_df = initial_df[
-        (initial_df['X'].between(-15.0, 15.0)) & 
-        (initial_df['Y'] == 40.0)
-    ].sort_values('X')
+    返回:
+    tuple: (x_section_df, y_section_df)，分别含 X/Y 与 Trimmed_Thickness 列
+    """
+    if index is None:
+        index = TrimmingMapIndex.from_dataframe(trimming_df, tolerance=tolerance)
     
-    # 验证数据完整性 (应有121个点)
-    if len(x_section_df) != 121:
-        raise ValueError(f"X截面数据点应为121个，实际找到{len(x_section_df)}个")
+    # === 提取X截面数据 (y=x_cut_y, x在±half_range内) ===
+    x_coords, x_values = index.horizontal_cuts([x_cut_y], -half_range, half_range)
+    x_section_df = _cut_to_frame(x_coords, x_values[0], 'X', f"X (Y={x_cut_y})")
     
     # 基线拉平处理
     x_section_df = flatten_baseline(
@@ -110,20 +271,9 @@ def process_and_save_outputs(initial_file, after_file, output_base_dir):
         value_col='Trimmed_Thickness'
     )
     
-    # 保存为要求的格式 (无表头)
-    x_section_path = output_dir / "x_crosssection_trimmed_amount_profile_of_Movement_on_Y-axis.csv"
-    x_section_df[['X', 'Trimmed_Thickness']].to_csv(x_section_path, index=False, header=False)
-    
-    # === 步骤3: 提取Y截面数据 (x=40, y从-15到15) ===
-    # 直接根据坐标范围提取数据 (-15 ≤ y ≤ 15, x=40)
-    y_section_df = initial_df[
-        (initial_df['Y'].between(-15.0, 15.0)) & 
-        (initial_df['X'] == 40.0)
-    ].sort_values('Y')
-    
-    # 验证数据完整性 (应有121个点)
-    if len(y_section_df) != 121:
-        raise ValueError(f"Y截面数据点应为121个，实际找到{len(y_section_df)}个")
+    # === 提取Y截面数据 (x=y_cut_x, y在±half_range内) ===
+    y_coords, y_values = index.vertical_cuts([y_cut_x], -half_range, half_range)
+    y_section_df = _cut_to_frame(y_coords, y_values[0], 'Y', f"Y (X={y_cut_x})")
     
     # 基线拉平处理
     y_section_df = flatten_baseline(
@@ -132,14 +282,50 @@ def process_and_save_outputs(initial_file, after_file, output_base_dir):
         value_col='Trimmed_Thickness'
     )
     
-    # 保存为要求的格式 (无表头)
+    return x_section_df, y_section_df
+
+def save_outputs(trimming_df, x_section_df, y_section_df, output_base_dir):
+    """
+    保存刻蚀量文件和两个截面文件（截面文件无表头）
+    
+    返回:
+    tuple: (trimming_thk_path, x_section_path, y_section_path)
+    """
+    # 创建输出目录
+    output_dir = Path(output_base_dir) / "Data_processor"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    trimming_thk_path = output_dir / "trimming_thk.csv"
+    trimming_df.to_csv(trimming_thk_path, index=False)
+    
+    x_section_path = output_dir / "x_crosssection_trimmed_amount_profile_of_Movement_on_Y-axis.csv"
+    x_section_df.to_csv(x_section_path, index=False, header=False)
+    
     y_section_path = output_dir / "y_crosssection_trimmed_amount_profile_of_Movement_on_X-axis.csv"
-    y_section_df[['Y', 'Trimmed_Thickness']].to_csv(y_section_path, index=False, header=False)
+    y_section_df.to_csv(y_section_path, index=False, header=False)
     
     return (str(trimming_thk_path), str(x_section_path), str(y_section_path))
 
+def process_and_save_outputs(initial_file, after_file, output_base_dir):
+    """
+    处理初始和扫描后文件，生成刻蚀量数据和截面文件
+    
+    参数:
+    initial_file (str): 初始膜厚文件路径
+    after_file (str): 扫描后膜厚文件路径
+    output_base_dir (str): 输出基础目录
+    
+    返回:
+    tuple: (trimming_thk_path, x_section_path, y_section_path) 三个输出文件的路径
+    """
+    trimming_df = compute_trimming(initial_file, after_file)
+    x_section_df, y_section_df = extract_cross_sections(trimming_df)
+    return save_outputs(trimming_df, x_section_df, y_section_df, output_base_dir)
+
 # 示例用法（本地测试）
 if __name__ == "__main__":
+    import pandas as pd
+    
     # 测试路径 - 在实际应用中会被替换
     test_base_dir = Path(r"Data/outputs")
     initial_file = r"Data/inputs/CrossTrim_initial/2602_30mm_crosstest_initial.csv"
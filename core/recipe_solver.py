@@ -0,0 +1,206 @@
+import numpy as np
+
+from core.center_adjuster import RecipeCenterAdjuster
+from core.map_registration import _as_lattice, rasterize_map
+from core.thickness_loader import load_thickness_map
+from core.trimming_simulator import TrimmingSimulator, recipe_to_tm
+
+# 求解方法
+SOLVER_WIENER = "wiener"        # 正则化FFT反卷积（一步完成，再截断到速度范围）
+SOLVER_PROJECTED = "projected"  # 带上下限的迭代非负最小二乘（以反卷积结果为初值）
+
+
+class _ConvolutionOperator:
+    """
+    Recipe网格上的卷积算子（'same'对齐）及其伴随算子
+
+    卷积核频谱按补零后的快速FFT尺寸预先计算一次，迭代中每次正向/伴随
+    只需一对 rfft2/irfft2。
+    """
+
+    def __init__(self, kernel, grid_shape, coefficient):
+        from scipy import fft
+        self._fft = fft
+        self.grid_shape = tuple(grid_shape)
+        self.center = tuple((np.array(kernel.shape) - 1) // 2)
+        self.fft_shape = tuple(
+            fft.next_fast_len(n + k - 1, real=True) for n, k in zip(grid_shape, kernel.shape)
+        )
+        self.kernel_freq = fft.rfft2(kernel, self.fft_shape) * coefficient
+        self.norm_squared = (coefficient * np.abs(kernel).sum()) ** 2
+
+    def _crop(self, data, offset):
+        ny, nx = self.grid_shape
+        return data[offset[0]:offset[0] + ny, offset[1]:offset[1] + nx]
+
+    def forward(self, dwell):
+        product = self._fft.rfft2(dwell, self.fft_shape, workers=-1) * self.kernel_freq
+        return self._crop(self._fft.irfft2(product, self.fft_shape, workers=-1), self.center)
+
+    def adjoint(self, residual):
+        product = self._fft.rfft2(residual, self.fft_shape, workers=-1) * np.conj(self.kernel_freq)
+        full = self._fft.irfft2(product, self.fft_shape, workers=-1)
+        return self._crop(np.roll(full, self.center, axis=(0, 1)), (0, 0))
+
+    def wiener(self, required, lam):
+        """正则化FFT反卷积"""
+        required_freq = self._fft.rfft2(required, self.fft_shape, workers=-1)
+        dwell = self._fft.irfft2(
+            np.conj(self.kernel_freq) * required_freq / (np.abs(self.kernel_freq) ** 2 + lam),
+            self.fft_shape, workers=-1
+        )
+        # 去掉核中心带来的相位偏移
+        return self._crop(np.roll(dwell, self.center, axis=(0, 1)), (0, 0))
+
+
+class RecipeSolver:
+    """
+    由目标刻蚀量反求Recipe速度（停留时间）
+
+    正向模型与 TrimmingSimulator 相同: 刻蚀量 = 系数 * (1/vy) ⊛ Beam Profile。
+    在Recipe网格上求停留时间 d，使 系数*(K ⊛ d) 逼近所需刻蚀量（初始厚度 - 目标厚度），
+    并满足 1/max_velocity <= d <= 1/min_velocity。
+    """
+
+    def __init__(self, simulator, min_velocity, max_velocity, regularization=1e-3,
+                 method=SOLVER_PROJECTED, max_iter=200, tol=1e-5):
+        """
+        参数:
+        simulator: TrimmingSimulator（提供Beam Profile与刻蚀系数）
+        min_velocity, max_velocity: 机台Y方向速度范围 (>0)
+        regularization: Tikhonov正则化强度（相对于算子范数）
+        method: SOLVER_WIENER 或 SOLVER_PROJECTED
+        max_iter, tol: 迭代次数上限与停留时间相对变化的收敛阈值
+        """
+        if not 0 < min_velocity < max_velocity:
+            raise ValueError(f"速度范围无效: [{min_velocity}, {max_velocity}]")
+        if method not in (SOLVER_WIENER, SOLVER_PROJECTED):
+            raise ValueError(f"未知的求解方法: {method}")
+        self.simulator = simulator
+        self.min_velocity = min_velocity
+        self.max_velocity = max_velocity
+        self.regularization = regularization
+        self.method = method
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def _projected_gradient(self, operator, dwell, required, weights, lam, bounds):
+        """FISTA加速的投影梯度法，求解带上下限的加权正则化最小二乘"""
+        step = 1.0 / (operator.norm_squared + lam)
+        momentum = dwell.copy()
+        t = 1.0
+        converged = False
+        for iteration in range(1, self.max_iter + 1):
+            gradient = operator.adjoint(weights * (operator.forward(momentum) - required)) + lam * momentum
+            updated = np.clip(momentum - step * gradient, *bounds)
+            t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+            momentum = updated + ((t - 1) / t_next) * (updated - dwell)
+            change = np.linalg.norm(updated - dwell) / max(np.linalg.norm(updated), 1e-30)
+            dwell, t = updated, t_next
+            if change < self.tol:
+                converged = True
+                break
+        return dwell, iteration, converged
+
+    def solve(self, x, y, metrology_x, metrology_y, required_removal):
+        """
+        在Recipe网格上求解速度
+
+        参数:
+        x, y: Recipe各点的TM坐标（完整规则网格）
+        metrology_x, metrology_y: 量测点坐标
+        required_removal: 各量测点所需刻蚀量
+
+        返回:
+        dict: velocity (按Recipe点顺序), dwell_grid, predicted (量测点上的预测刻蚀量),
+              residual_rms, iterations, converged, method
+        """
+        from scipy.ndimage import distance_transform_edt
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        lattice = _as_lattice(x, y, np.arange(len(x), dtype=float))
+        if lattice is None:
+            raise ValueError("Recipe坐标不构成完整的规则网格")
+        x_levels, y_levels, index_grid = lattice
+        index_grid = index_grid.astype(np.int64)
+        pitch = float(np.median(np.diff(x_levels)))
+        kernel, _, _ = self.simulator.kernel(pitch)
+        coefficient = self.simulator.removal_coefficient
+
+        # 所需刻蚀量插值到Recipe网格，量测范围外不参与拟合
+        required = rasterize_map(metrology_x, metrology_y, required_removal, x_levels, y_levels,
+                                 fill_value=np.nan)
+        missing = np.isnan(required)
+        if missing.all():
+            raise ValueError("量测点不在Recipe范围内")
+        weights = (~missing).astype(float)
+        # 反卷积初值: 量测范围外用最近的量测值外推，避免边缘被强行压到0
+        nearest = distance_transform_edt(missing, return_distances=False, return_indices=True)
+        extended = required[tuple(nearest)]
+        required = np.where(missing, 0.0, required)
+
+        operator = _ConvolutionOperator(kernel, required.shape, coefficient)
+        lam = self.regularization * operator.norm_squared
+        bounds = (1.0 / self.max_velocity, 1.0 / self.min_velocity)
+        dwell = np.clip(operator.wiener(extended, lam), *bounds)
+        iterations, converged = 0, True
+        if self.method == SOLVER_PROJECTED:
+            dwell, iterations, converged = self._projected_gradient(
+                operator, dwell, required, weights, lam, bounds
+            )
+
+        velocity = np.empty(len(x))
+        velocity[index_grid.ravel()] = 1.0 / dwell.ravel()
+        predicted = self.simulator.simulate(x, y, velocity, metrology_x, metrology_y)
+        residual = predicted - np.asarray(required_removal, dtype=float)
+        return {
+            "velocity": velocity,
+            "dwell_grid": dwell,
+            "predicted": predicted,
+            "residual_rms": float(np.sqrt(np.nanmean(residual ** 2))),
+            "iterations": iterations,
+            "converged": converged,
+            "method": self.method,
+        }
+
+    def solve_recipe(self, template, metrology_x, metrology_y, initial_thickness,
+                     target_thickness, output_path=None, center=None):
+        """
+        以现有Recipe (center_adjuster.RecipeArray) 为模板求解新的Y速度
+
+        首行、末行、坐标与X速度保持不变，只替换Y速度列；指定 output_path 时按原格式写出。
+
+        参数:
+        initial_thickness: 各量测点的初始厚度
+        target_thickness: 目标厚度（标量或各量测点的值）
+
+        返回:
+        dict: 见 solve()，另含 output_path
+        """
+        x, y, _ = recipe_to_tm(template, center)
+        required = np.asarray(initial_thickness, dtype=float) - np.asarray(target_thickness, dtype=float)
+        result = self.solve(x, y, metrology_x, metrology_y, required)
+        if output_path is not None:
+            template.write(output_path, {RecipeCenterAdjuster.COL_VY: result["velocity"]})
+        result["output_path"] = output_path
+        return result
+
+
+def solve_recipe_file(recipe_path, thickness_path, target_thickness, beam_profile,
+                      removal_coefficient, min_velocity, max_velocity, output_path,
+                      beam_pitch=None, **solver_options):
+    """
+    文件接口: 模板Recipe + 初始厚度文件 + Beam Profile -> 新Recipe文件
+
+    removal_coefficient 取 WedgeTestAnalyzer.calculate_slope() 的斜率；
+    beam_pitch 缺省时取Beam Profile文件坐标标签的间距。
+    """
+    template = RecipeCenterAdjuster.load_recipe(recipe_path)
+    thickness = load_thickness_map(thickness_path)
+    simulator = TrimmingSimulator(
+        beam_profile, beam_pitch=beam_pitch, removal_coefficient=removal_coefficient
+    )
+    solver = RecipeSolver(simulator, min_velocity, max_velocity, **solver_options)
+    return solver.solve_recipe(
+        template, thickness.x, thickness.y, thickness.thickness, target_thickness, output_path
+    )
@@ -0,0 +1,266 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 坐标匹配容差 (mm)，用于吸收量测坐标的微小抖动
+DEFAULT_COORD_TOLERANCE = 1e-3
+
+# 识别坐标列与厚度列的候选列名（按优先级）
+X_COLUMN_NAMES = ['X', 'x', 'X(mm)', 'x(mm)']
+Y_COLUMN_NAMES = ['Y', 'y', 'Y(mm)', 'y(mm)']
+THICKNESS_COLUMN_NAMES = ['Thickness(nm)', 'Thickness', '厚度', '膜厚']
+
+# 缓存的最大文件数
+CACHE_SIZE = 64
+
+_cache = OrderedDict()        # 内容哈希 -> ThicknessMap
+_stat_digests = {}            # (路径, 大小, 修改时间) -> 内容哈希
+_cache_lock = threading.Lock()
+
+
+def _cluster_levels(coords, tolerance):
+    """
+    将一维坐标按容差聚类为离散的坐标层级
+
+    排序后相邻间距大于容差处断开，每簇取均值作为层级坐标。
+
+    返回:
+    tuple: (升序的层级坐标, 每个输入点所属层级的索引)
+    """
+    order = np.argsort(coords, kind='stable')
+    sorted_coords = coords[order]
+    new_level = np.empty(len(coords), dtype=bool)
+    new_level[:1] = True
+    new_level[1:] = np.diff(sorted_coords) > tolerance
+    sorted_labels = np.cumsum(new_level) - 1
+
+    labels = np.empty(len(coords), dtype=np.int64)
+    labels[order] = sorted_labels
+    levels = np.bincount(sorted_labels, weights=sorted_coords) / np.bincount(sorted_labels)
+    return levels, labels
+
+
+def match_points(ref_x, ref_y, x, y, tolerance=DEFAULT_COORD_TOLERANCE):
+    """
+    按 (X, Y) 坐标在容差内把查询点匹配到参考点
+
+    两组坐标合并后按容差聚类为行列层级，以 (行, 列) 组合键排序后用 searchsorted
+    一次完成全部查找，与文件中点的先后顺序无关。参考点中同一坐标重复出现时取第一个。
+
+    返回:
+    np.ndarray: 每个查询点对应的参考点索引，无匹配时为-1
+    """
+    ref_x = np.asarray(ref_x, dtype=float)
+    ref_y = np.asarray(ref_y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_ref = len(ref_x)
+    result = np.full(len(x), -1, dtype=np.int64)
+    if n_ref == 0 or len(x) == 0:
+        return result
+
+    all_x = np.concatenate([ref_x, x])
+    all_y = np.concatenate([ref_y, y])
+    valid = ~(np.isnan(all_x) | np.isnan(all_y))
+    x_labels = np.full(len(all_x), -1, dtype=np.int64)
+    y_labels = np.full(len(all_y), -1, dtype=np.int64)
+    x_levels, x_labels[valid] = _cluster_levels(all_x[valid], tolerance)
+    _, y_labels[valid] = _cluster_levels(all_y[valid], tolerance)
+    keys = np.where(valid, y_labels * len(x_levels) + x_labels, -1)
+
+    ref_keys, query_keys = keys[:n_ref], keys[n_ref:]
+    ref_valid = np.flatnonzero(ref_keys >= 0)
+    # 稳定排序保证重复坐标时取文件中靠前的点
+    order = ref_valid[np.argsort(ref_keys[ref_valid], kind='stable')]
+    sorted_keys = ref_keys[order]
+    if len(sorted_keys) == 0:
+        return result
+    pos = np.clip(np.searchsorted(sorted_keys, query_keys), 0, len(sorted_keys) - 1)
+    found = (sorted_keys[pos] == query_keys) & (query_keys >= 0)
+    result[found] = order[pos[found]]
+    return result
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _detect_schema(raw):
+    """
+    由文件首个非空行判断分隔符和是否有表头
+
+    返回:
+    tuple: (分隔符, 是否有表头)
+    """
+    text = raw[:4096].decode('utf-8-sig', errors='replace')
+    first_line = next((line for line in text.splitlines() if line.strip()), '')
+    if ',' in first_line:
+        sep = ','
+    elif '\t' in first_line:
+        sep = '\t'
+    else:
+        sep = r'\s+'
+
+    fields = first_line.split(',') if sep == ',' else first_line.split()
+    has_header = not all(_is_number(field.strip()) for field in fields if field.strip())
+    return sep, has_header
+
+
+def _pick_column(columns, candidates, fallback_index):
+    """按候选列名选择列，找不到时使用固定位置"""
+    for name in candidates:
+        if name in columns:
+            return name
+    if len(columns) <= fallback_index:
+        raise ValueError(f"文件应包含至少{fallback_index + 1}列数据，实际有{len(columns)}列")
+    return columns[fallback_index]
+
+
+class ThicknessMap:
+    """
+    一次解析后的 X/Y/厚度 量测文件
+
+    x、y、thickness 为连续存储的只读 float64 数组（可能被多个分析器共享，
+    不要原地修改）；若各点构成完整的规则网格，lattice_shape 为 (ny, nx)，
+    否则为 None。
+    """
+
+    def __init__(self, df, path=None, digest=None, tolerance=DEFAULT_COORD_TOLERANCE):
+        columns = df.columns.tolist()
+        self.path = path
+        self.digest = digest
+        self.columns = columns
+        self.x_col = _pick_column(columns, X_COLUMN_NAMES, 0)
+        self.y_col = _pick_column(columns, Y_COLUMN_NAMES, 1)
+        self.thickness_col = _pick_column(columns, THICKNESS_COLUMN_NAMES, 2)
+
+        self.x = self._column_array(df, self.x_col)
+        self.y = self._column_array(df, self.y_col)
+        self.thickness = self._column_array(df, self.thickness_col)
+        self._df = df
+
+        self.tolerance = tolerance
+        self.x_levels, self.y_levels, self.lattice_shape = self._detect_lattice()
+
+    @staticmethod
+    def _column_array(df, column):
+        import pandas as pd
+        array = np.ascontiguousarray(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float))
+        array.setflags(write=False)
+        return array
+
+    def _detect_lattice(self):
+        """检测各点是否构成每个网格点恰好一个测量值的规则网格"""
+        if len(self.x) == 0 or np.isnan(self.x).any() or np.isnan(self.y).any():
+            return None, None, None
+        x_levels, x_labels = _cluster_levels(self.x, self.tolerance)
+        y_levels, y_labels = _cluster_levels(self.y, self.tolerance)
+        nx, ny = len(x_levels), len(y_levels)
+        if nx * ny != len(self.x):
+            return x_levels, y_levels, None
+        if len(np.unique(y_labels * nx + x_labels)) != len(self.x):
+            return x_levels, y_levels, None
+        for levels in (x_levels, y_levels):
+            if len(levels) > 2:
+                steps = np.diff(levels)
+                if np.abs(steps - steps.mean()).max() > self.tolerance:
+                    return x_levels, y_levels, None
+        return x_levels, y_levels, (ny, nx)
+
+    @property
+    def is_regular(self):
+        return self.lattice_shape is not None
+
+    def __len__(self):
+        return len(self.x)
+
+    def to_dataframe(self):
+        """返回保留原始列名的DataFrame副本"""
+        return self._df.copy()
+
+    def to_grid(self):
+        """
+        规则网格时返回 (x_levels, y_levels, grid)，grid[i, j] 对应 (x_levels[j], y_levels[i])
+        """
+        if not self.is_regular:
+            raise ValueError("数据点不构成规则网格")
+        ny, nx = self.lattice_shape
+        cols = np.searchsorted(self.x_levels, self.x - self.tolerance)
+        rows = np.searchsorted(self.y_levels, self.y - self.tolerance)
+        grid = np.empty((ny, nx))
+        grid[rows, cols] = self.thickness
+        return self.x_levels, self.y_levels, grid
+
+
+def _parse(raw, path, digest):
+    import pandas as pd
+    sep, has_header = _detect_schema(raw)
+    df = pd.read_csv(
+        io.BytesIO(raw), sep=sep, header=0 if has_header else None,
+        encoding='utf-8-sig', engine='c' if sep != r'\s+' else 'python'
+    )
+    df = df.dropna(how='all').reset_index(drop=True)
+    if df.empty:
+        raise ValueError(f"文件没有数据: {path}")
+    return ThicknessMap(df, path=path, digest=digest)
+
+
+def load_thickness_map(path, use_cache=True):
+    """
+    读取 X/Y/厚度 量测文件
+
+    文件内容按哈希缓存：同一文件（或内容相同的副本）在一个会话中只解析一次；
+    文件大小和修改时间未变时连哈希也不重新计算。
+
+    参数:
+    path: 文件路径
+    use_cache: 是否使用缓存
+
+    返回:
+    ThicknessMap
+    """
+    path = os.fspath(path)
+    stat = os.stat(path)
+    stat_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    if use_cache:
+        with _cache_lock:
+            digest = _stat_digests.get(stat_key)
+            if digest in _cache:
+                _cache.move_to_end(digest)
+                return _cache[digest]
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+
+    if use_cache:
+        with _cache_lock:
+            _stat_digests[stat_key] = digest
+            if digest in _cache:
+                _cache.move_to_end(digest)
+                return _cache[digest]
+
+    thickness_map = _parse(raw, path, digest)
+
+    if use_cache:
+        with _cache_lock:
+            _cache[digest] = thickness_map
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return thickness_map
+
+
+def clear_cache():
+    """清空读取缓存"""
+    with _cache_lock:
+        _cache.clear()
+        _stat_digests.clear()
@@ -0,0 +1,274 @@
+import re
+
+import numpy as np
+
+from core.map_registration import _as_lattice
+
+# 卷积分块的默认行数，限制大晶圆/细网格时的峰值内存
+DEFAULT_CHUNK_ROWS = 256
+
+
+# 导出文件中的坐标标签，如 "15.0000"、"x=-15mm"、"y=3mm"
+_COORD_LABEL = re.compile(r"^\s*(?:[xXyY]\s*=\s*)?([-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)\s*(?:mm)?\s*$")
+
+
+def _parse_coord_labels(labels):
+    """把一组标签解析为坐标，不是坐标的标签为 NaN"""
+    values = []
+    for label in labels:
+        match = _COORD_LABEL.match("" if label is None else str(label))
+        values.append(float(match.group(1)) if match else np.nan)
+    return np.array(values, dtype=float)
+
+
+def _monotonic_coords(coords):
+    """坐标标签（去掉非坐标项后）至少3个且严格单调时返回 True"""
+    coords = coords[~np.isnan(coords)]
+    if len(coords) < 3:
+        return False
+    steps = np.diff(coords)
+    return bool(np.all(steps > 0) or np.all(steps < 0))
+
+
+def load_beam_profile(path):
+    """
+    读取Beam Profile矩阵（如31x31）及其点距
+
+    分隔符自动识别（逗号、制表符等）。兼容三种文件:
+    - 无标签的数值矩阵（如 0816BeamProfile.csv）；
+    - BeamShapeCreator.save_as_csv 的导出（首行为X坐标、首列为Y坐标，如 "y\\x,-15.0000,..."）；
+    - 形状重构迭代文件（"x=-15mm"/"y=15mm" 标签，另有 X-Conv Diff 列和 Y-Conv Diff 行）。
+    首行和首列都是严格单调的坐标标签时视为标签行列：只保留标签为坐标的行和列
+    （去掉标签本身和差值行列），点距取标签间距。其余非数值单元格按0处理。
+
+    返回:
+    tuple: (profile, pitch)，profile 第0行对应 +Y 侧（与导出文件的行顺序一致），
+           pitch 为由坐标标签得到的点距 (mm)，文件没有坐标标签时为 None
+    """
+    import pandas as pd
+    cells = pd.read_csv(
+        path, header=None, sep=None, engine="python", dtype=str, skip_blank_lines=True
+    ).to_numpy(dtype=object)
+    if cells.size == 0:
+        raise ValueError(f"Beam Profile文件没有数值数据: {path}")
+
+    pitch = None
+    x_coords = _parse_coord_labels(cells[0, 1:])
+    y_coords = _parse_coord_labels(cells[1:, 0])
+    if (cells.shape[0] > 1 and cells.shape[1] > 1
+            and _monotonic_coords(x_coords) and _monotonic_coords(y_coords)):
+        keep_cols = np.flatnonzero(~np.isnan(x_coords)) + 1
+        keep_rows = np.flatnonzero(~np.isnan(y_coords)) + 1
+        cells = cells[np.ix_(keep_rows, keep_cols)]
+        steps = np.concatenate([
+            np.diff(x_coords[~np.isnan(x_coords)]), np.diff(y_coords[~np.isnan(y_coords)])
+        ])
+        pitch = float(np.median(np.abs(steps)))
+
+    df = pd.DataFrame(cells).apply(pd.to_numeric, errors='coerce')
+    df = df.dropna(how='all').dropna(axis=1, how='all')
+    profile = df.to_numpy(dtype=float)
+    if profile.size == 0:
+        raise ValueError(f"Beam Profile文件没有数值数据: {path}")
+    return np.nan_to_num(profile, nan=0.0), pitch
+
+
+def recipe_to_tm(recipe, center=None):
+    """
+    将Recipe (center_adjuster.RecipeArray) 的坐标转换到TM（量测）坐标
+
+    与 WedgeTestAnalyzer 相同: x_tm = x - cx, y_tm = cy - y
+
+    返回:
+    tuple: (x_tm, y_tm, vy)
+    """
+    cx, cy = recipe.center if center is None else center
+    if recipe.vy is None:
+        raise ValueError("Recipe的Y速度列不是数值")
+    return recipe.x - cx, cy - recipe.y, recipe.vy
+
+
+def dwell_map(x, y, velocity_sets):
+    """
+    把Recipe各点的速度转换为规则网格上的停留时间图
+
+    停留时间取 1/vy（单位长度停留时间，与 WedgeTestAnalyzer 回归所用的 x=1/vy 一致），
+    速度为0或缺失的点停留时间为0。
+
+    参数:
+    x, y: Recipe各点的TM坐标（需构成完整规则网格）
+    velocity_sets: 速度 (点数,) 或多组速度 (组数, 点数)
+
+    返回:
+    tuple: (x_levels, y_levels, dwell)，dwell 形状 (组数, ny, nx)，y 升序
+    """
+    velocity_sets = np.atleast_2d(np.asarray(velocity_sets, dtype=float))
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.arange(len(x), dtype=float)
+    lattice = _as_lattice(x, y, order)
+    if lattice is None:
+        raise ValueError("Recipe坐标不构成完整的规则网格")
+    x_levels, y_levels, index_grid = lattice
+    index_grid = index_grid.astype(np.int64)
+
+    velocity = velocity_sets[:, index_grid]
+    with np.errstate(divide='ignore'):
+        dwell = np.where(np.isfinite(velocity) & (velocity != 0), 1.0 / velocity, 0.0)
+    return x_levels, y_levels, dwell
+
+
+class TrimmingSimulator:
+    """
+    由Recipe停留时间图与Beam Profile的FFT卷积预测刻蚀量分布
+
+    预测刻蚀量 = removal_coefficient * (停留时间图 ⊛ 归一化Beam Profile)。
+    Beam Profile归一化为总和1时，均匀速度 v 下的刻蚀量为 removal_coefficient / v，
+    即 removal_coefficient 与 WedgeTestAnalyzer.calculate_slope() 的斜率同义。
+    """
+
+    def __init__(self, beam_profile, beam_pitch=None, removal_coefficient=1.0,
+                 normalize=True, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        参数:
+        beam_profile: Beam Profile矩阵（第0行为 +Y 侧）或其文件路径
+        beam_pitch: Beam Profile的点距 (mm)；缺省时取文件坐标标签的间距，没有标签时为1
+        removal_coefficient: 刻蚀系数
+        normalize: 是否把Beam Profile归一化为总和1
+        chunk_rows: 卷积分块行数
+        """
+        if not isinstance(beam_profile, np.ndarray):
+            beam_profile, file_pitch = load_beam_profile(beam_profile)
+            if beam_pitch is None:
+                beam_pitch = file_pitch
+        profile = np.flipud(np.asarray(beam_profile, dtype=float))  # 转为 y 升序
+        if profile.ndim != 2 or min(profile.shape) < 1:
+            raise ValueError(f"Beam Profile必须是二维矩阵: {profile.shape}")
+        self.profile = profile
+        self.beam_pitch = 1.0 if beam_pitch is None else beam_pitch
+        self.removal_coefficient = removal_coefficient
+        self.normalize = normalize
+        self.chunk_rows = chunk_rows
+        self._kernels = {}
+
+    def kernel(self, pitch):
+        """
+        重采样到给定网格点距的卷积核（按点距缓存）
+
+        返回:
+        tuple: (kernel, 中心行索引, 中心列索引)
+        """
+        from scipy.ndimage import map_coordinates
+        pitch = float(pitch)
+        if pitch not in self._kernels:
+            ny, nx = self.profile.shape
+            half_y = (ny - 1) / 2 * self.beam_pitch
+            half_x = (nx - 1) / 2 * self.beam_pitch
+            ky = int(np.floor(half_y / pitch + 1e-9))
+            kx = int(np.floor(half_x / pitch + 1e-9))
+            rows = (np.arange(-ky, ky + 1) * pitch + half_y) / self.beam_pitch
+            cols = (np.arange(-kx, kx + 1) * pitch + half_x) / self.beam_pitch
+            rr, cc = np.meshgrid(rows, cols, indexing='ij')
+            kernel = map_coordinates(self.profile, [rr, cc], order=1, mode='constant', cval=0.0)
+            if self.normalize:
+                total = kernel.sum()
+                if total <= 0:
+                    raise ValueError("Beam Profile总和必须为正")
+                kernel = kernel / total
+            self._kernels[pitch] = (kernel, ky, kx)
+        return self._kernels[pitch]
+
+    def _convolve(self, dwell, kernel):
+        """沿行方向分块的重叠相加FFT卷积，dwell 形状 (组数, ny, nx)"""
+        from scipy.signal import fftconvolve
+        n_sets, ny, nx = dwell.shape
+        ky, kx = kernel.shape
+        out = np.zeros((n_sets, ny + ky - 1, nx + kx - 1))
+        kernel = kernel[None, :, :]
+        for start in range(0, ny, self.chunk_rows):
+            block = dwell[:, start:start + self.chunk_rows, :]
+            out[:, start:start + block.shape[1] + ky - 1, :] += fftconvolve(
+                block, kernel, mode='full', axes=(1, 2)
+            )
+        return out
+
+    def removal_grid(self, x, y, velocity_sets):
+        """
+        规则网格上的预测刻蚀量（覆盖Recipe范围外扩Beam半径）
+
+        返回:
+        tuple: (x_coords, y_coords, removal)，removal 形状 (组数, ny, nx)，y 升序
+        """
+        x_levels, y_levels, dwell = dwell_map(x, y, velocity_sets)
+        pitch_x = np.median(np.diff(x_levels))
+        pitch_y = np.median(np.diff(y_levels))
+        if abs(pitch_x - pitch_y) > 1e-6 * max(pitch_x, pitch_y):
+            raise ValueError(f"Recipe网格X/Y点距不一致: {pitch_x} vs {pitch_y}")
+        kernel, ky, kx = self.kernel(pitch_x)
+
+        removal = self.removal_coefficient * self._convolve(dwell, kernel)
+        x_coords = x_levels[0] + (np.arange(removal.shape[2]) - kx) * pitch_x
+        y_coords = y_levels[0] + (np.arange(removal.shape[1]) - ky) * pitch_y
+        return x_coords, y_coords, removal
+
+    def simulate(self, x, y, velocity_sets, metrology_x, metrology_y):
+        """
+        预测量测点上的刻蚀量
+
+        参数:
+        x, y: Recipe各点的TM坐标
+        velocity_sets: 速度 (点数,) 或多组速度 (组数, 点数)，多组时一次批量卷积
+        metrology_x, metrology_y: 量测点坐标
+
+        返回:
+        np.ndarray: (组数, 量测点数)；单组速度时为 (量测点数,)
+        """
+        from scipy.ndimage import map_coordinates
+        single = np.ndim(velocity_sets) == 1
+        x_coords, y_coords, removal = self.removal_grid(x, y, velocity_sets)
+        cols = (np.asarray(metrology_x, dtype=float) - x_coords[0]) / (x_coords[1] - x_coords[0])
+        rows = (np.asarray(metrology_y, dtype=float) - y_coords[0]) / (y_coords[1] - y_coords[0])
+        predicted = np.stack([
+            map_coordinates(grid, [rows, cols], order=1, mode='constant', cval=0.0)
+            for grid in removal
+        ])
+        return predicted[0] if single else predicted
+
+    def simulate_recipes(self, recipes, metrology_x, metrology_y, center=None):
+        """
+        批量预测多个Recipe (RecipeArray) 的刻蚀量
+
+        网格相同的Recipe合并为一次批量卷积。
+
+        返回:
+        np.ndarray: (Recipe数, 量测点数)
+        """
+        converted = [recipe_to_tm(recipe, center) for recipe in recipes]
+        results = np.empty((len(converted), len(np.atleast_1d(metrology_x))))
+        groups = {}
+        for i, (x, y, _) in enumerate(converted):
+            key = (len(x), x.tobytes(), y.tobytes())
+            groups.setdefault(key, []).append(i)
+        for indices in groups.values():
+            x, y, _ = converted[indices[0]]
+            velocity_sets = np.stack([converted[i][2] for i in indices])
+            results[indices] = self.simulate(x, y, velocity_sets, metrology_x, metrology_y)
+        return results
+
+
+def simulate_profiles(profiles, x, y, velocity_sets, metrology_x, metrology_y,
+                      beam_pitch=None, removal_coefficient=1.0, normalize=True):
+    """
+    多个Beam Profile × 多组速度的批量预测
+
+    返回:
+    np.ndarray: (Profile数, 速度组数, 量测点数)
+    """
+    velocity_sets = np.atleast_2d(velocity_sets)
+    return np.stack([
+        TrimmingSimulator(
+            profile, beam_pitch=beam_pitch,
+            removal_coefficient=removal_coefficient, normalize=normalize
+        ).simulate(x, y, velocity_sets, metrology_x, metrology_y)
+        for profile in profiles
+    ])
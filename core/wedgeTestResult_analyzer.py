@@ -3,24 +3,28 @@ import numpy as np
 from collections import defaultdict
 from pathlib import Path
 
-import os
 import numpy as np
-from utils.file_io import get_resource_path
+from utils.file_io import ensure_dir
+from core.thickness_loader import load_thickness_map
+from core.map_registration import register_maps
+from core.center_adjuster import RecipeCenterAdjuster
+
+# 整图配准结果可作为中心偏移建议的条件：相关系数下限、相关峰对比度下限
+# （平移±1个点距后相关系数的最小下降量）、位移上限（配准网格点距的倍数）
+CENTER_OFFSET_MIN_STRENGTH = 0.9
+CENTER_OFFSET_MIN_CONTRAST = 1e-3
+CENTER_OFFSET_MAX_PITCHES = 3
 
 class WedgeTestAnalyzer:
 
     # 改为动态方法获取路径
     @property
     def REGRESSION_DIR(self):
-        regression_dir = get_resource_path("Data/outputs/Regression_Data")
-        os.makedirs(regression_dir, exist_ok=True)
-        return regression_dir
+        return ensure_dir("Data/outputs/Regression_Data")
     
     @property
     def NEW_BEAM_PROFILE_DIR(self):
-        new_beam_dir = get_resource_path("Data/outputs/new_BeamShapeProfile")
-        os.makedirs(new_beam_dir, exist_ok=True)
-        return new_beam_dir
+        return ensure_dir("Data/outputs/new_BeamShapeProfile")
 
     def __init__(self):
         self.map_wtr = None       # WTR坐标系的95x95阵列
@@ -145,16 +149,13 @@ class WedgeTestAnalyzer:
 
     def _read_thickness_file(self, filepath):
         """读取薄膜厚度文件"""
-        data = {}
-        with open(filepath, 'r') as f:
-            reader = csv.reader(f)
-            next(reader)  # 跳过首行
-            for row in reader:
-                x = round(float(row[0]), 3)
-                y = round(float(row[1]), 3)
-                thickness = float(row[2])
-                data[(x, y)] = thickness
-        return data
+        thickness_map = load_thickness_map(filepath)
+        return {
+            (round(x, 3), round(y, 3)): thickness
+            for x, y, thickness in zip(
+                thickness_map.x.tolist(), thickness_map.y.tolist(), thickness_map.thickness.tolist()
+            )
+        }
 
     def transfer_trimming_amount(self):
         """将WF的刻蚀量传递到TM阵列"""
@@ -200,6 +201,49 @@ class WedgeTestAnalyzer:
         slope = sum_xy / sum_xx
         return slope
 
+    def estimate_center_offset(self, slope=None):
+        """
+        用整幅刻蚀量图估计Recipe中心偏移
+        
+        以回归模型 slope/vy 在TM坐标上生成预测刻蚀量图，与量测刻蚀量图做带掩码的
+        归一化互相关配准（只比较两者都有数据的区域），得到量测图相对预测图的位移，
+        并换算为 RecipeCenterAdjuster 使用的中心偏移量。
+        vy 为0的Recipe点和刻蚀量为0（未量测）的点与回归分析一样不参与配准。
+        
+        返回:
+        dict: shift_x, shift_y (TM坐标中的图形位移), delta_x, delta_y (Recipe中心偏移量),
+              strength (重叠区域相关系数), contrast (相关峰对比度), pitch,
+              plausible (相关系数、峰对比度不低于 CENTER_OFFSET_MIN_STRENGTH /
+              CENTER_OFFSET_MIN_CONTRAST 且位移不超过 CENTER_OFFSET_MAX_PITCHES 个点距时
+              为 True，只有此时才应作为调整建议；量测范围内预测图近似平面时
+              相关系数与平移无关，峰对比度接近0，结果不可信)
+        """
+        if slope is None:
+            slope = self.calculate_slope()
+        
+        points = [point for row in self.map_tm for point in row if point['vy'] != 0]
+        pred_x = np.array([point['x_tm'] for point in points], dtype=float)
+        pred_y = np.array([point['y_tm'] for point in points], dtype=float)
+        predicted = slope / np.array([point['vy'] for point in points], dtype=float)
+        
+        measured = [(x, y, tm) for x, column in self.map_wf.items() for y, tm in column.items()
+                    if tm is not None and tm != 0]
+        if len(measured) < 4:
+            raise ValueError("有效的量测刻蚀量点不足，无法配准")
+        meas_x, meas_y, meas_tm = np.array(measured, dtype=float).T
+        
+        result = register_maps(pred_x, pred_y, predicted, meas_x, meas_y, meas_tm)
+        result["delta_x"], result["delta_y"] = RecipeCenterAdjuster.deltas_from_pattern_shift(
+            result["shift_x"], result["shift_y"]
+        )
+        max_shift = CENTER_OFFSET_MAX_PITCHES * result["pitch"]
+        result["plausible"] = bool(
+            result["strength"] >= CENTER_OFFSET_MIN_STRENGTH
+            and result["contrast"] >= CENTER_OFFSET_MIN_CONTRAST
+            and abs(result["shift_x"]) <= max_shift and abs(result["shift_y"]) <= max_shift
+        )
+        return result
+
     def get_regression_data(self):
         """获取回归分析的数据点"""
         x_data = []
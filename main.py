@@ -1,12 +1,15 @@
 # main.py
+import time
+
+# 启动计时起点（在导入 PyQt5 之前；matplotlib 在首次创建绘图选项卡时才导入）
+_START_TIME = time.perf_counter()
+
 import sys
 import os
 import logging
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon  # 添加此导入
-import matplotlib as mpl
-import matplotlib.font_manager as fm
-from PyQt5.QtCore import QT_VERSION_STR
+from PyQt5.QtCore import QT_VERSION_STR, QTimer
 from PyQt5.Qt import PYQT_VERSION_STR
 
 # 添加此函数获取图标路径
@@ -20,21 +23,11 @@ def get_icon_path():
     exe_dir = os.path.dirname(sys.executable)
     return os.path.join(exe_dir, "Data", "WM.ico")
 
-# 配置日志
-def setup_logging():
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('wedge_master.log'),
-            logging.StreamHandler()
-        ]
-    )
-    logger = logging.getLogger('Main')
-    logger.info("====== 启动 WedgeMaster ======")
-    return logger
+# 配置日志（队列异步写入、按大小轮转、各子系统独立级别）
+from utils.logging_config import setup_logging
 
 logger = setup_logging()
+logger.info("====== 启动 WedgeMaster ======")
 
 # 检查并记录 PyQt5 信息
 try:
@@ -47,21 +40,13 @@ except Exception as e:
     logger.error(f"无法获取 PyQt5 版本信息: {str(e)}")
     sys.exit("无法导入 PyQt5")
 
-try:
-    # 其他初始化代码...
-    logger.info("设置 Matplotlib 配置")
-    
-    if sys.platform == 'win32':
-        mpl.rcParams['font.family'] = 'Microsoft YaHei'
-    mpl.rcParams['axes.unicode_minus'] = False
-    mpl.rcParams['font.size'] = 10
-except Exception as e:
-    logger.exception("初始化 Matplotlib 失败")
-    sys.exit(f"初始化失败: {str(e)}")
-
 # 运行主应用
 def main():
     try:
+        # 启动时一次性创建所需目录，之后解析资源路径不再访问文件系统
+        from utils.file_io import ensure_dirs
+        ensure_dirs()
+        
         logger.info("导入应用模块...")
         from ui.main_window import MainWindow
         
@@ -82,6 +67,10 @@ def main():
         
         logger.info("显示主窗口...")
         window.show()
+        # 事件循环第一次空闲时窗口已绘制完成，记录启动耗时
+        QTimer.singleShot(0, lambda: logger.info(
+            "主窗口显示耗时 %.0f ms", (time.perf_counter() - _START_TIME) * 1000
+        ))
         
         logger.info("进入应用事件循环")
         sys.exit(app.exec_())
@@ -90,4 +79,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包后的EXE中使用进程池（如批量重构）需要此调用
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -2,7 +2,7 @@ from PyQt5.QtWidgets import (
     QWidget, QFormLayout, QGroupBox, QLabel, QLineEdit,
     QPushButton, QGridLayout, QFileDialog, QCheckBox, QMessageBox, QSplitter, QTableWidget, QTableWidgetItem, QHeaderView, QApplication, QDialog, QVBoxLayout, QHBoxLayout, QDateTimeEdit, QDialogButtonBox, QSpinBox, QMenu
 )
-from PyQt5.QtCore import Qt, QTimer, QDateTime, QSettings
+from PyQt5.QtCore import Qt, QTimer, QDateTime, QSettings, QThread, pyqtSignal
 from PyQt5.QtGui import QKeySequence
 from pathlib import Path
 import matplotlib.pyplot as plt
@@ -10,11 +10,35 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
 import shutil
-import csv
 import os
+import copy
+import logging
 from datetime import datetime
 from core.wedgeTestResult_analyzer import WedgeTestAnalyzer
-from utils.file_io import get_latest_files, get_resource_path
+from utils.file_io import ensure_dir, get_latest_files, get_resource_path
+from utils.file_catalog import (
+    get_catalog, KIND_PM_LOG, KIND_SCAN_LOG, MACHINE_PM_LOG_DIR, MACHINE_SCAN_LOG_DIR
+)
+from utils.sampling_log import read_last_record, read_last_row
+
+logger = logging.getLogger('UI')
+
+class CenterOffsetThread(QThread):
+    """整图配准估计Recipe中心偏移的后台线程（配准耗时约0.5~1秒，不阻塞界面）"""
+    estimated = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, analyzer, slope):
+        super().__init__()
+        # 浅拷贝: 重新分析时 load_recipe/load_thickness 会替换为新的数据对象，不影响本线程读取
+        self.analyzer = copy.copy(analyzer)
+        self.slope = slope
+
+    def run(self):
+        try:
+            self.estimated.emit(self.analyzer.estimate_center_offset(self.slope))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class MaintenanceTimeDialog(QDialog):
     """离子化室保养时间设定对话框"""
@@ -180,6 +204,9 @@ class BeamProfilePlotCanvas(FigureCanvas):
         self.draw()
 
 class AnalyzerUI(QWidget):
+    # 整图配准得到的Recipe中心偏移量 (delta_x, delta_y)
+    center_offset_estimated = pyqtSignal(float, float)
+
     def __init__(self):
         super().__init__()
         self.analyzer = WedgeTestAnalyzer()
@@ -191,6 +218,8 @@ class AnalyzerUI(QWidget):
         self.initial_file = None
         self.after_file = None
         self.beam_profile_file = None  # 新增：存储Beam Profile文件路径
+        self.center_offset_thread = None    # 最近一次分析的中心偏移估计线程
+        self._center_offset_threads = set()   # 运行中的线程（结束前保持引用）
 
         # 添加图表组件
         self.regression_plot = RegressionPlotCanvas(self, width=6, height=4, dpi=100)
@@ -258,88 +287,72 @@ class AnalyzerUI(QWidget):
         try:
             log_file = Path("2025110920.csv")
             if log_file.exists():
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-
-                    # 读取表头（第一行）
-                    headers = next(reader)
-                    # 读取单位（第二行）
-                    units = next(reader)
-
-                    # 读取所有数据行以获取最后一行数据
-                    data_rows = []
-                    for row in reader:
-                        if row:  # 跳过空行
-                            data_rows.append(row)
-
-                    if data_rows:
-                        # 获取最后一行数据（包括时间列）
-                        last_row = data_rows[-1]  # 包含时间列
-
-                        # 创建参数名称到数值的映射
-                        param_value_map = {}
-                        for header, unit, value in zip(headers, units, last_row):
-                            param_key = header.strip()
-
-                            # 处理时间显示格式 - 去掉毫秒部分
-                            if header == "Time" and ":" in value:
-                                # 格式如 "20:36:16:756" -> "20:36:16"
-                                time_parts = value.split(":")
-                                if len(time_parts) >= 3:
-                                    value = ":".join(time_parts[:3])  # 只取前3部分：时:分:秒
-
-                            param_value_map[param_key] = value
-
-                        # 按照1114.csv的固定顺序创建参数名称列表
-                        fixed_param_names = [
-                            "Time",
-                            "PEG21", "PEG11",
-                            "CCG01(GCIB)", "PIG01(GCIB)",
-                            "Beam Current(Fixing)", "Beam Current(Moving)",
-                            "Accelerator Current", "Accelerator Voltage",
-                            "Lens1 Current", "Lens1 Voltage",
-                            "Lens2 Current", "Lens2 Voltage",
-                            "Suppressor Current", "Suppressor Voltage",  # 新顺序
-                            "Bias Current", "Bias Voltage",  # 新顺序
-                            "Arc Current", "Arc Voltage",
-                            "Filament Current", "Filament Voltage",
-                            "Neutralizer extracation Current", "Neutralizer extracation Voltage",
-                            "Neutralizer filament Current", "Neutralizer filament Voltage",
-                            "APC Pressure", "MFC111 Flow", "MFC112 Flow", "MFC113 Flow"
-                        ]
-
-                        # 创建表格数据（使用固定顺序）
-                        table_data = []
-                        for param in fixed_param_names:
-                            if param in param_value_map:
-                                table_data.append((param, param_value_map[param]))
-                            else:
-                                table_data.append((param, "等待读取..."))
-
-                        # 添加Lifetime行
-                        table_data.append(("Lifetime", "未设定"))
-
-                        # 设置表格行数
-                        self.machine_params_table.setRowCount(len(table_data))
-
-                        # 填充表格数据
-                        for row, (param_name, value) in enumerate(table_data):
-                            # 参数名称
-                            item_name = QTableWidgetItem(param_name)
-                            item_name.setFlags(item_name.flags() & ~Qt.ItemIsEditable)  # 禁止编辑
-                            self.machine_params_table.setItem(row, 0, item_name)
-
-                            # 数值
-                            item_value = QTableWidgetItem(value)
-                            item_value.setFlags(item_value.flags() & ~Qt.ItemIsEditable)  # 禁止编辑
-                            self.machine_params_table.setItem(row, 1, item_value)
-
-                        # 设置表格自适应内容
-                        self.machine_params_table.resizeColumnsToContents()
-                        self.machine_params_table.resizeRowsToContents()
-
-                        print(f"成功加载 {len(table_data)} 个机台参数（按固定顺序）")
-                        return
+                # 只解析表头并从文件末尾读取最后一条记录
+                header, last_row = read_last_row(log_file)
+
+                if last_row is not None:
+                    # 创建参数名称到数值的映射
+                    param_value_map = {}
+                    for param_key, unit, value in zip(header.headers, header.units, last_row):
+                        # 处理时间显示格式 - 去掉毫秒部分
+                        if param_key == "Time" and ":" in value:
+                            # 格式如 "20:36:16:756" -> "20:36:16"
+                            time_parts = value.split(":")
+                            if len(time_parts) >= 3:
+                                value = ":".join(time_parts[:3])  # 只取前3部分：时:分:秒
+
+                        param_value_map[param_key] = value
+
+                    # 按照1114.csv的固定顺序创建参数名称列表
+                    fixed_param_names = [
+                        "Time",
+                        "PEG21", "PEG11",
+                        "CCG01(GCIB)", "PIG01(GCIB)",
+                        "Beam Current(Fixing)", "Beam Current(Moving)",
+                        "Accelerator Current", "Accelerator Voltage",
+                        "Lens1 Current", "Lens1 Voltage",
+                        "Lens2 Current", "Lens2 Voltage",
+                        "Suppressor Current", "Suppressor Voltage",  # 新顺序
+                        "Bias Current", "Bias Voltage",  # 新顺序
+                        "Arc Current", "Arc Voltage",
+                        "Filament Current", "Filament Voltage",
+                        "Neutralizer extracation Current", "Neutralizer extracation Voltage",
+                        "Neutralizer filament Current", "Neutralizer filament Voltage",
+                        "APC Pressure", "MFC111 Flow", "MFC112 Flow", "MFC113 Flow"
+                    ]
+
+                    # 创建表格数据（使用固定顺序）
+                    table_data = []
+                    for param in fixed_param_names:
+                        if param in param_value_map:
+                            table_data.append((param, param_value_map[param]))
+                        else:
+                            table_data.append((param, "等待读取..."))
+
+                    # 添加Lifetime行
+                    table_data.append(("Lifetime", "未设定"))
+
+                    # 设置表格行数
+                    self.machine_params_table.setRowCount(len(table_data))
+
+                    # 填充表格数据
+                    for row, (param_name, value) in enumerate(table_data):
+                        # 参数名称
+                        item_name = QTableWidgetItem(param_name)
+                        item_name.setFlags(item_name.flags() & ~Qt.ItemIsEditable)  # 禁止编辑
+                        self.machine_params_table.setItem(row, 0, item_name)
+
+                        # 数值
+                        item_value = QTableWidgetItem(value)
+                        item_value.setFlags(item_value.flags() & ~Qt.ItemIsEditable)  # 禁止编辑
+                        self.machine_params_table.setItem(row, 1, item_value)
+
+                    # 设置表格自适应内容
+                    self.machine_params_table.resizeColumnsToContents()
+                    self.machine_params_table.resizeRowsToContents()
+
+                    print(f"成功加载 {len(table_data)} 个机台参数（按固定顺序）")
+                    return
 
             # 如果本地文件不存在或加载失败，设置默认的参数名称（按照1114.csv排序）
             default_params = [
@@ -506,7 +519,7 @@ class AnalyzerUI(QWidget):
                 status_bar = None
 
             # 机台log文件路径
-            machine_log_path = Path(r"C:\D2216\Bin\Log\SamplingLog\ScanData")
+            machine_log_path = MACHINE_SCAN_LOG_DIR
 
             if not machine_log_path.exists():
                 error_msg = f"机台log路径不存在: {machine_log_path}"
@@ -517,19 +530,9 @@ class AnalyzerUI(QWidget):
                         QMessageBox.warning(self, "警告", error_msg)
                 return
 
-            # 搜索最新的CSV文件
-            latest_file = None
-            latest_time = None
-
-            for file_path in machine_log_path.glob("*.csv"):
-                try:
-                    file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                    if latest_time is None or file_time > latest_time:
-                        latest_time = file_time
-                        latest_file = file_path
-                except Exception as e:
-                    print(f"检查文件时间失败 {file_path}: {e}")
-                    continue
+            # 由文件索引查询最新的CSV文件（目录无变化时不再逐个stat）
+            latest_entry = get_catalog().latest(KIND_SCAN_LOG)
+            latest_file = latest_entry.path if latest_entry else None
 
             if latest_file is None:
                 error_msg = "未找到机台log文件"
@@ -540,70 +543,30 @@ class AnalyzerUI(QWidget):
                         QMessageBox.warning(self, "警告", error_msg)
                 return
 
-            # 读取最新文件的最后一行数据
-            scan_data = {}
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-
-                # 读取表头和单位
-                headers = next(reader)
-                units = next(reader)
-
-                # 读取所有数据行
-                data_rows = []
-                for row in reader:
-                    if row:  # 跳过空行
-                        data_rows.append(row)
-
-                if not data_rows:
-                    error_msg = "机台log文件没有数据"
-                    if not silent:
-                        if status_bar:
-                            status_bar.showMessage(error_msg)
-                        else:
-                            QMessageBox.warning(self, "警告", error_msg)
-                    return
-
-                # 获取最后一行数据并存储到字典中
-                last_row = data_rows[-1]
-                for header, value in zip(headers, last_row):
-                    scan_data[header] = value
+            # 读取最新文件的最后一行数据（从文件末尾读取，不随文件长度变慢）
+            scan_data = read_last_record(latest_file)
+            if scan_data is None:
+                error_msg = "机台log文件没有数据"
+                if not silent:
+                    if status_bar:
+                        status_bar.showMessage(error_msg)
+                    else:
+                        QMessageBox.warning(self, "警告", error_msg)
+                return
 
             # 读取PM文件夹中的PIG01数据
             pig01_value = "N/A"
             try:
-                pm_log_path = Path(r"C:\D2216\Bin\Log\SamplingLog\PM")
-                if pm_log_path.exists():
-                    # 搜索最新的CSV文件
-                    latest_pm_file = None
-                    latest_pm_time = None
-
-                    for file_path in pm_log_path.glob("*.csv"):
-                        try:
-                            file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                            if latest_pm_time is None or file_time > latest_pm_time:
-                                latest_pm_time = file_time
-                                latest_pm_file = file_path
-                        except Exception as e:
-                            continue
+                if MACHINE_PM_LOG_DIR.exists():
+                    # 由文件索引查询最新的CSV文件
+                    latest_pm_entry = get_catalog().latest(KIND_PM_LOG)
+                    latest_pm_file = latest_pm_entry.path if latest_pm_entry else None
 
                     if latest_pm_file:
-                        with open(latest_pm_file, 'r', encoding='utf-8') as f:
-                            reader = csv.reader(f)
-                            pm_headers = next(reader)
-                            pm_units = next(reader)
-                            pm_data_rows = []
-                            for row in reader:
-                                if row:
-                                    pm_data_rows.append(row)
-
-                            if pm_data_rows:
-                                pm_last_row = pm_data_rows[-1]
-                                # 查找PIG01(GCIB)列
-                                for i, header in enumerate(pm_headers):
-                                    if header == "PIG01(GCIB)" and i < len(pm_last_row):
-                                        pig01_value = pm_last_row[i]
-                                        break
+                        pm_record = read_last_record(latest_pm_file)
+                        # 查找PIG01(GCIB)列
+                        if pm_record and "PIG01(GCIB)" in pm_record:
+                            pig01_value = pm_record["PIG01(GCIB)"]
             except Exception as e:
                 print(f"读取PIG01数据失败: {e}")
 
@@ -815,6 +778,11 @@ class AnalyzerUI(QWidget):
         self.beam_integration_label.setPlaceholderText("分析后显示结果")
         analysis_layout.addRow("Beam integration:", self.beam_integration_label)
 
+        self.center_offset_label = QLineEdit()
+        self.center_offset_label.setReadOnly(True)
+        self.center_offset_label.setPlaceholderText("分析后显示整图配准结果")
+        analysis_layout.addRow("中心偏移 ΔX/ΔY:", self.center_offset_label)
+
         self.export_check = QCheckBox("导出回归分析数据")
         self.export_check.setChecked(True)
         analysis_layout.addRow(self.export_check)
@@ -1017,6 +985,9 @@ class AnalyzerUI(QWidget):
                 else:
                     QMessageBox.information(self, "信息", f"已导出回归数据到: {export_path}")
 
+            # 整图配准估计中心偏移（后台线程），结果可信时作为建议推送给中心点调整页
+            self._start_center_offset_estimation(slope)
+
             # 计算并显示Beam Peak
             beam_peak = self.analyzer.calculate_beam_peak(k)
             self.beam_peak_label.setText(f"{beam_peak:.6f}")
@@ -1132,6 +1103,41 @@ class AnalyzerUI(QWidget):
             else:
                 QMessageBox.critical(self, "错误", error_msg)
 
+    def _start_center_offset_estimation(self, slope):
+        """在后台线程中做整图配准，之前未完成的估计结果将被忽略"""
+        self.center_offset_label.setText("配准中…")
+        thread = CenterOffsetThread(self.analyzer, slope)
+        thread.estimated.connect(self.on_center_offset_estimated)
+        thread.failed.connect(self.on_center_offset_failed)
+        thread.finished.connect(self._on_center_offset_thread_finished)
+        self.center_offset_thread = thread
+        self._center_offset_threads.add(thread)
+        thread.start()
+
+    def _on_center_offset_thread_finished(self):
+        self._center_offset_threads.discard(self.sender())
+
+    def on_center_offset_estimated(self, offset):
+        """配准完成: 结果可信时作为建议推送给中心点调整页（由操作员确认采用）"""
+        if self.sender() is not self.center_offset_thread:
+            return
+        text = f"{offset['delta_x']:.4f} / {offset['delta_y']:.4f} (相关度 {offset['strength']:.2f})"
+        if offset['plausible']:
+            self.center_offset_estimated.emit(offset['delta_x'], offset['delta_y'])
+        else:
+            text += " 不可信，未作为建议"
+            logger.info(
+                "中心偏移估计不可信: 位移 (%.3f, %.3f), 相关度 %.4f, 峰对比度 %.2e",
+                offset['shift_x'], offset['shift_y'], offset['strength'], offset['contrast']
+            )
+        self.center_offset_label.setText(text)
+
+    def on_center_offset_failed(self, message):
+        if self.sender() is not self.center_offset_thread:
+            return
+        self.center_offset_label.setText("配准失败")
+        logger.warning(f"中心偏移估计失败: {message}")
+
     def _set_maintenance_time(self):
         """设定离子化室保养时间"""
         dialog = MaintenanceTimeDialog(self)
@@ -1252,8 +1258,7 @@ class AnalyzerUI(QWidget):
             log_filename = f"{timestamp_str}_Wedge_beam_Log.csv"
 
             # 确保WedgeTest_Log目录存在
-            log_dir = get_resource_path("Data/outputs/WedgeTest_Log")
-            Path(log_dir).mkdir(parents=True, exist_ok=True)
+            log_dir = ensure_dir("Data/outputs/WedgeTest_Log")
 
             log_file_path = Path(log_dir) / log_filename
 
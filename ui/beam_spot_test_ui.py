@@ -22,6 +22,7 @@ from mpl_toolkits.mplot3d import Axes3D
 import logging
 
 from core.beam_spot_test import BeamSpotTestProcessor
+from core.line_profiles import LineProfileSampler
 from utils.file_io import get_resource_path
 
 logger = logging.getLogger('UI.BeamSpot')
@@ -436,27 +437,22 @@ class BeamSpotTestUI(QWidget):
         ax_x = self.cross_section_figure.add_subplot(211)  # 上部分为X截面
         ax_y = self.cross_section_figure.add_subplot(212)  # 下部分为Y截面
         
-        ########################################################################
-        # 修复1: 正确提取Y=0时的X轴截面数据 (X坐标和蚀刻能力)
-        # 找到最接近Y=0的索引位置
-        y0_indices = np.where(np.abs(grid_y) < 0.01)  # 使用容差0.01mm
-        
-        if len(y0_indices[0]) > 0:
-            # 提取Y=0附近的所有点数据
-            x_section = grid_x[y0_indices]
-            z_section = grid_z[y0_indices]
-            
-            # 为了绘制平滑曲线，按X坐标排序
-            sorted_indices = np.argsort(x_section)
-            x_section = x_section[sorted_indices]
-            z_section = z_section[sorted_indices]
-            
+        # 一次采样得到 Y=0 (0°) 和 X=0 (90°) 两条过中心的截面
+        sections = None
+        try:
+            sampler = LineProfileSampler.from_mgrid(grid_x, grid_y, grid_z)
+            radius = min(-grid_x.min(), grid_x.max(), -grid_y.min(), grid_y.max())
+            positions, sections = sampler.sample_angles(
+                [0.0, 90.0], radius=radius, num_points=grid_x.shape[0]
+            )
+        except ValueError as e:
+            logger.warning(f"截面采样失败: {e}")
+
+        if sections is not None:
             # 绘制X轴截面曲线
-            ax_x.plot(x_section, z_section, 'b-', linewidth=2)
+            ax_x.plot(positions, sections[0], 'b-', linewidth=2)
         else:
-            logger.warning("未找到Y=0的截面数据")
             ax_x.text(0.5, 0.5, "未找到Y=0截面数据", ha='center', va='center')
-        ########################################################################
         
         ax_x.set_title("X轴截面曲线 (Y=0)")
         ax_x.set_xlabel("X位置 (mm)")
@@ -473,27 +469,11 @@ class BeamSpotTestUI(QWidget):
                         label=f'有效半径: ±{self.processor.radius:.2f}mm')
             ax_x.legend(loc='best')
         
-        ########################################################################
-        # 修复2: 正确提取X=0时的Y轴截面数据 (Y坐标和蚀刻能力)
-        # 找到最接近X=0的索引位置
-        x0_indices = np.where(np.abs(grid_x) < 0.01)  # 使用容差0.01mm
-        
-        if len(x0_indices[0]) > 0:
-            # 提取X=0附近的所有点数据
-            y_section = grid_y[x0_indices]
-            z_section = grid_z[x0_indices]
-            
-            # 为了绘制平滑曲线，按Y坐标排序
-            sorted_indices = np.argsort(y_section)
-            y_section = y_section[sorted_indices]
-            z_section = z_section[sorted_indices]
-            
+        if sections is not None:
             # 绘制Y轴截面曲线
-            ax_y.plot(y_section, z_section, 'g-', linewidth=2)
+            ax_y.plot(positions, sections[1], 'g-', linewidth=2)
         else:
-            logger.warning("未找到X=0的截面数据")
             ax_y.text(0.5, 0.5, "未找到X=0截面数据", ha='center', va='center')
-        ########################################################################
         
         ax_y.set_title("Y轴截面曲线 (X=0)")
         ax_y.set_xlabel("Y位置 (mm)")
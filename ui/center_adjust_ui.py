@@ -11,6 +11,7 @@ class CenterAdjustUI(QWidget):
         super().__init__()
         self.adjuster = RecipeCenterAdjuster()
         self.recipe_file = None
+        self._suggested_deltas = None
         
         self._setup_ui()
     
@@ -49,6 +50,16 @@ class CenterAdjustUI(QWidget):
         self.new_y.setPlaceholderText("输入新Y坐标")
         center_layout.addRow("新中心 Y:", self.new_y)
         
+        self.suggestion_label = QLineEdit()
+        self.suggestion_label.setReadOnly(True)
+        self.suggestion_label.setPlaceholderText("Wedge分析后显示整图配准建议")
+        center_layout.addRow("建议偏移 ΔX/ΔY:", self.suggestion_label)
+        
+        self.accept_suggestion_button = QPushButton("采用建议")
+        self.accept_suggestion_button.clicked.connect(self.accept_suggested_deltas)
+        self.accept_suggestion_button.setEnabled(False)
+        center_layout.addRow(self.accept_suggestion_button)
+        
         self.calculate_button = QPushButton("计算偏移量")
         self.calculate_button.clicked.connect(self.calculate_offset)
         center_layout.addRow(self.calculate_button)
@@ -113,6 +124,27 @@ class CenterAdjustUI(QWidget):
             QMessageBox.Ok
         )
     
+    def set_suggested_deltas(self, delta_x, delta_y):
+        """显示自动估计的偏移量建议，不修改已输入的新中心点"""
+        self._suggested_deltas = (delta_x, delta_y)
+        self.suggestion_label.setText(f"{delta_x:.4f} / {delta_y:.4f}")
+        self.accept_suggestion_button.setEnabled(True)
+    
+    def accept_suggested_deltas(self):
+        """操作员确认后，按建议偏移量填入新中心点并计算偏移（仍需手动执行调整）"""
+        if self._suggested_deltas is None:
+            return
+        try:
+            original_x = float(self.original_x.text())
+            original_y = float(self.original_y.text())
+        except ValueError:
+            self._show_error("请先选择Recipe文件")
+            return
+        delta_x, delta_y = self._suggested_deltas
+        self.new_x.setText(f"{original_x + delta_x:.8f}")
+        self.new_y.setText(f"{original_y + delta_y:.8f}")
+        self.calculate_offset()
+    
     def calculate_offset(self):
         """计算偏移量"""
         if not self.recipe_file or not self.new_x.text() or not self.new_y.text():
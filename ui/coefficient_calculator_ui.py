@@ -8,6 +8,7 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from pathlib import Path
 from core.beamCoefficient_Calculator import BeamCoefficientCalculator
+from ui.plot_views import coefficient_figure
 from utils.file_io import get_latest_thickness_files, get_resource_path
 
 class CoefficientCalculatorUI(QWidget):
@@ -300,8 +301,22 @@ class CoefficientCalculatorUI(QWidget):
                 self.slope_label.setText(f"{self.calculator.slope:.6f}")
                 self.r2_label.setText(f"{self.calculator.r_squared:.6f}")
                 
+                # 提示坐标未匹配的点
+                report = self.calculator.match_report
+                unmatched = {
+                    "Simulation": len(report["simulation_unmatched"]),
+                    "初始厚度": len(report["initial_unmatched"]),
+                    "刻蚀后厚度": len(report["after_unmatched"]),
+                }
+                if any(unmatched.values()):
+                    detail = ", ".join(f"{name} {count}个" for name, count in unmatched.items())
+                    QMessageBox.warning(
+                        self, "警告",
+                        f"部分点坐标未能匹配（{detail}），已使用{report['matched']}个匹配点计算"
+                    )
+                
                 # 更新图表
-                fig = self.calculator.plot_data()
+                fig = coefficient_figure(self.calculator)
                 self.canvas.figure = fig
                 self.canvas.draw()
         except Exception as e:
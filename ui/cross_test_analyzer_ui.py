@@ -212,12 +212,12 @@ class CrossTestAnalyzerUI(QWidget):
             # 更新UI显示结果
             self.new_center_x_label.setText(f"{results['new_center_x']:.4f}")
             self.new_center_y_label.setText(f"{results['new_center_y']:.4f}")
-            self.delta_up_label.setText(f"{results['delta_up']:.4f}")
-            self.delta_down_label.setText(f"{results['delta_down']:.4f}")
-            self.delta_right_label.setText(f"{results['delta_right']:.4f}")
-            self.delta_left_label.setText(f"{results['delta_left']:.4f}")
-            self.delta_x_label.setText(f"{results['delta_x']:.4f}")
-            self.delta_y_label.setText(f"{results['delta_y']:.4f}")
+            self.delta_up_label.setText(f"{results['delta_up']:.4f} ± {results['sigma_up']:.4f}")
+            self.delta_down_label.setText(f"{results['delta_down']:.4f} ± {results['sigma_down']:.4f}")
+            self.delta_right_label.setText(f"{results['delta_right']:.4f} ± {results['sigma_right']:.4f}")
+            self.delta_left_label.setText(f"{results['delta_left']:.4f} ± {results['sigma_left']:.4f}")
+            self.delta_x_label.setText(f"{results['delta_x']:.4f} ± {results['delta_x_sigma']:.4f}")
+            self.delta_y_label.setText(f"{results['delta_y']:.4f} ± {results['delta_y_sigma']:.4f}")
             
             # 更新状态
             self.status_label.setText("计算完成")
@@ -233,7 +233,7 @@ class CrossTestAnalyzerUI(QWidget):
             
     def update_plot(self, results):
         """更新图表显示刻蚀量分布"""
-        df = results['etching_df']
+        profiles = results['arm_profiles']
         
         # 创建4x4子图网格
         self.fig.clear()
@@ -241,8 +241,8 @@ class CrossTestAnalyzerUI(QWidget):
         
         # 上方区域
         ax_top = self.fig.add_subplot(gs[0, 0])
-        top_section = df.iloc[1:82]
-        ax_top.plot(top_section['X'], top_section['TrimmingAmount'], 'b-')
+        top_coords, top_amount = profiles['up']
+        ax_top.plot(top_coords, top_amount, 'b-')
         ax_top.axvline(results['delta_up'], color='r', linestyle='--')
         ax_top.set_title('上方刻蚀量分布 (y=40)')
         ax_top.set_xlabel('X 位置')
@@ -250,16 +250,16 @@ class CrossTestAnalyzerUI(QWidget):
         
         # 下方区域
         ax_bottom = self.fig.add_subplot(gs[0, 1])
-        bottom_section = df.iloc[82:163]
-        ax_bottom.plot(bottom_section['X'], bottom_section['TrimmingAmount'], 'g-')
+        bottom_coords, bottom_amount = profiles['down']
+        ax_bottom.plot(bottom_coords, bottom_amount, 'g-')
         ax_bottom.axvline(results['delta_down'], color='r', linestyle='--')
         ax_bottom.set_title('下方刻蚀量分布 (y=-40)')
         ax_bottom.set_xlabel('X 位置')
         
         # 右方区域
         ax_right = self.fig.add_subplot(gs[1, 0])
-        right_section = df.iloc[163:244]
-        ax_right.plot(right_section['Y'], right_section['TrimmingAmount'], 'm-')
+        right_coords, right_amount = profiles['right']
+        ax_right.plot(right_coords, right_amount, 'm-')
         ax_right.axvline(results['delta_right'], color='r', linestyle='--')
         ax_right.set_title('右方刻蚀量分布 (x=40)')
         ax_right.set_xlabel('Y 位置')
@@ -267,8 +267,8 @@ class CrossTestAnalyzerUI(QWidget):
         
         # 左方区域
         ax_left = self.fig.add_subplot(gs[1, 1])
-        left_section = df.iloc[244:]
-        ax_left.plot(left_section['Y'], left_section['TrimmingAmount'], 'c-')
+        left_coords, left_amount = profiles['left']
+        ax_left.plot(left_coords, left_amount, 'c-')
         ax_left.axvline(results['delta_left'], color='r', linestyle='--')
         ax_left.set_title('左方刻蚀量分布 (x=-40)')
         ax_left.set_xlabel('Y 位置')
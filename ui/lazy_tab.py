@@ -0,0 +1,109 @@
+import importlib
+import logging
+import sys
+import time
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget
+
+logger = logging.getLogger('UI')
+
+_matplotlib_configured = False
+
+
+def configure_matplotlib():
+    """
+    设置 matplotlib 全局参数（中文字体等），只执行一次
+
+    matplotlib 尚未被导入时不做任何事（不为此导入 matplotlib），
+    由 LazyTab 在选项卡模块导入之后、创建第一个图表之前调用。
+    """
+    global _matplotlib_configured
+    mpl = sys.modules.get("matplotlib")
+    if _matplotlib_configured or mpl is None:
+        return
+    _matplotlib_configured = True
+    try:
+        logger.info("设置 Matplotlib 配置")
+        if sys.platform == 'win32':
+            mpl.rcParams['font.family'] = 'Microsoft YaHei'
+        mpl.rcParams['axes.unicode_minus'] = False
+        mpl.rcParams['font.size'] = 10
+    except Exception:
+        logger.exception("初始化 Matplotlib 失败")
+
+
+class LazyTab(QWidget):
+    """
+    选项卡占位控件
+
+    首次 load() 时才导入选项卡所在模块（连同其 matplotlib / scipy / pandas 等依赖）
+    并创建真正的选项卡控件，放入自身布局中；模块导入了 matplotlib 时，
+    创建控件前先执行 configure_matplotlib()。创建之前对选项卡的操作通过
+    when_loaded() 排队，创建后按顺序执行。
+    """
+
+    loaded = pyqtSignal(object)
+
+    def __init__(self, module_name, class_name, parent=None):
+        """
+        参数:
+        module_name: 选项卡所在模块，如 "ui.analyzer_ui"
+        class_name: 选项卡类名，如 "AnalyzerUI"
+        """
+        super().__init__(parent)
+        self.module_name = module_name
+        self.class_name = class_name
+        self.widget = None
+        self._pending = []
+
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._placeholder = QLabel("正在加载…")
+        self._placeholder.setAlignment(Qt.AlignCenter)
+        self._layout.addWidget(self._placeholder)
+
+    @property
+    def is_loaded(self):
+        return self.widget is not None
+
+    def load(self):
+        """导入模块并创建选项卡（只执行一次），失败时返回 None"""
+        if self.widget is not None:
+            return self.widget
+
+        start = time.perf_counter()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            module = importlib.import_module(self.module_name)
+            configure_matplotlib()
+            widget = getattr(module, self.class_name)()
+        except Exception as e:
+            logger.exception(f"创建选项卡 {self.class_name} 失败")
+            self._placeholder.setText(f"加载失败: {e}")
+            return None
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        self._layout.removeWidget(self._placeholder)
+        self._placeholder.deleteLater()
+        self._placeholder = None
+        self._layout.addWidget(widget)
+        self.widget = widget
+        logger.info("创建选项卡 %s 耗时 %.0f ms", self.class_name, (time.perf_counter() - start) * 1000)
+
+        self.loaded.emit(widget)
+        pending, self._pending = self._pending, []
+        for action in pending:
+            try:
+                action(widget)
+            except Exception:
+                logger.exception(f"选项卡 {self.class_name} 的延迟操作执行失败")
+        return widget
+
+    def when_loaded(self, action):
+        """选项卡已创建时立即执行 action(widget)，否则等首次创建后执行"""
+        if self.widget is None:
+            self._pending.append(action)
+        else:
+            action(self.widget)
@@ -4,18 +4,24 @@ from PyQt5.QtWidgets import (
     QMainWindow, QApplication, QMenuBar, QAction, 
     QTabWidget, QStatusBar, QFileDialog, QMessageBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon
 from pathlib import Path  # 确保导入了 Path
 
-from .center_adjust_ui import CenterAdjustUI
-from .analyzer_ui import AnalyzerUI
-from .coefficient_calculator_ui import CoefficientCalculatorUI 
-from .shape_creator_ui import BeamShapeCreatorUI
-from .cross_test_analyzer_ui import CrossTestAnalyzerUI
-from .shape_Moulding_ui import ShapeMouldingUI  # 新增UI组件
+from .lazy_tab import LazyTab
 from utils.file_io import get_latest_files, get_resource_path
-from .beam_spot_test_ui import BeamSpotTestUI  # Beamspottest组件
+
+# 选项卡: (属性名, 模块, 类名, 标题)
+# 各选项卡及其 matplotlib / scipy / pandas 依赖在首次切换到该页时才导入和创建
+TAB_SPECS = [
+    ("center_adjust_tab", "ui.center_adjust_ui", "CenterAdjustUI", "调整中心点"),
+    ("analyzer_tab", "ui.analyzer_ui", "AnalyzerUI", "WedgeTest分析"),
+    ("coeff_calculator_tab", "ui.coefficient_calculator_ui", "CoefficientCalculatorUI", "Beam系数计算"),
+    ("beam_shape_tab", "ui.shape_creator_ui", "BeamShapeCreatorUI", "Beam形状创建"),
+    ("cross_test_analyzer_tab", "ui.cross_test_analyzer_ui", "CrossTestAnalyzerUI", "CrossTest中心点分析"),
+    ("shape_moulding_tab", "ui.shape_Moulding_ui", "ShapeMouldingUI", "Beam形状重构"),
+    ("beam_spot_test_tab", "ui.beam_spot_test_ui", "BeamSpotTestUI", "Beam Spot测试"),
+]
 
 
 class MainWindow(QMainWindow):
@@ -33,25 +39,17 @@ class MainWindow(QMainWindow):
         # 主选项卡
         self.tab_widget = QTabWidget()
         
-        # 将所有标签页集中在此处创建
-        self.center_adjust_tab = CenterAdjustUI()
-        self.analyzer_tab = AnalyzerUI()
-        self.coeff_calculator_tab = CoefficientCalculatorUI()
-        self.beam_shape_tab = BeamShapeCreatorUI()
-        self.cross_test_analyzer_tab = CrossTestAnalyzerUI()
-        # 新增的beam形状重构UI
-        self.shape_moulding_tab = ShapeMouldingUI()  # 添加shapeMoulding新组件
-        self.beam_spot_test_tab = BeamSpotTestUI()  # 添加BeamSpotTest新组建
+        # 将所有标签页集中在此处登记，先放入占位控件
+        for attr, module_name, class_name, title in TAB_SPECS:
+            tab = LazyTab(module_name, class_name)
+            setattr(self, attr, tab)
+            self.tab_widget.addTab(tab, title)
 
-        
-        # 添加到选项卡控件
-        self.tab_widget.addTab(self.center_adjust_tab, "调整中心点")
-        self.tab_widget.addTab(self.analyzer_tab, "WedgeTest分析")
-        self.tab_widget.addTab(self.coeff_calculator_tab, "Beam系数计算")
-        self.tab_widget.addTab(self.beam_shape_tab, "Beam形状创建")
-        self.tab_widget.addTab(self.cross_test_analyzer_tab, "CrossTest中心点分析")
-        self.tab_widget.addTab(self.shape_moulding_tab, "Beam形状重构")  
-        self.tab_widget.addTab(self.beam_spot_test_tab, "Beam Spot测试")  
+        # WedgeTest整图配准得到的可信中心偏移作为建议推送到中心点调整页
+        self.analyzer_tab.loaded.connect(
+            lambda widget: widget.center_offset_estimated.connect(self._suggest_center_offset)
+        )
+        self.tab_widget.currentChanged.connect(self._load_tab)
         
         # 设置中心控件
         self.setCentralWidget(self.tab_widget)
@@ -63,6 +61,21 @@ class MainWindow(QMainWindow):
         
         # 自动加载最新文件
         self.load_default_files()
+
+        # 窗口显示后再创建当前页
+        QTimer.singleShot(0, lambda: self._load_tab(self.tab_widget.currentIndex()))
+
+    def _load_tab(self, index):
+        """切换到某页时创建该页"""
+        tab = self.tab_widget.widget(index)
+        if isinstance(tab, LazyTab):
+            tab.load()
+
+    def _suggest_center_offset(self, delta_x, delta_y):
+        self.center_adjust_tab.when_loaded(
+            lambda widget: widget.set_suggested_deltas(delta_x, delta_y)
+        )
+        self.status_bar.showMessage("已生成中心偏移建议，请在中心点调整页确认是否采用")
     
     def _create_menu_bar(self):
         """创建菜单栏"""
@@ -188,12 +201,12 @@ class MainWindow(QMainWindow):
         """加载默认的最新文件"""
         try:
             recipe_file, initial_file, after_file = get_latest_files()
-            self.center_adjust_tab.set_recipe_file(recipe_file)
-            self.analyzer_tab.set_files(recipe_file, initial_file, after_file)
+            self.center_adjust_tab.when_loaded(lambda tab: tab.set_recipe_file(recipe_file))
+            self.analyzer_tab.when_loaded(lambda tab: tab.set_files(recipe_file, initial_file, after_file))
             self.status_bar.showMessage("已加载最新文件")
             
             # 为Beam系数计算选项卡也加载默认厚度文件
-            self.coeff_calculator_tab._load_default_files()
+            self.coeff_calculator_tab.when_loaded(lambda tab: tab._load_default_files())
             
         except Exception as e:
             self.status_bar.showMessage(f"加载最新文件失败: {str(e)}")
@@ -206,8 +219,8 @@ class MainWindow(QMainWindow):
             self, "选择Recipe文件", "", "CSV Files (*.csv)", options=options)
         
         if file_path:
-            self.center_adjust_tab.set_recipe_file(file_path)
-            self.analyzer_tab.set_recipe_file(file_path)
+            self.center_adjust_tab.when_loaded(lambda tab: tab.set_recipe_file(file_path))
+            self.analyzer_tab.when_loaded(lambda tab: tab.set_recipe_file(file_path))
             self.status_bar.showMessage(f"已加载Recipe: {file_path}")
     
     def closeEvent(self, event):
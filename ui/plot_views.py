@@ -0,0 +1,56 @@
+from matplotlib.figure import Figure
+
+
+def empty_coefficient_figure(message="数据未加载"):
+    """创建空图表"""
+    fig = Figure(figsize=(8, 6))
+    fig.suptitle('请先加载数据并计算系数')
+    ax = fig.add_subplot(111)
+    ax.text(0.5, 0.5, message,
+            ha='center', va='center', fontsize=12)
+    ax.set_axis_off()
+    return fig
+
+
+def coefficient_figure(calculator):
+    """
+    为 BeamCoefficientCalculator 的计算结果创建散点图和回归线
+
+    参数:
+    calculator: 已完成 calculate_coefficient 的计算器
+
+    返回:
+    Figure: 数据不足时返回空图表
+    """
+    set_values = calculator.matched_set_values
+    if len(set_values) == 0 or calculator.slope is None:
+        return empty_coefficient_figure()
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot(111)
+
+    # 绘制散点图
+    ax.scatter(
+        set_values,
+        calculator.actual_values,
+        alpha=0.7,
+        label='实测点'
+    )
+
+    # 绘制回归线
+    x_min = set_values.min()
+    x_max = set_values.max()
+    ax.plot(
+        [x_min, x_max], [calculator.slope * x_min, calculator.slope * x_max],
+        color='red',
+        linestyle='-',
+        linewidth=1.5,
+        label=f'拟合直线 (y={calculator.slope:.4f}x, R²={calculator.r_squared:.4f})'
+    )
+
+    ax.set_title('实际变化值 vs. 设定变化值')
+    ax.set_xlabel(f'设定变化值 (Simulation目标值: {calculator.target_value:.2f})')
+    ax.set_ylabel('实际变化值 (初始厚度 - 刻蚀后厚度)')
+    ax.grid(True, linestyle='--', alpha=0.5)
+    ax.legend()
+    return fig
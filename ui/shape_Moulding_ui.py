@@ -2,7 +2,7 @@ import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QPushButton,
     QFileDialog, QLabel, QTabWidget, QProgressBar, QGroupBox, 
-    QSizePolicy, QFrame, QSplitter
+    QSizePolicy, QFrame, QSplitter, QComboBox
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont
@@ -14,8 +14,12 @@ from mpl_toolkits.mplot3d import Axes3D
 from pathlib import Path
 
 from utils.file_io import get_resource_path
-from core.beamshape_Moulding import reconstruct_beam_profile
+from core.beamshape_Moulding import reconstruct_beam_profile, SOLVER_GREEDY, SOLVER_IPF
 from core.rawData_processor import process_and_save_outputs
+from core.moulding_pipeline import ShapeMouldingPipeline
+
+# X/Y截面总量的相对差超过该值时在状态栏提示
+MARGINAL_MISMATCH_WARNING = 0.01
 
 class RawDataThread(QThread):
     """用于后台处理原始数据的线程"""
@@ -47,22 +51,64 @@ class ReconstructionThread(QThread):
     log = pyqtSignal(str)
     update_progress = pyqtSignal(int)
 
-    def __init__(self, x_file, y_file, output_dir):
+    def __init__(self, x_file, y_file, output_dir, solver=SOLVER_GREEDY):
         super().__init__()
         self.x_file = x_file
         self.y_file = y_file
         self.output_dir = output_dir
+        self.solver = solver
 
     def run(self):
         try:
             self.log.emit("开始重构离子束形状...")
             result = reconstruct_beam_profile(
-                self.x_file, self.y_file, self.output_dir)
+                self.x_file, self.y_file, self.output_dir, solver=self.solver)
             self.finished.emit(result)
             self.log.emit("重构完成!")
         except Exception as e:
             self.log.emit(f"重构失败: {str(e)}")
 
+class PipelineThread(QThread):
+    """原始数据处理与重构一体化的后台线程（阶段间在内存中传递数据）"""
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    log = pyqtSignal(str)
+    update_progress = pyqtSignal(int)
+
+    STAGE_TEXT = {
+        "trimming": "计算刻蚀量...",
+        "sections": "提取截面数据...",
+        "reconstruction": "重构离子束形状..."
+    }
+
+    def __init__(self, initial_file, after_file, output_dir, data_processor_dir, solver=SOLVER_GREEDY):
+        super().__init__()
+        self.initial_file = initial_file
+        self.after_file = after_file
+        self.output_dir = output_dir
+        self.data_processor_dir = data_processor_dir
+        self.solver = solver
+
+    def _on_progress(self, stage, percent):
+        self.log.emit(self.STAGE_TEXT.get(stage, stage))
+        self.update_progress.emit(percent)
+
+    def run(self):
+        try:
+            pipeline = ShapeMouldingPipeline(solver=self.solver)
+            result = pipeline.run(
+                self.initial_file,
+                self.after_file,
+                output_dir=self.output_dir,
+                data_processor_dir=self.data_processor_dir,
+                progress_callback=self._on_progress
+            )
+            self.finished.emit(result)
+            self.log.emit("处理与重构完成!")
+        except Exception as e:
+            self.log.emit(f"一键重构失败: {str(e)}")
+            self.failed.emit(str(e))
+
 class ShapeMouldingUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -79,6 +125,7 @@ class ShapeMouldingUI(QWidget):
         self.init_ui()
         self.reconstruction_thread = None
         self.raw_data_thread = None
+        self.pipeline_thread = None
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -192,6 +239,13 @@ class ShapeMouldingUI(QWidget):
         """)
         process_btn.clicked.connect(self.process_raw_data)
         layout.addWidget(process_btn)
+        
+        # 一键处理并重构按钮（阶段间不经过中间文件）
+        self.pipeline_btn = QPushButton("处理并直接重构")
+        self.pipeline_btn.setFixedHeight(40)
+        self.pipeline_btn.setStyleSheet(process_btn.styleSheet().replace("#8e44ad", "#27ae60").replace("#9b59b6", "#2ecc71"))
+        self.pipeline_btn.clicked.connect(self.run_pipeline)
+        layout.addWidget(self.pipeline_btn)
 
         # 添加间距
         #layout.addSpacing(20)
@@ -348,6 +402,54 @@ class ShapeMouldingUI(QWidget):
         self.y_section_label.setText(f"Y截面文件: {Path(y_section_path).name}")
         self.data_process_status.setText("原始数据处理成功完成!")
     
+    def run_pipeline(self):
+        """一键执行原始数据处理与重构"""
+        if not self.initial_file:
+            self.data_process_status.setText("请先选择初始膜厚文件")
+            return
+        if not self.after_file:
+            self.data_process_status.setText("请先选择扫描后膜厚文件")
+            return
+        
+        self.progress_bar.setValue(0)
+        self.data_process_status.setText("正在处理并重构...")
+        self.status_label.setText("重构进行中...")
+        self.pipeline_btn.setEnabled(False)
+        self.run_btn.setEnabled(False)
+        self.export_btn.setEnabled(False)
+        self.export_iter_btn.setEnabled(False)
+        self.clear_all_charts()
+        
+        self.pipeline_thread = PipelineThread(
+            self.initial_file,
+            self.after_file,
+            self.output_dir,
+            self.data_processor_dir,
+            solver=self.solver_combo.currentData()
+        )
+        self.pipeline_thread.finished.connect(self.on_pipeline_finished)
+        self.pipeline_thread.log.connect(self.status_label.setText)
+        self.pipeline_thread.log.connect(self.data_process_status.setText)
+        self.pipeline_thread.update_progress.connect(self.progress_bar.setValue)
+        self.pipeline_thread.failed.connect(self.on_pipeline_failed)
+        self.pipeline_thread.start()
+    
+    def on_pipeline_failed(self, message):
+        """一键重构失败后的回调"""
+        self.pipeline_btn.setEnabled(True)
+        self.run_btn.setEnabled(True)
+    
+    def on_pipeline_finished(self, result):
+        """一键重构完成后的回调"""
+        self.pipeline_btn.setEnabled(True)
+        if result.get("section_files"):
+            self.on_raw_data_processed(result["section_files"])
+            # 截面文件同时作为手动重构的默认输入
+            self.x_file, self.y_file = result["section_files"][1], result["section_files"][2]
+            self.x_label.setText(f"已选: {Path(self.x_file).name}")
+            self.y_label.setText(f"已选: {Path(self.y_file).name}")
+        self.on_reconstruction_finished(result)
+    
     # ============= 重构功能组件 (保持不变) =============
     def create_control_container(self):
         """创建重构控制台容器"""
@@ -449,6 +551,16 @@ class ShapeMouldingUI(QWidget):
         action_layout = QVBoxLayout(action_group)
         action_layout.setSpacing(15)
         
+        # 求解模式选择
+        solver_layout = QHBoxLayout()
+        solver_layout.addWidget(QLabel("求解模式:"))
+        self.solver_combo = QComboBox()
+        self.solver_combo.addItem("逐行贪心修正", SOLVER_GREEDY)
+        self.solver_combo.addItem("迭代比例拟合 (IPF)", SOLVER_IPF)
+        self.solver_combo.setToolTip("IPF: 非负且行/列和收敛到截面数据的迭代求解")
+        solver_layout.addWidget(self.solver_combo, 1)
+        action_layout.addLayout(solver_layout)
+        
         # 开始重构按钮
         self.run_btn = self.create_styled_button("开始重构", "#27ae60")
         self.run_btn.setFixedHeight(45)
@@ -462,6 +574,13 @@ class ShapeMouldingUI(QWidget):
         self.export_btn.clicked.connect(self.export_results)
         action_layout.addWidget(self.export_btn)
         
+        # 导出迭代历史按钮（按需生成逐次迭代CSV）
+        self.export_iter_btn = self.create_styled_button("导出迭代数据", "#7f8c8d")
+        self.export_iter_btn.setFixedHeight(35)
+        self.export_iter_btn.setEnabled(False)
+        self.export_iter_btn.clicked.connect(self.export_iterations)
+        action_layout.addWidget(self.export_iter_btn)
+        
         panel_layout.addWidget(action_group, 1)
         
         return control_panel
@@ -781,13 +900,15 @@ class ShapeMouldingUI(QWidget):
         self.status_label.setText("重构进行中...")
         self.run_btn.setEnabled(False)
         self.export_btn.setEnabled(False)
+        self.export_iter_btn.setEnabled(False)
         
         # 清理现有图表
         self.clear_all_charts()
         
         # 创建并启动后台线程
         self.reconstruction_thread = ReconstructionThread(
-            self.x_file, self.y_file, self.output_dir
+            self.x_file, self.y_file, self.output_dir,
+            solver=self.solver_combo.currentData()
         )
         
         # 连接信号
@@ -801,8 +922,18 @@ class ShapeMouldingUI(QWidget):
         self.result = result
         self.run_btn.setEnabled(True)
         self.export_btn.setEnabled(True)
+        self.export_iter_btn.setEnabled(result.get('history') is not None)
         self.progress_bar.setValue(100)
-        self.status_label.setText("重构完成! 结果可在各标签页查看")
+        residuals = result.get('residual_history')
+        if result.get('solver') == SOLVER_IPF and residuals is not None and len(residuals):
+            state = "已收敛" if result.get('converged') else "未收敛"
+            message = f"重构完成! IPF {state}: {len(residuals)} 次迭代, 最终残差 {residuals[-1]:.3e}"
+        else:
+            message = "重构完成! 结果可在各标签页查看"
+        mismatch = result.get('marginal_mismatch', 0.0)
+        if abs(mismatch) > MARGINAL_MISMATCH_WARNING:
+            message += f"（X/Y截面总量相差 {mismatch:+.1%}，行/列和无法同时与实测截面一致）"
+        self.status_label.setText(message)
         self.plot_results()
         self.update_details()
 
@@ -834,6 +965,26 @@ class ShapeMouldingUI(QWidget):
             self.status_label.setText(f"结果已导出到: {Path(file_path).name} 和 {Path(error_file_path).name}")
             plt.close(fig)
 
+    def export_iterations(self):
+        """将内存中的迭代历史导出为逐次迭代CSV和压缩的 .npz 文件"""
+        if not self.result or self.result.get('history') is None:
+            return
+        
+        folder = QFileDialog.getExistingDirectory(
+            self, "选择迭代数据导出目录",
+            str(Path(self.result["final_file"]).parent)
+        )
+        if not folder:
+            return
+        
+        try:
+            history = self.result['history']
+            files = history.export_csv(folder)
+            history.save_npz(Path(folder) / "iteration_history.npz")
+            self.status_label.setText(f"已导出 {len(files)} 个迭代文件到: {folder}")
+        except Exception as e:
+            self.status_label.setText(f"导出迭代数据失败: {str(e)}")
+
     # 以下绘图方法保持不变...
     def plot_results(self):
         if not self.result:
@@ -1042,11 +1193,11 @@ class ShapeMouldingUI(QWidget):
         ax.clear()
         
         # X方向
-        positions_x = np.linspace(-15, 15, len(self.result['x_profile']))
+        positions_x = self.result.get('positions', np.linspace(-15, 15, len(self.result['x_profile'])))
         ax.plot(positions_x, self.result['x_profile'], 'b-', label='X实际值', linewidth=2)
         
         # Y方向
-        positions_y = np.linspace(-15, 15, len(self.result['y_profile']))
+        positions_y = positions_x
         ax.plot(positions_y, self.result['y_profile'], 'g-', label='Y实际值', linewidth=2)
         
         ax.set_title('目标剖面图', fontsize=10)
@@ -1062,8 +1213,9 @@ class ShapeMouldingUI(QWidget):
         ax.clear()
         
         # 取中间行和中间列
-        center_y = self.result['beam_profile'][15, :]
-        center_x = self.result['beam_profile'][:, 15]
+        center_idx = self.result['beam_profile'].shape[0] // 2
+        center_y = self.result['beam_profile'][center_idx, :]
+        center_x = self.result['beam_profile'][:, center_idx]
         
         # X重建剖面
         ax.plot(positions_x, center_x, 'r--', label='X重建剖面', linewidth=2)
@@ -2,8 +2,9 @@ import os
 import numpy as np
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QGridLayout,
                             QLineEdit, QPushButton, QLabel, QComboBox, 
-                            QFileDialog, QSizePolicy, QMessageBox, QCheckBox, QSplitter)
-from PyQt5.QtCore import Qt
+                            QFileDialog, QSizePolicy, QMessageBox, QCheckBox, QSplitter,
+                            QProgressBar)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
@@ -13,10 +14,79 @@ from mpl_toolkits.mplot3d import Axes3D
 from core.beamShape_creator import BeamShapeCreator
 from utils.file_io import ROOT_DIR
 
+class BeamShapeThread(QThread):
+    """用于后台生成光束轮廓的线程"""
+    finished = pyqtSignal(dict)
+    progress = pyqtSignal(int)
+    log = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, params):
+        super().__init__()
+        self.params = params
+
+    def _checkpoint(self, value, message):
+        """更新进度，如已请求取消则返回True"""
+        if self.isInterruptionRequested():
+            self.cancelled.emit()
+            return True
+        self.progress.emit(value)
+        self.log.emit(message)
+        return False
+
+    def run(self):
+        params = self.params
+        try:
+            # 每次运行使用独立的处理器，避免与界面共享中间状态
+            processor = BeamShapeCreator()
+            processor.average_method = params["average_method"]
+            processor.interp_method = params["interp_method"]
+            processor.edge_method = params["edge_method"]
+
+            if self._checkpoint(5, "加载并归一化数据..."):
+                return
+            processor.load_and_normalize_data(params["x_path"], params["y_path"])
+
+            if self._checkpoint(30, "创建插值器..."):
+                return
+            interp_info_x, interp_info_y = processor.create_axis_interpolators(
+                *processor.raw_x,
+                *processor.raw_y,
+                params["plane_size"]
+            )
+
+            if self._checkpoint(55, "生成二维网格..."):
+                return
+            coords, z_matrix = processor.generate_asymmetric_grid(
+                interp_info_x, interp_info_y,
+                params["plane_size"], params["step"]
+            )
+
+            if self._checkpoint(80, "保存结果..."):
+                return
+            processor.save_as_csv(z_matrix, coords, params["output_path"])
+
+            self.progress.emit(100)
+            self.finished.emit({
+                "processor": processor,
+                "interp_info_x": interp_info_x,
+                "interp_info_y": interp_info_y,
+                "coords": coords,
+                "z_matrix": z_matrix,
+                "params": params
+            })
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.failed.emit(str(e))
+
+
 class BeamShapeCreatorUI(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.processor = BeamShapeCreator()
+        self.worker = None
         # 首先设置默认输出目录
         self.default_output_dir = ROOT_DIR / "Data" / "outputs" / "new_BeamShapeProfile"
         self.default_output_dir.mkdir(parents=True, exist_ok=True)  # 确保目录存在
@@ -132,7 +202,24 @@ class BeamShapeCreatorUI(QWidget):
         self.process_btn.setMinimumHeight(35)
         self.process_btn.setStyleSheet("font-size: 14px; font-weight: bold; padding: 5px;")
         self.process_btn.clicked.connect(self.process_data)
-        param_layout.addWidget(self.process_btn)
+        
+        # 取消按钮
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setMinimumHeight(35)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_processing)
+        
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(self.process_btn, 3)
+        action_layout.addWidget(self.cancel_btn, 1)
+        param_layout.addLayout(action_layout)
+        
+        # 进度条
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(True)
+        param_layout.addWidget(self.progress_bar)
         
         # 状态标签
         self.status_label = QLabel("就绪: 请选择输入文件")
@@ -219,19 +306,11 @@ class BeamShapeCreatorUI(QWidget):
             self.output_entry.setText(file_path)
     
     def process_data(self):
+        """校验参数并在后台线程中执行数据处理主流程"""
+        if self.worker is not None and self.worker.isRunning():
+            return
         
-        """执行数据处理主流程"""
         try:
-            # 确保输出目录存在
-            output_path = self.output_entry.text()
-            if output_path:
-                output_dir = os.path.dirname(output_path)
-                if output_dir:
-                    os.makedirs(output_dir, exist_ok=True)
-                    
-            self.status_label.setText("处理中...")
-            self.process_btn.setEnabled(False)
-            
             # 检查必要文件
             if not self.x_path_entry.text() or not self.y_path_entry.text():
                 raise ValueError("请先选择X和Y方向的数据文件")
@@ -239,6 +318,11 @@ class BeamShapeCreatorUI(QWidget):
             if not self.output_entry.text():
                 raise ValueError("请指定输出文件路径")
             
+            # 确保输出目录存在
+            output_dir = os.path.dirname(self.output_entry.text())
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            
             # 获取参数
             params = {
                 "x_path": self.x_path_entry.text(),
@@ -250,50 +334,73 @@ class BeamShapeCreatorUI(QWidget):
                 "average_method": self.average_method.currentText().split(' ')[0],
                 "edge_method": self.edge_method.currentText()
             }
-            
-            # 保存用户选择的平均方法
-            self.processor.average_method = params["average_method"]
-            # 处理插值方法
-            self.processor.interp_method = params["interp_method"]
-            # 保存边缘处理方法
-            self.processor.edge_method = params["edge_method"]
-            
-            # 加载并归一化数据
-            self.processor.load_and_normalize_data(params["x_path"], params["y_path"])
-            
-            # 创建插值器
-            interp_info_x, interp_info_y = self.processor.create_axis_interpolators(
-                *self.processor.raw_x, 
-                *self.processor.raw_y,
-                params["plane_size"]
-            )
-            
-            # 生成二维网格 (根据选择的边缘处理方法)
-            coords, z_matrix = self.processor.generate_asymmetric_grid(
-                interp_info_x, interp_info_y, 
-                params["plane_size"], params["step"]
-            )
-            
-            # 保存结果
-            self.processor.save_as_csv(z_matrix, coords, params["output_path"])
-            
-            # 显示成功消息
-            self.status_label.setText(
-                f"处理完成 | "
-                f"FWHM: X={self.processor.x_fwhm:.2f}mm, Y={self.processor.y_fwhm:.2f}mm | "
-                f"输出文件: {os.path.basename(params['output_path'])}"
+        except Exception as e:
+            QMessageBox.critical(self, "处理错误", f"发生错误: {str(e)}")
+            self.status_label.setText(f"错误: {str(e)}")
+            return
+        
+        self.status_label.setText("处理中...")
+        self.progress_bar.setValue(0)
+        self._set_running(True)
+        
+        # 创建并启动后台线程
+        self.worker = BeamShapeThread(params)
+        self.worker.progress.connect(self.progress_bar.setValue)
+        self.worker.log.connect(self.status_label.setText)
+        self.worker.finished.connect(self.on_processing_finished)
+        self.worker.failed.connect(self.on_processing_failed)
+        self.worker.cancelled.connect(self.on_processing_cancelled)
+        self.worker.start()
+    
+    def cancel_processing(self):
+        """请求取消后台处理（在当前步骤结束后生效）"""
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.requestInterruption()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("正在取消...")
+    
+    def _set_running(self, running):
+        """切换处理中/空闲状态下的按钮可用性"""
+        self.process_btn.setEnabled(not running)
+        self.cancel_btn.setEnabled(running)
+    
+    def on_processing_finished(self, result):
+        """后台处理完成后的回调"""
+        self._set_running(False)
+        self.processor = result["processor"]
+        params = result["params"]
+        
+        # 显示成功消息
+        self.status_label.setText(
+            f"处理完成 | "
+            f"FWHM: X={self.processor.x_fwhm:.2f}mm, Y={self.processor.y_fwhm:.2f}mm | "
+            f"输出文件: {os.path.basename(params['output_path'])}"
+        )
+        
+        # 可视化结果
+        try:
+            self.visualize_results(
+                result["interp_info_x"], result["interp_info_y"],
+                result["coords"], result["z_matrix"], params
             )
-            
-            # 可视化结果
-            self.visualize_results(interp_info_x, interp_info_y, coords, z_matrix, params)
-            
         except Exception as e:
             QMessageBox.critical(self, "处理错误", f"发生错误: {str(e)}")
             import traceback
             traceback.print_exc()
             self.status_label.setText(f"错误: {str(e)}")
-        finally:
-            self.process_btn.setEnabled(True)
+    
+    def on_processing_failed(self, message):
+        """后台处理失败后的回调"""
+        self._set_running(False)
+        self.progress_bar.setValue(0)
+        QMessageBox.critical(self, "处理错误", f"发生错误: {message}")
+        self.status_label.setText(f"错误: {message}")
+    
+    def on_processing_cancelled(self):
+        """后台处理被取消后的回调"""
+        self._set_running(False)
+        self.progress_bar.setValue(0)
+        self.status_label.setText("已取消")
     
     def visualize_results(self, interp_info_x, interp_info_y, coords, z_matrix, params):
         """结果可视化"""
@@ -414,22 +521,9 @@ class BeamShapeCreatorUI(QWidget):
         # ====================== 图表5: 对角轮廓 ======================
         ax_diag = self.fig.add_subplot(gs[2, 1])
         
-        # 计算对角线
+        # 计算对角线 (x=y, 每个插值器一次向量化调用)
         diag_line = np.linspace(-params['plane_size']/2, params['plane_size']/2, len(coords))
-        diag_vals = []
-        
-        # 对角线上的点位置
-        for i in range(len(diag_line)):
-            x_val = diag_line[i]
-            y_val = diag_line[i]
-            
-            x_intensity = interp_x(x_val)
-            y_intensity = interp_y(y_val)
-            
-            if params['average_method'] == '几何平均':
-                diag_vals.append(np.sqrt(x_intensity * y_intensity))
-            else:
-                diag_vals.append((x_intensity + y_intensity) / 2)
+        diag_vals = self.processor.sample_cut_lines(interp_info_x, interp_info_y, diag_line, diag_line)
         
         ax_diag.plot(diag_line, diag_vals, 'r-', linewidth=1.5, label='对角剖面')
         ax_diag.set_title(f"对角线轮廓 (45度)")
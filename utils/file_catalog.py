@@ -0,0 +1,318 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from utils.file_io import get_resource_path
+
+logger = logging.getLogger('FileCatalog')
+
+# 文件类别
+KIND_RECIPE = "recipe"
+KIND_THK_INITIAL = "thk_initial"
+KIND_THK_AFTER = "thk_after"
+KIND_CROSS_INITIAL = "cross_initial"
+KIND_CROSS_AFTER = "cross_after"
+KIND_SCAN_LOG = "scan_log"    # 机台 SamplingLog/ScanData
+KIND_PM_LOG = "pm_log"        # 机台 SamplingLog/PM
+
+# 机台log目录
+MACHINE_SCAN_LOG_DIR = Path(r"C:\D2216\Bin\Log\SamplingLog\ScanData")
+MACHINE_PM_LOG_DIR = Path(r"C:\D2216\Bin\Log\SamplingLog\PM")
+
+# 类别 -> (目录, 是否计算内容哈希)；机台log持续追加写入，不计算哈希
+DEFAULT_SOURCES = {
+    KIND_RECIPE: ("Data/inputs/WedgeTestRecipe", True),
+    KIND_THK_INITIAL: ("Data/inputs/THK_initial", True),
+    KIND_THK_AFTER: ("Data/inputs/THK_after", True),
+    KIND_CROSS_INITIAL: ("Data/inputs/CrossTrim_initial", True),
+    KIND_CROSS_AFTER: ("Data/inputs/CrossTrim_after", True),
+    KIND_SCAN_LOG: (MACHINE_SCAN_LOG_DIR, False),
+    KIND_PM_LOG: (MACHINE_PM_LOG_DIR, False),
+}
+
+CATALOG_PATH = "Data/config/file_catalog.db"
+
+# 目录修改时间未变时，距上次完整扫描超过该秒数也重新完整扫描（捕获原地覆盖的旧文件），
+# 期间只复查最新文件。机台log持续追加写入最新文件，间隔可以较长；
+# 输入数据目录（计算内容哈希的类别）可能有旧文件被原地覆盖，间隔较短
+FULL_RESCAN_INTERVAL = 60.0
+INPUT_RESCAN_INTERVAL = 5.0
+
+# 文件名开头的晶圆编号，如 "1112-initial.csv"、"2602_30mm_crosstest_initial.csv"、
+# "2103 wedge Test-after.csv"（14位时间戳等更长的数字不视为晶圆编号）
+_WAFER_ID_PATTERN = re.compile(r"^(\d{3,6})(?=[\s_\-.]|$)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT,
+    wafer_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_kind_mtime ON files (kind, mtime_ns);
+CREATE INDEX IF NOT EXISTS idx_files_wafer ON files (wafer_id, kind);
+CREATE TABLE IF NOT EXISTS directories (
+    kind TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    dir_mtime_ns INTEGER,
+    scanned_at REAL,
+    PRIMARY KEY (kind, directory)
+);
+"""
+
+
+def parse_wafer_id(name):
+    """从文件名解析晶圆编号，无法识别时返回 None"""
+    match = _WAFER_ID_PATTERN.match(Path(name).stem)
+    return match.group(1) if match else None
+
+
+def _file_digest(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _to_ns(value):
+    """datetime 或时间戳(秒) -> 纳秒"""
+    if isinstance(value, datetime):
+        value = value.timestamp()
+    return int(value * 1e9)
+
+
+class CatalogEntry:
+    """目录中的一个文件记录"""
+
+    __slots__ = ("path", "kind", "size", "mtime_ns", "sha1", "wafer_id")
+
+    def __init__(self, path, kind, size, mtime_ns, sha1, wafer_id):
+        self.path = Path(path)
+        self.kind = kind
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha1 = sha1
+        self.wafer_id = wafer_id
+
+    @property
+    def mtime(self):
+        return datetime.fromtimestamp(self.mtime_ns / 1e9)
+
+    def __repr__(self):
+        return f"CatalogEntry({str(self.path)!r}, kind={self.kind!r}, wafer_id={self.wafer_id!r})"
+
+
+class FileCatalog:
+    """
+    输入文件的持久化索引（SQLite）
+
+    每个文件记录大小、修改时间、内容哈希和由文件名解析的晶圆编号。
+    refresh() 增量更新: 目录修改时间不变时只复查已知最新的文件（机台log为追加写入），
+    目录有增删时用 os.scandir 扫描，并且只对大小或修改时间变化的文件重新计算哈希。
+    "某类别最新文件"、"某时间段内的文件" 查询走 (kind, mtime_ns) 索引，为 O(log n)。
+    """
+
+    _COLUMNS = "path, kind, size, mtime_ns, sha1, wafer_id"
+
+    def __init__(self, db_path=None, sources=None):
+        """
+        参数:
+        db_path: 数据库文件路径，缺省为 Data/config/file_catalog.db；":memory:" 表示不落盘
+        sources: 类别 -> (目录, 是否计算内容哈希)，缺省为 DEFAULT_SOURCES
+        """
+        if db_path is None:
+            db_path = get_resource_path(CATALOG_PATH)
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self.sources = {}
+        for kind, (directory, hash_content) in (DEFAULT_SOURCES if sources is None else sources).items():
+            self.register(kind, directory, hash_content)
+
+    def register(self, kind, directory, hash_content=True):
+        """登记一个类别对应的目录（相对路径按资源路径解析）"""
+        directory = Path(directory)
+        if not directory.is_absolute():
+            directory = get_resource_path(str(directory))
+        self.sources[kind] = (directory, hash_content)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _entries(self, sql, params):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [CatalogEntry(*row) for row in rows]
+
+    def _upsert(self, kind, directory, entry, old_row, hash_content):
+        """插入或更新一条记录；大小和修改时间都没变时保留原哈希"""
+        path, size, mtime_ns = entry
+        if old_row is not None and old_row[0] == size and old_row[1] == mtime_ns:
+            return False
+        sha1 = None
+        if hash_content:
+            try:
+                sha1 = _file_digest(path)
+            except OSError as e:
+                logger.warning(f"无法读取文件 {path}: {e}")
+                return False
+        name = os.path.basename(path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, kind, directory, name, size, mtime_ns, sha1, wafer_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, kind, str(directory), name, size, mtime_ns, sha1, parse_wafer_id(name))
+        )
+        return True
+
+    def _scan(self, kind, directory, hash_content):
+        """完整扫描目录，返回变化的文件数"""
+        found = {}
+        with os.scandir(directory) as it:
+            for item in it:
+                if item.is_file() and item.name.lower().endswith(".csv"):
+                    stat = item.stat()
+                    found[item.path] = (item.path, stat.st_size, stat.st_mtime_ns)
+
+        known = {
+            row[0]: row[1:] for row in self._conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE kind = ? AND directory = ?",
+                (kind, str(directory))
+            )
+        }
+        changed = 0
+        for path, entry in found.items():
+            changed += self._upsert(kind, directory, entry, known.get(path), hash_content)
+        removed = [(path,) for path in known if path not in found]
+        if removed:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+        return changed + len(removed)
+
+    def _recheck_latest(self, kind, directory, hash_content):
+        """目录未变化时，只复查最新文件（追加写入或覆盖会改变其大小和修改时间）"""
+        row = self._conn.execute(
+            "SELECT path, size, mtime_ns FROM files WHERE kind = ? ORDER BY mtime_ns DESC LIMIT 1",
+            (kind,)
+        ).fetchone()
+        if row is None:
+            return 0
+        try:
+            stat = os.stat(row[0])
+        except FileNotFoundError:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (row[0],))
+            return 1
+        return int(self._upsert(kind, directory, (row[0], stat.st_size, stat.st_mtime_ns), row[1:], hash_content))
+
+    def refresh(self, kind=None, full=False):
+        """
+        增量更新一个或全部类别
+
+        目录修改时间变化或超过重新扫描间隔时完整扫描，否则只复查最新文件；
+        full=True 强制完整扫描（如明知有文件被原地覆盖时）。
+
+        返回:
+        int: 新增、变化或删除的文件数
+        """
+        kinds = list(self.sources) if kind is None else [kind]
+        changed = 0
+        with self._lock, self._conn:
+            for name in kinds:
+                directory, hash_content = self.sources[name]
+                try:
+                    dir_mtime_ns = os.stat(directory).st_mtime_ns
+                except FileNotFoundError:
+                    self._conn.execute("DELETE FROM files WHERE kind = ?", (name,))
+                    self._conn.execute("DELETE FROM directories WHERE kind = ?", (name,))
+                    continue
+
+                state = self._conn.execute(
+                    "SELECT dir_mtime_ns, scanned_at FROM directories WHERE kind = ? AND directory = ?",
+                    (name, str(directory))
+                ).fetchone()
+                now = time.time()
+                interval = INPUT_RESCAN_INTERVAL if hash_content else FULL_RESCAN_INTERVAL
+                if (not full and state is not None and state[0] == dir_mtime_ns
+                        and now - state[1] < interval):
+                    changed += self._recheck_latest(name, directory, hash_content)
+                    continue
+
+                # 目录路径变化（如重新登记）时清掉旧目录的记录
+                self._conn.execute(
+                    "DELETE FROM files WHERE kind = ? AND directory != ?", (name, str(directory))
+                )
+                changed += self._scan(name, directory, hash_content)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO directories (kind, directory, dir_mtime_ns, scanned_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (name, str(directory), dir_mtime_ns, now)
+                )
+        if changed:
+            logger.debug("文件索引更新: %d个文件变化", changed)
+        return changed
+
+    def latest(self, kind, refresh=True):
+        """某类别中修改时间最新的文件，不存在时返回 None"""
+        if refresh:
+            self.refresh(kind)
+        entries = self._entries(
+            f"SELECT {self._COLUMNS} FROM files WHERE kind = ? ORDER BY mtime_ns DESC LIMIT 1",
+            (kind,)
+        )
+        return entries[0] if entries else None
+
+    def between(self, kind, start=None, end=None, refresh=True):
+        """某类别中修改时间在 [start, end] 之间的文件（datetime 或时间戳），按时间升序"""
+        if refresh:
+            self.refresh(kind)
+        start_ns = _to_ns(start) if start is not None else -2 ** 63
+        end_ns = _to_ns(end) if end is not None else 2 ** 63 - 1
+        return self._entries(
+            f"SELECT {self._COLUMNS} FROM files WHERE kind = ? AND mtime_ns BETWEEN ? AND ? "
+            "ORDER BY mtime_ns",
+            (kind, start_ns, end_ns)
+        )
+
+    def by_wafer(self, wafer_id, kind=None, refresh=True):
+        """某晶圆编号的文件（可限定类别），按时间升序"""
+        if refresh:
+            self.refresh(kind)
+        if kind is None:
+            return self._entries(
+                f"SELECT {self._COLUMNS} FROM files WHERE wafer_id = ? ORDER BY mtime_ns",
+                (str(wafer_id),)
+            )
+        return self._entries(
+            f"SELECT {self._COLUMNS} FROM files WHERE wafer_id = ? AND kind = ? ORDER BY mtime_ns",
+            (str(wafer_id), kind)
+        )
+
+    def lookup(self, path):
+        """按路径查询记录，未收录时返回 None"""
+        entries = self._entries(f"SELECT {self._COLUMNS} FROM files WHERE path = ?", (str(path),))
+        return entries[0] if entries else None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """进程内共享的文件索引"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = FileCatalog()
+        return _catalog
@@ -3,115 +3,98 @@ import sys
 from pathlib import Path
 import logging
 import shutil
+from functools import lru_cache
 
-# 配置日志
-logging.basicConfig(level=logging.DEBUG, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler('wedge_master_fileio.log'),
-                        logging.StreamHandler()
-                    ])
+# 日志输出由 utils.logging_config.setup_logging() 统一配置
 logger = logging.getLogger('FileIO')
-logger.setLevel(logging.DEBUG)
 
 # 获取项目根目录
 ROOT_DIR = Path(__file__).resolve().parents[1]
 
+# 程序运行所需的目录（启动时由 ensure_dirs 一次性创建）
+RESOURCE_DIRS = [
+    "config",
+    "Data/config",
+    "Data/logs",
+    "Data/inputs/CrossTrim_initial",
+    "Data/inputs/CrossTrim_after",
+    "Data/inputs/THK_initial",
+    "Data/inputs/THK_after",
+    "Data/inputs/WedgeTestRecipe",
+    "Data/inputs/Default Beam coefficient test Map",
+    "Data/inputs/BeamSpot",
+    "Data/outputs/Data_processor",
+    "Data/outputs/new_WedgeTestRecipe",
+    "Data/outputs/new_BeamShapeProfile",
+    "Data/outputs/Regression_Data",
+    "Data/outputs/WedgeTest_Log"
+]
+
+_ensured_dirs = set()  # 本次运行中已确认存在的目录
+
 def is_frozen():
     """检查是否是打包后的环境"""
     return getattr(sys, 'frozen', False) or hasattr(sys, '_MEIPASS')
 
-def get_resource_path(relative_path):
+@lru_cache(maxsize=None)
+def _base_paths():
     """
-    获取资源的绝对路径，适用于开发环境和打包后的EXE
-    返回Path对象而不是字符串
+    计算一次资源基路径
+    
+    返回:
+    tuple: (exe所在目录或None, 默认基路径)
     """
-    try:
-        base_path = None
-        
-        # 尝试获取 exe 所在目录
-        if hasattr(sys, 'frozen') or hasattr(sys, '_MEIPASS'):
-            exe_dir = Path(sys.executable).parent
-            # 检查 exe 所在目录是否有 Data 文件夹
-            exe_data_path = exe_dir / relative_path
-            # 如果 exe 所在目录已有对应资源或目录，则使用 exe 所在目录作为基路径
-            if exe_data_path.exists() or "Data" in relative_path.split(os.sep):
-                base_path = exe_dir
-                logger.info(f"使用应用所在目录: {base_path}")
-                return base_path / relative_path
-        
+    exe_dir = Path(sys.executable).parent if is_frozen() else None
+    if hasattr(sys, '_MEIPASS'):
         # PyInstaller 创建的临时文件夹
-        if hasattr(sys, '_MEIPASS'):
-            base_path = Path(sys._MEIPASS)
-            logger.info(f"MEIPASS 路径: {base_path}")
+        base_path = Path(sys._MEIPASS)
+    elif exe_dir is not None:
         # cx_Freeze 或其他打包工具
-        elif is_frozen():
-            base_path = Path(sys.executable).parent
-            logger.info(f"冻结执行路径: {base_path}")
-        else:
-            # 开发环境 - 使用项目根目录
-            base_path = ROOT_DIR
-            logger.info(f"开发路径: {base_path}")
-        
-        full_path = base_path / relative_path
-        
-        # 记录路径信息
-        logger.info(f"资源路径解析: {relative_path} -> {full_path}")
-        
-        # 确保路径存在
-        if not full_path.exists():
-            if '.' not in relative_path:  # 目录而非文件
-                logger.warning(f"目录不存在，创建目录: {full_path}")
-                full_path.mkdir(parents=True, exist_ok=True)
-                # 确保目录下有空文件
-                if not any(full_path.iterdir()):
-                    (full_path / '.keep').touch()
-            else:  # 文件
-                logger.warning(f"文件目录不存在，创建父目录: {full_path.parent}")
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                # 创建空文件
-                if not full_path.exists():
-                    full_path.touch()
-        
-        return full_path
+        base_path = exe_dir
+    else:
+        # 开发环境 - 使用项目根目录
+        base_path = ROOT_DIR
+    logger.info(f"资源基路径: {base_path}" + (f"，应用所在目录: {exe_dir}" if exe_dir else ""))
+    return exe_dir, base_path
+
+@lru_cache(maxsize=None)
+def _resolve(relative_path):
+    exe_dir, base_path = _base_paths()
+    if exe_dir is not None:
+        # exe 所在目录已有对应资源，或属于 Data 目录时，使用 exe 所在目录作为基路径
+        if "Data" in Path(relative_path).parts or (exe_dir / relative_path).exists():
+            return exe_dir / relative_path
+    return base_path / relative_path
+
+def get_resource_path(relative_path):
+    """
+    获取资源的绝对路径，适用于开发环境和打包后的EXE
+    返回Path对象而不是字符串
     
-    except Exception as e:
-        logger.exception(f"获取资源路径时出错: {str(e)}")
-        # 返回开发环境路径作为后备
-        return ROOT_DIR / relative_path
+    基路径只计算一次，解析结果按相对路径缓存；本函数不记录日志也不创建目录，
+    所需目录由启动时的 ensure_dirs() 创建。
+    """
+    return _resolve(os.fspath(relative_path))
 
 def get_latest_files():
     """获取最新配置文件、初始厚度和刻蚀后厚度文件"""
+    from utils.file_catalog import get_catalog, KIND_RECIPE, KIND_THK_INITIAL, KIND_THK_AFTER
+    
     try:
-        # 使用get_resource_path获取各个目录
-        recipe_dir = get_resource_path("Data/inputs/WedgeTestRecipe")
-        initial_dir = get_resource_path("Data/inputs/THK_initial")
-        after_dir = get_resource_path("Data/inputs/THK_after")
-        
-        logger.info(f"查找最新文件，目录:\nRecipe: {recipe_dir}\nInitial: {initial_dir}\nAfter: {after_dir}")
-        
-        # 获取所有符合条件的文件
-        recipe_files = list(recipe_dir.glob("*.csv"))
-        initial_files = list(initial_dir.glob("*.csv"))
-        after_files = list(after_dir.glob("*.csv"))
-        
-        if not recipe_files:
-            logger.warning(f"在 {recipe_dir} 目录中找不到Recipe文件")
-        if not initial_files:
-            logger.warning(f"在 {initial_dir} 目录中找不到初始厚度文件")
-        if not after_files:
-            logger.warning(f"在 {after_dir} 目录中找不到刻蚀后厚度文件")
-        
-        # 根据创建时间排序
-        def get_file_info(files):
-            if files:
-                latest = max(files, key=lambda x: x.stat().st_mtime)
-                return latest
-            return None
-        
-        recipe_file = get_file_info(recipe_files)
-        initial_file = get_file_info(initial_files)
-        after_file = get_file_info(after_files)
+        # 由文件索引查询各类别的最新文件（目录无变化时不再逐个stat）
+        catalog = get_catalog()
+        latest = {}
+        for kind, description in ((KIND_RECIPE, "Recipe文件"),
+                                  (KIND_THK_INITIAL, "初始厚度文件"),
+                                  (KIND_THK_AFTER, "刻蚀后厚度文件")):
+            entry = catalog.latest(kind)
+            if entry is None:
+                logger.warning(f"在 {catalog.sources[kind][0]} 目录中找不到{description}")
+            latest[kind] = entry.path if entry else None
+        
+        recipe_file = latest[KIND_RECIPE]
+        initial_file = latest[KIND_THK_INITIAL]
+        after_file = latest[KIND_THK_AFTER]
         
         logger.info(f"查找到的文件:\nRecipe: {recipe_file}\nInitial: {initial_file}\nAfter: {after_file}")
         
@@ -123,55 +106,38 @@ def get_latest_files():
 
 def get_latest_thickness_files():
     """获取初始厚度和刻蚀后厚度文件的最新文件"""
+    from utils.file_catalog import get_catalog, KIND_THK_INITIAL, KIND_THK_AFTER
+    
     try:
-        # 使用get_resource_path获取路径
-        initial_dir = get_resource_path("Data/inputs/THK_initial")
-        after_dir = get_resource_path("Data/inputs/THK_after")
-        
-        logger.info(f"查找最新厚度文件，目录:\nInitial: {initial_dir}\nAfter: {after_dir}")
-        
-        # 获取所有符合条件的文件
-        initial_files = list(initial_dir.glob("*.csv"))
-        after_files = list(after_dir.glob("*.csv"))
-        
-        if not initial_files:
-            logger.warning(f"在 {initial_dir} 目录中找不到初始厚度文件")
-        if not after_files:
-            logger.warning(f"在 {after_dir} 目录中找不到刻蚀后厚度文件")
-        
-        # 根据创建时间排序
-        initial_file = max(initial_files, key=lambda x: x.stat().st_mtime) if initial_files else None
-        after_file = max(after_files, key=lambda x: x.stat().st_mtime) if after_files else None
+        catalog = get_catalog()
+        initial_entry = catalog.latest(KIND_THK_INITIAL)
+        after_entry = catalog.latest(KIND_THK_AFTER)
         
-        logger.info(f"查找到的厚度文件:\nInitial: {initial_file}\nAfter: {after_file}")
+        if not initial_entry:
+            logger.warning(f"在 {catalog.sources[KIND_THK_INITIAL][0]} 目录中找不到初始厚度文件")
+        if not after_entry:
+            logger.warning(f"在 {catalog.sources[KIND_THK_AFTER][0]} 目录中找不到刻蚀后厚度文件")
         
-        if not initial_file or not after_file:
+        if not initial_entry or not after_entry:
             raise FileNotFoundError("缺少初始或刻蚀后厚度文件")
-            
-        return Path(initial_file), Path(after_file)
+        
+        logger.info(f"查找到的厚度文件:\nInitial: {initial_entry.path}\nAfter: {after_entry.path}")
+        return initial_entry.path, after_entry.path
             
     except Exception as e:
         logger.exception(f"获取最新厚度文件时出错: {str(e)}")
         raise RuntimeError(f"无法获取最新厚度文件: {str(e)}")
 
-def ensure_dirs():
-    """确保所需的所有目录都存在"""
-    dirs = [
-        "Data/config",
-        "Data/inputs/CrossTrim_initial",
-        "Data/inputs/CrossTrim_after",
-        "Data/inputs/THK_initial",
-        "Data/inputs/THK_after",
-        "Data/inputs/WedgeTestRecipe",
-        "Data/outputs/Data_processor",
-        "Data/outputs/new_WedgeTestRecipe",
-        "Data/outputs/new_BeamShapeProfile",
-        "Data/outputs/Regression_Data"
-    ]
+def ensure_dirs(dirs=None):
+    """确保所需的所有目录都存在（已确认过的目录不再访问文件系统）"""
+    dirs = RESOURCE_DIRS if dirs is None else dirs
+    pending = [dir_path for dir_path in dirs if dir_path not in _ensured_dirs]
+    if not pending:
+        return
     
     logger.info("开始验证和创建所需的目录结构...")
     
-    for dir_path in dirs:
+    for dir_path in pending:
         try:
             resource_dir = get_resource_path(dir_path)
             if not resource_dir.exists():
@@ -184,6 +150,7 @@ def ensure_dirs():
                     with keep_file.open('w') as f:
                         f.write("")
                         logger.info(f"在 {keep_file} 创建.keep文件")
+            _ensured_dirs.add(dir_path)
         except Exception as e:
             logger.error(f"创建目录失败: {dir_path} - {str(e)}")
 
@@ -208,23 +175,18 @@ def validate_paths():
 # 为兼容旧代码添加的函数
 def validate_path(path: str) -> Path:
     """
-    (兼容旧代码)验证路径是否存在，不存在则创建
+    (兼容旧代码)解析资源路径
     返回Path对象
     """
-    result = get_resource_path(path)
-    logger.debug(f"验证路径: {path} -> {result}")
-    return result
+    return get_resource_path(path)
 
 def ensure_dir(dir_path: str) -> Path:
     """
-    (兼容旧代码)确保目录存在
+    (兼容旧代码)确保目录存在，每个目录在一次运行中只检查一次
     返回Path对象
     """
-    result = get_resource_path(dir_path)
-    if not result.exists():
-        logger.info(f"创建目录: {result}")
-        result.mkdir(parents=True, exist_ok=True)
-    return result
+    ensure_dirs([dir_path])
+    return get_resource_path(dir_path)
 
 def main():
     """测试函数"""
@@ -0,0 +1,113 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# 日志目录属于 Data 目录，打包后位于exe所在目录而不是单文件exe解压的临时目录
+LOG_DIR = "Data/logs"
+LOG_FILE = "wedge_master.log"
+
+# 单个日志文件的最大字节数与保留的历史文件数
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# 各子系统的默认日志级别（"" 为根记录器）
+DEFAULT_LEVELS = {
+    "": logging.INFO,
+    "Main": logging.INFO,
+    "UI": logging.INFO,
+    "FileIO": logging.INFO,
+    "FileCatalog": logging.INFO,
+    "AutoAnalysis": logging.INFO,
+    "BeamSpotTest": logging.INFO,
+    "StageCenterAnalyzer": logging.INFO,
+    "MachineHistory": logging.INFO,
+    "matplotlib": logging.WARNING,
+    "PIL": logging.WARNING,
+}
+
+# 环境变量覆盖级别，如 WEDGE_LOG_LEVELS="BeamSpotTest=DEBUG,FileIO=WARNING"
+LEVELS_ENV = "WEDGE_LOG_LEVELS"
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _parse_levels(text):
+    levels = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, level = item.partition("=")
+        if not level:
+            name, level = "", name
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def set_levels(levels):
+    """设置各子系统的日志级别: {记录器名: 级别}，"" 表示根记录器"""
+    for name, level in levels.items():
+        logging.getLogger(name or None).setLevel(level)
+
+
+def setup_logging(log_file=None, levels=None, console=True,
+                  max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """
+    配置全局日志（只生效一次，重复调用只更新级别）
+
+    各线程中的日志调用只把记录放入队列，由 QueueListener 的后台线程
+    写入按大小轮转的文件和控制台，GUI线程和计算线程不等待磁盘写入。
+
+    参数:
+    log_file: 日志文件路径，缺省为 Data/logs/wedge_master.log
+    levels: 覆盖默认级别的 {记录器名: 级别}
+    console: 是否同时输出到控制台
+    """
+    global _listener
+    merged = dict(DEFAULT_LEVELS)
+    merged.update(levels or {})
+    merged.update(_parse_levels(os.environ.get(LEVELS_ENV, "")))
+
+    with _setup_lock:
+        if _listener is None:
+            if log_file is None:
+                from utils.file_io import ensure_dir
+                log_file = ensure_dir(LOG_DIR) / LOG_FILE
+
+            formatter = logging.Formatter(LOG_FORMAT)
+            handlers = [logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )]
+            if console:
+                handlers.append(logging.StreamHandler(sys.stderr))
+            for handler in handlers:
+                handler.setFormatter(formatter)
+
+            log_queue = queue.SimpleQueue()
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+            _listener = logging.handlers.QueueListener(
+                log_queue, *handlers, respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(shutdown_logging)
+
+    set_levels(merged)
+    return logging.getLogger("Main")
+
+
+def shutdown_logging():
+    """停止后台写入线程并刷新剩余日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
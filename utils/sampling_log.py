@@ -0,0 +1,158 @@
+import csv
+import os
+import threading
+from collections import OrderedDict
+
+LOG_ENCODING = "utf-8"
+
+# 从文件末尾向前读取的块大小
+TAIL_BLOCK_SIZE = 8192
+
+# 缓存的文件数（机台每天一个log文件）
+CACHE_SIZE = 32
+
+
+class SamplingLogHeader:
+    """机台 SamplingLog 的表头: 参数名、单位及数据区起始偏移"""
+
+    __slots__ = ("headers", "units", "data_offset", "size")
+
+    def __init__(self, headers, units, data_offset, size):
+        self.headers = headers
+        self.units = units
+        self.data_offset = data_offset
+        self.size = size    # 解析表头时的文件大小，文件变小说明被重写
+
+
+_header_cache = OrderedDict()   # path -> SamplingLogHeader
+_record_cache = OrderedDict()   # path -> ((size, mtime_ns), last_row)
+_cache_lock = threading.Lock()
+
+
+def _remember(cache, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _parse_line(raw):
+    """解析一行CSV（bytes），空行返回空列表"""
+    text = raw.decode(LOG_ENCODING, errors="replace").strip("\r\n")
+    if not text.strip():
+        return []
+    return next(csv.reader([text]), [])
+
+
+def _parse_header(path, size):
+    """读取表头（第一行）和单位（第二行）"""
+    with open(path, 'rb') as f:
+        first = f.readline()
+        second = f.readline()
+        data_offset = f.tell()
+    if first.startswith(b"\xef\xbb\xbf"):
+        first = first[3:]
+    headers = [name.strip() for name in _parse_line(first)]
+    if not headers:
+        raise ValueError(f"机台log文件没有表头: {path}")
+    return SamplingLogHeader(headers, _parse_line(second), data_offset, size)
+
+
+def read_header(path, stat=None):
+    """
+    读取机台log的表头，每个文件只解析一次（文件被截断或重写时重新解析）
+
+    返回:
+    SamplingLogHeader
+    """
+    key = os.fspath(path)
+    if stat is None:
+        stat = os.stat(key)
+    with _cache_lock:
+        header = _header_cache.get(key)
+        if header is not None and stat.st_size >= header.size:
+            return header
+    header = _parse_header(key, stat.st_size)
+    with _cache_lock:
+        _remember(_header_cache, key, header)
+    return header
+
+
+def _tail_row(path, header, size):
+    """
+    从文件末尾向前逐块读取，返回最后一条完整记录，数据区为空时返回 None
+
+    末尾没有换行的行可能是机台正在写入的半行：字段数不足表头时跳过，取前一行。
+    读取量只与最后几行的长度有关，与文件总长度无关。
+    """
+    with open(path, 'rb') as f:
+        end = size
+        tail = b""
+        unterminated = None
+        trailing = True     # lines[-1] 是否仍是文件的最后一行
+        while end > header.data_offset:
+            start = max(header.data_offset, end - TAIL_BLOCK_SIZE)
+            f.seek(start)
+            tail = f.read(end - start) + tail
+            end = start
+            if unterminated is None:
+                unterminated = not tail.endswith(b"\n")
+
+            lines = tail.split(b"\n")
+            # lines[0] 可能不完整（除非已到数据区起点），只检查其后的行
+            first_complete = 0 if end <= header.data_offset else 1
+            for index in range(len(lines) - 1, first_complete - 1, -1):
+                row = _parse_line(lines[index])
+                if not row:
+                    continue
+                is_trailing = trailing and unterminated and index == len(lines) - 1
+                if is_trailing and len(row) < len(header.headers):
+                    continue
+                return row
+            # 本块中没有可用的行：保留不完整的首行，继续向前读取
+            trailing = trailing and len(lines) == 1
+            tail = lines[0] if first_complete else b""
+    return None
+
+
+def read_last_row(path):
+    """
+    读取机台log文件的表头和最后一条记录
+
+    结果按 (路径, 大小, 修改时间) 缓存，文件未变化时不读取文件内容。
+
+    返回:
+    tuple: (SamplingLogHeader, 最后一行的字段列表)；没有数据行时第二项为 None
+    """
+    key = os.fspath(path)
+    stat = os.stat(key)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    header = read_header(key, stat)
+    with _cache_lock:
+        cached = _record_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return header, cached[1]
+
+    row = _tail_row(key, header, stat.st_size)
+    with _cache_lock:
+        _remember(_record_cache, key, (signature, row))
+    return header, row
+
+
+def read_last_record(path):
+    """
+    读取机台log文件的最后一条记录
+
+    返回:
+    dict: 参数名 -> 字符串值（保持表头顺序）；没有数据行时返回 None
+    """
+    header, row = read_last_row(path)
+    if row is None:
+        return None
+    return dict(zip(header.headers, row))
+
+
+def clear_cache():
+    with _cache_lock:
+        _header_cache.clear()
+        _record_cache.clear()